@@ -32,8 +32,21 @@
 #     - Lorsqu'il y a apprentissage par fonction de valeur : valeur de chaque état calculé par l'équation de Bellman
 # """
 
-from random import random, randint
-from math import ceil
+import random
+
+from nimm_metriques import MoyenneMobile
+from nimm_solveur import resoudre
+from nimm_tables import TableBoules, TableEtats
+from nimm_td_lambda import parametres_td_lambda, coup_td_lambda, fin_td_lambda
+from nimm_urne import tirage_boule
+
+# Tirage dans l'urne (apprentissage par renforcement) :
+#     False : probabilité d'une couleur proportionnelle à son nombre de boules
+#     True  : probabilités de la version d'origine, où l'urne contenait ceil(boules / t) boules de chaque couleur
+URNE_ARRONDIE = False
+
+# Profilage de la boucle de jeu (voir nimm_profilage) : durée de chaque phase affichée 10 fois pendant la partie
+PROFILAGE = False
 
 
 def affichage_parametres(parametres):
@@ -117,6 +130,11 @@ def initialisation(definir_parametres, parametres):
                     parametres[joueur][4][2] = float(input('Facteur réduction e-greedy: '))
                     parametres[joueur][4][3] = int(input('Période e-greedy: '))
                     parametres[joueur][4][4] = float(input('Learning rate: '))
+                    lambda_td = input('Lambda TD(λ) [vide: mise à jour d\'origine]: ')
+                    if lambda_td:
+                        parametres[joueur][4][5:] = [float(lambda_td), int(input('Mise à jour à chaque coup [0][1]: '))]
+                    else:
+                        del parametres[joueur][4][5:]
                     succes = True
                 except:
                     parametres[joueur][4] = t  # on rétablit la liste des parametres e-greedy aux valeurs de départ
@@ -139,7 +157,7 @@ def initialisation(definir_parametres, parametres):
         affichage_parametres(parametres)
 
 
-def pile_ou_face(type_joueur, nom_joueur):
+def pile_ou_face(type_joueur, nom_joueur, alea=random):
     """ Fonction  permettant d'obtenir le résultat du pile ou face permettant de déterminer qui commence
     Si le joueur est humain, il doit entrer son choix, sinon le tirage est aléatoire
     Retourne True si le pari est identique au tirage aléatoire"""
@@ -147,8 +165,8 @@ def pile_ou_face(type_joueur, nom_joueur):
     if type_joueur == 0:  # le joueur est un humain, il doit donner son pari
         pari = choix(1, 2, nom_joueur + " : pile [1] ou face [2] ? : ")
     else:
-        pari = randint(1, 2)
-    return pari == randint(1, 2)
+        pari = alea.randint(1, 2)
+    return pari == alea.randint(1, 2)
 
 
 def joueur_qui_a_la_main(joueur1_commence, nbre_coups):
@@ -173,54 +191,45 @@ def update_epsilon_greedy(joueur, parametres, manche):
         parametres[joueur][4][0] = max(parametres[joueur][4][0] * parametres[joueur][4][2], parametres[joueur][4][1])
 
 
-def jouer(joueur, allumettes, parametres, boules, etats, historique):
+def jouer(joueur, allumettes, parametres, boules, etats, historique, alea=random, politique=None, solution=None):
     """ Fonction principale du jeu activée lors de chaque coup d'une manche
     Elle comporte deux sous-fonctions traitant le coup par une IA ou le coup par un humain
+    alea fournit les tirages aléatoires de l'IA (random() et randint()) : le module random par défaut, ou un flux
+    propre au joueur (voir nimm_aleatoire)
+    politique est un éventuel cache des coups gloutons de la fonction de valeur (voir nimm_politique)
+    solution est la solution exacte du jeu (nimm_solveur.resoudre) lue par les IA optimale et aléatoire/optimale ;
+    calculée (puis gardée en cache par resoudre) si elle n'est pas donnée
     """
 
     def coup_IA_PC(joueur, allumettes, max_allumettes, parametres, historique):  # Coup par une IA
         mode_IA = parametres[joueur][1]  # [0:aléatoire][1:optimal][2:aléatoire/optimal][3:apprentissage]
         mode_apprentissage_IA = parametres[joueur][2]  # [0:renforcement][1:fonction valeur]
         if mode_IA == 0:  # coup aléatoire
-            coup = randint(1, min(max_allumettes, allumettes))
-        elif mode_IA == 1:  # coup optimal
-            # coup = max(allumettes % (max_allumettes + 1),1) # si multiple de max_allumettes+1 ==> coup = 1
-            # pour laisser le plus de choix possible à l'adversaire
-            coup = allumettes % (max_allumettes + 1)
-            if coup == 0:
-                coup = randint(1, min(max_allumettes, allumettes))
+            coup = alea.randint(1, min(max_allumettes, allumettes))
+        elif mode_IA == 1:  # coup optimal : lu dans la solution exacte, aléatoire sur une position perdante
+            exacte = solution if solution is not None else resoudre(parametres[0][0], max_allumettes)
+            gagnants = exacte.coups_gagnants[allumettes]
+            coup = gagnants[0] if gagnants else exacte.coup_optimal(allumettes, alea)
         elif mode_IA == 2:  # coup optimal/aléatoire
-            coup = randint(1, min(max_allumettes, allumettes))  # aléatoire
-            if randint(0, 1) and (
-                    allumettes % (max_allumettes + 1) != 0):  # optimal et allumettes est multiple de max_allumettes + 1
-                coup = allumettes % (max_allumettes + 1)
+            exacte = solution if solution is not None else resoudre(parametres[0][0], max_allumettes)
+            coup = alea.randint(1, min(max_allumettes, allumettes))  # aléatoire
+            gagnants = exacte.coups_gagnants[allumettes]
+            if alea.randint(0, 1) and gagnants:  # optimal si la position est gagnante
+                coup = gagnants[0]
         elif mode_IA == 3 and mode_apprentissage_IA == 0:  # Apprentissage par enforcement
-            urne = []
-            # Remplissage d'une urne avec les boules de couleur: 0 représente boule verte/1
+            # Tirage aléatoire d'une boule dans l'urne des boules de couleur: 0 représente boule verte/1
             # représente boule orange/2 représente boule rouge, etc.
-            # Total boules =
-            t = 0
-            for i in range(parametres[0][1]):
-                t += i
-
-            for i in range(parametres[0][1]):
-                urne += [i] * ceil(boules[joueur - 1][allumettes - 1][i] / t)
-                # proportion de boules de chaque couleur arrondie au nbre sup - pour accélérer les calculs !
-                # urne += [i] * boules[joueur - 1][allumettes - 1][i]
-                # Mélange des boules dans l'urne - Mélange de Fisher-Yates
-            for i in range(len(urne) - 1, 1, -1):
-                j = randint(0, i)
-                urne[j], urne[i] = urne[i], urne[j]
-            # Tirage aléatoire d'une boule dans l'urne
-            coup = urne[randint(0, len(urne) - 1)]
+            coup = tirage_boule(boules.ligne(joueur - 1, allumettes - 1), URNE_ARRONDIE, alea)
             # enregistrer le coup
             historique[joueur - 1].append((allumettes - 1, coup))  # coup et allumettes indicés sur 0
             coup += 1  # + 1 car listes indicées sur 0 si urne[..] = 0 => coup = 1 boule à retirer
         elif mode_IA == 3 and mode_apprentissage_IA == 1:  # Fonction de valeur
             # déterminer le type de coup en f() epsilon-greedy
-            if random() < (parametres[joueur][4][0]):  # random génère un nombre aléatoire entre 0 et 1
-                coup = randint(1, min(max_allumettes, allumettes))
+            if alea.random() < (parametres[joueur][4][0]):  # random génère un nombre aléatoire entre 0 et 1
+                coup = alea.randint(1, min(max_allumettes, allumettes))
                 coup -= 1  # pour indexer sur 0
+            elif politique is not None:  # exploitation, coup glouton en cache
+                coup = politique.coup(joueur - 1, allumettes) - 1
             else:  # exploitation
                 valeur = 0
                 # on cherche la plus petite valeur dans etats
@@ -229,17 +238,22 @@ def jouer(joueur, allumettes, parametres, boules, etats, historique):
                 if allumettes - max_allumettes <= 0:  # l'adversaire obtient la récompense négative - 1
                     coup = allumettes
                 else:
-                    valeur = etats[joueur - 1][
-                        allumettes - 2]  # valeur initiale correspondant à l'allumette suivant la position en cours
+                    valeur = etats[joueur - 1,
+                                   allumettes - 2]  # valeur initiale correspondant à l'allumette suivant la position en cours
                     coup = 1  # initialisation au coup minimum
                     for i in range(allumettes - 1, allumettes - max_allumettes - 1,
                                    -1):  # test des positions pour trouver la plus petite valeur
                         # print('valeur testée: i = ',i,etats[0][i-1])
-                        if etats[joueur - 1][i - 1] < valeur:
-                            valeur = etats[joueur - 1][i - 1]
+                        if etats[joueur - 1, i - 1] < valeur:
+                            valeur = etats[joueur - 1, i - 1]
                             coup = allumettes - i
                 coup -= 1
             historique[joueur - 1].append(allumettes - 1)  # coup et allumettes indicés sur 0
+            if len(parametres[joueur][4]) > 6 and parametres[joueur][4][6]:  # TD(λ) en ligne (voir nimm_td_lambda)
+                coup_td_lambda(etats, joueur - 1, historique[joueur - 1], parametres[joueur][4][4],
+                               parametres_td_lambda(parametres, joueur)[0])  # ValueError sans λ
+                if politique is not None:
+                    politique.invalider(joueur - 1, historique[joueur - 1])
             coup += 1
             # + 1 pour la déduction des allumettes car listes indicées sur 0
         return coup
@@ -262,17 +276,9 @@ def update_listes_renforcement(joueur, parametres, boules, historique):
     def test_boules_restantes():
         """" Si le joueur a perdu,, vérifie qu'il reste encore des boules pour une allumette """
 
-        n = 0
-        for i in range(len(boules[joueur_perdant - 1][allumette])):
-            n += boules[joueur_perdant - 1][allumette][i]
-
-        if n == 0:  # on réinitialise le nombre de boules
-            if allumette == 0:
-                boules[joueur_perdant - 1][allumette] = [2] + ([0] * (parametres[0][1] - 1))  #
-            elif allumette == 1:
-                boules[joueur_perdant - 1][allumette] = [2, 2] + ([0] * (parametres[0][1] - 2))  #
-            else:
-                boules[joueur_perdant - 1][allumette] = [2] * parametres[0][1]  #
+        if sum(boules.ligne(joueur_perdant - 1, allumette)) == 0:
+            # on réinitialise le nombre de boules : 2 par coup possible, 0 pour les coups impossibles
+            boules.reinitialiser(joueur_perdant - 1, allumette)
 
     # Le joueur qui a perdu s'obtient par joueur % 2 + 1
 
@@ -283,12 +289,12 @@ def update_listes_renforcement(joueur, parametres, boules, historique):
         for i in range(len(historique[joueur_gagnant - 1])):
             allumette = historique[joueur_gagnant - 1][i][0]
             coup = historique[joueur_gagnant - 1][i][1]
-            boules[joueur_gagnant - 1][allumette][coup] += 1
+            boules.ajouter(joueur_gagnant - 1, allumette, coup, 1)
     if parametres[joueur_perdant][2] == 0:  # joueur qui a perdu joue par renforcement
         for i in range(len(historique[joueur_perdant - 1])):
             allumette = historique[joueur_perdant - 1][i][0]
             coup = historique[joueur_perdant - 1][i][1]
-            boules[joueur_perdant - 1][allumette][coup] -= 1
+            boules.ajouter(joueur_perdant - 1, allumette, coup, -1)
 
             test_boules_restantes()
 
@@ -297,13 +303,17 @@ def update_listes_fvaleur(joueur, parametres, etats, historique):
     """" Met à jour la liste des valeurs calculées par la fonction de valeur """
 
     def transitions(j):
+        lambda_td, en_ligne = parametres_td_lambda(parametres, j)
+        if lambda_td is not None:  # traces d'éligibilité (voir nimm_td_lambda)
+            fin_td_lambda(etats, j - 1, historique[j - 1], recompense, parametres[j][4][4], lambda_td, en_ligne)
+            return
         for i in range(len(historique[j - 1]), 0, -1):
             if i == len(historique[j - 1]):  # dernier enregistrement de l'historique du joueur j
-                etats[j - 1][historique[j - 1][i - 1]] += parametres[j][4][4] * (
-                        recompense - etats[j - 1][historique[j - 1][i - 1]])  # r = 1
+                etats[j - 1, historique[j - 1][i - 1]] += parametres[j][4][4] * (
+                        recompense - etats[j - 1, historique[j - 1][i - 1]])  # r = 1
             else:
-                etats[j - 1][historique[j - 1][i - 1]] += parametres[j][4][4] * (
-                        etats[j - 1][historique[j - 1][i]] - etats[j - 1][historique[j - 1][i - 1]])
+                etats[j - 1, historique[j - 1][i - 1]] += parametres[j][4][4] * (
+                        etats[j - 1, historique[j - 1][i]] - etats[j - 1, historique[j - 1][i - 1]])
 
     # joueur qui a perdu s'obtient par joueur % 2 + 1
 
@@ -331,13 +341,49 @@ def affiche_jeu(allumettes, max_allumettes):
     print(jeu)
 
 
-def mmob(liste, moyenne):
-    """" Calcule la moyenne mobile des valeurs  contenues dans la liste """
+def update_scores(joueur, scores, histo_victoires, manche):
+    """ Met à jour les scores et l'historique des dernières manches lorsque joueur remporte la manche
+    histo_victoires contient une moyenne mobile (MoyenneMobile) des victoires par joueur """
+
+    scores[joueur - 1] += 1
+
+    histo_victoires[joueur - 1].ajouter(1)  # historique victoires/défaites joueur gagant
+    histo_victoires[joueur % 2].ajouter(0)  # historique victoires/défaites joueur perdant
+
+    if histo_victoires[0].complete():  # Calcul de la Mmob dès que la fenêtre est pleine
+        scores[2] = 100 * histo_victoires[0].moyenne()  # mmob exprimée en %
+        scores[3] = 100 * histo_victoires[1].moyenne()  # mmob exprimée en %
+
+    for j in range(2, 4):  # détermination de la manche à partir de laquelle les 50% de victoires sont acquis
+        if scores[j + 2] == 0:
+            if scores[j] >= 50:
+                scores[j + 2] = manche
+        else:
+            if scores[j] < 50:
+                scores[j + 2] = 0
+
+
+def appeler(phase, fonction, *arguments):
+    """ Appelle fonction(*arguments) et retourne son résultat : mesure d'une phase de la boucle de jeu sans
+    profilage (voir nimm_profilage.ProfilNimm.mesurer) """
+
+    return fonction(*arguments)
+
 
-    mm = 0
-    for i in liste:
-        mm += i
-    return mm / moyenne
+def fin_de_manche(joueur, parametres, boules, etats, historique, manche, mesurer=appeler):
+    """ Apprentissage des IA à la fin d'une manche remportée par joueur : boules, e-greedy et fonction de valeur
+    mesurer(phase, fonction, *arguments) appelle chaque étape : appeler, ou ProfilNimm.mesurer pour la chronométrer """
+
+    if parametres[1][2] == 0 or parametres[2][2] == 0:
+        mesurer('renforcement', update_listes_renforcement, joueur, parametres, boules, historique)
+
+    if parametres[joueur][2] == 1:
+        mesurer('epsilon', update_epsilon_greedy, joueur, parametres, manche)  # update e-greedy du joueur
+    if parametres[joueur % 2 + 1][2] == 1:  # update e-greedy de l'autre joueur
+        mesurer('epsilon', update_epsilon_greedy, joueur % 2 + 1, parametres, manche)
+
+    if parametres[1][2] == 1 or parametres[2][2] == 1:
+        mesurer('fonction valeur', update_listes_fvaleur, joueur, parametres, etats, historique)
 
 
 def initialiser_matrice(type_matrice, j1, j2, alu_en_jeu, max_alu):
@@ -352,6 +398,9 @@ def initialiser_matrice(type_matrice, j1, j2, alu_en_jeu, max_alu):
 
     j1 et j2 sont des valeurs booléennes qui déterminent si les joueur 1 et/ou 2 sont des IA
 
+    Les matrices sont des tables compactes (voir nimm_tables) indicées par [joueur, allumette, coup] pour le
+    renforcement et par [joueur, allumette] pour la fonction de valeur, joueur, allumette et coup étant indicés sur 0.
+
     la matrice d'apprentissage par renforcement est initialement de la forme suivante pour 8 allumettes en jeu avec
     un retrait max de 3 allumettes :
     [[[2, 0, 0], [2, 2, 0], [2, 2, 2], [2, 2, 2], [2, 2, 2], [2, 2, 2], [2, 2, 2], [2, 2, 2]],
@@ -361,22 +410,11 @@ def initialiser_matrice(type_matrice, j1, j2, alu_en_jeu, max_alu):
     [[0, 0, 0, 0, 0, 0, 0, 0], [0, 0, 0, 0, 0, 0, 0, 0]]
     """
 
-    matrice = []
     if type_matrice == 'renforcement':  # matrice pour apprentissage par renforcement
-        matrice = [[[2] * max_alu for _ in range(alu_en_jeu)], [[2] * max_alu for _ in range(alu_en_jeu)]]
-        for i in range(max_alu - 1):  # enlever les solutions impossibles
-            matrice[0][i] = ([2] * (i + 1)) + ([0] * (max_alu - i - 1))
-            matrice[1][i] = ([2] * (i + 1)) + ([0] * (max_alu - i - 1))
+        return TableBoules(j1, j2, alu_en_jeu, max_alu)
     elif type_matrice == 'fonction de valeur':  # matrice des états pour apprentissage par fonction de valeur
-        matrice = [[0 for _ in range(alu_en_jeu)], [0 for _ in range(alu_en_jeu)]]
-
-    if j1 and not j2:
-        del matrice[1]
-        matrice.append([])
-    elif j2 and not j1:
-        del matrice[0]
-        matrice.insert(0, [])
-    return matrice
+        return TableEtats(j1, j2, alu_en_jeu)
+    raise ValueError("Type de matrice inconnu : " + str(type_matrice))
 
 
 """ ********************************** CODE PRINCIPAL *********************************************** 
@@ -432,150 +470,142 @@ parametres = [[12, 3, 1000], [1, 1, None, "IA 1", [1.0, 0.05, 0.996, 5, 0.001]],
 #                            [1,3,0,"IA 2",[1.0, 0.05, 0.996, 20, 0.001]]]
 
 
-initialisation(input("Paramètres par défaut [o][n] ? : ") == "n", parametres)
-
-allumettes_en_jeu = parametres[0][0]  # nbre d'allumettes mises en jeu
-max_allumettes = parametres[0][1]  # nbre max d'allumettes pouvant être retirées
-nbre_manches = parametres[0][2]  # nbre de manches à jouer
-manche = 0  # manche en cours
-scores = [0, 0, 0, 0, 0, 0]
-# les scores absolus des joueurs + MMob des scores des 10 dernières manches + manches à partir
-# desquelles on atteint les 50% de réussite
-
-histo_victoires = [[], []]  # Histo 10 dernières manches
+if __name__ == '__main__':
+    initialisation(input("Paramètres par défaut [o][n] ? : ") == "n", parametres)
 
-# initialisation apprentissage par renforcement on crée une liste par joueur qui joue selon ce mode pour chaque
-# joueur créé, on crée, par allumette, une liste [2,2,2] pour représenter les boules vertes, oranges et rouges
-# !!! ne # pas creer les listes de cette manière : boules = [[2,2,2]]*8 - Si on modifie un élément, tous les éléments
-# correspondants des autres listes [2,2,2] sont modifiés car en fait il s'agit de la même liste  !!!
-# cela donne : boules[[[2,0,0],[2,2,0],[2,2,2],[2,2,2], ... [2,0,0]],[[2,2,0] ... [2,2,2]]]
-# boules[0][0][2] ==> joueur 1 (index 0), allumette 1 (index 0), #boules rouges (index 2) ...
+    allumettes_en_jeu = parametres[0][0]  # nbre d'allumettes mises en jeu
+    max_allumettes = parametres[0][1]  # nbre max d'allumettes pouvant être retirées
+    nbre_manches = parametres[0][2]  # nbre de manches à jouer
+    manche = 0  # manche en cours
+    scores = [0, 0, 0, 0, 0, 0]
+    # les scores absolus des joueurs + MMob des scores des 10 dernières manches + manches à partir
+    # desquelles on atteint les 50% de réussite
 
-boules = initialiser_matrice('renforcement', parametres[1][2] == 0, parametres[2][2] == 0, allumettes_en_jeu, max_allumettes)
+    histo_victoires = [MoyenneMobile(10), MoyenneMobile(10)]  # Histo 10 dernières manches
 
-# initialisation apprentissage par fonction de valeur
-# on crée une liste par joueur qui joue selon ce mode
-# pour chaque joueur créé, on crée par allumette, un nombre (0 initialement) pour représenter l'état correspondant 
+    # initialisation apprentissage par renforcement : pour chaque joueur qui joue selon ce mode, on range, par
+    # allumette, le nombre de boules vertes, oranges et rouges [2,2,2] dans une table compacte
+    # cela donne : boules[[[2,0,0],[2,2,0],[2,2,2],[2,2,2], ... [2,0,0]],[[2,2,0] ... [2,2,2]]]
+    # boules[0, 0, 2] ==> joueur 1 (index 0), allumette 1 (index 0), #boules rouges (index 2) ...
 
-etats = initialiser_matrice('fonction de valeur', parametres[1][2] == 1, parametres[2][2] == 1, allumettes_en_jeu,
-                     max_allumettes)
+    boules = initialiser_matrice('renforcement', parametres[1][2] == 0, parametres[2][2] == 0, allumettes_en_jeu, max_allumettes)
 
-for j in range(2):
-    if parametres[j + 1][0] == 0:  # demander le nom du joueur humain
-        parametres[j + 1][3] = input('Quel est ton nom joueur ' + str(j + 1) + ' ? : ')
+    # initialisation apprentissage par fonction de valeur
+    # on crée une liste par joueur qui joue selon ce mode
+    # pour chaque joueur créé, on crée par allumette, un nombre (0 initialement) pour représenter l'état correspondant 
 
-affichage_parametres(parametres)
+    etats = initialiser_matrice('fonction de valeur', parametres[1][2] == 1, parametres[2][2] == 1, allumettes_en_jeu,
+                         max_allumettes)
 
-joueur1_commence = pile_ou_face(
-    parametres[1][0], parametres[1][3])  # déterminer si le joueur 1 commence / parametres[1][0] = type de joueur
+    for j in range(2):
+        if parametres[j + 1][0] == 0:  # demander le nom du joueur humain
+            parametres[j + 1][3] = input('Quel est ton nom joueur ' + str(j + 1) + ' ? : ')
 
-affichage_jeu = parametres[1][0] == 0 or parametres[2][0] == 0 or input("Affichage du jeu [o][n] ? : ") == 'o'
+    affichage_parametres(parametres)
 
-while manche < nbre_manches:  # Début du jeu
-    manche += 1  # manche en cours
-    nbre_allumettes_a_retirer = 0  # nombre d'allumettes à retirer par le joueur ou l'IA
-    allumettes = allumettes_en_jeu  # initialiser le nombre d'allumettes en jeu
-    nbre_coups = 0
+    joueur1_commence = pile_ou_face(
+        parametres[1][0], parametres[1][3])  # déterminer si le joueur 1 commence / parametres[1][0] = type de joueur
 
-    # listes devant contenir l'historique des coups des joueurs 1 et 2 - utilisées lors d'un apprentissage
-    historique = [[], []]
+    affichage_jeu = parametres[1][0] == 0 or parametres[2][0] == 0 or input("Affichage du jeu [o][n] ? : ") == 'o'
 
-    while allumettes > 0:
-        if affichage_jeu:
-            affiche_jeu(allumettes, max_allumettes)
-        nbre_coups += 1
-        joueur = joueur_qui_a_la_main(joueur1_commence, nbre_coups)
+    profil = None
+    mesurer = appeler
+    phases_coup = [None, 'coup', 'coup']
+    if PROFILAGE:
+        from time import perf_counter
+        from nimm_metriques import SortieConsole
+        from nimm_profilage import ProfilNimm, mode_joueur
 
-        nbre_allumettes_a_retirer = jouer(joueur, allumettes, parametres, boules, etats,
-                                          historique)  # on retire le nombre d'allumettes
+        profil = ProfilNimm(periode=max(nbre_manches // 10, 1), sortie=SortieConsole())
+        mesurer = profil.mesurer
+        phases_coup = [None, 'coup/' + mode_joueur(parametres, 1), 'coup/' + mode_joueur(parametres, 2)]
 
-        allumettes -= nbre_allumettes_a_retirer
+    while manche < nbre_manches:  # Début du jeu
+        if profil is not None:
+            debut_manche = perf_counter()
+        manche += 1  # manche en cours
+        nbre_allumettes_a_retirer = 0  # nombre d'allumettes à retirer par le joueur ou l'IA
+        allumettes = allumettes_en_jeu  # initialiser le nombre d'allumettes en jeu
+        nbre_coups = 0
 
-        if affichage_jeu:
-            print(str(parametres[joueur][3]) + ' retire ' + str(nbre_allumettes_a_retirer) + ' allumette(s)')
+        # listes devant contenir l'historique des coups des joueurs 1 et 2 - utilisées lors d'un apprentissage
+        historique = [[], []]
 
-        if allumettes == 0:  # la manche est finie
-            scores[joueur - 1] += 1
+        while allumettes > 0:
+            if affichage_jeu:
+                mesurer('affichage', affiche_jeu, allumettes, max_allumettes)
+            nbre_coups += 1
+            joueur = joueur_qui_a_la_main(joueur1_commence, nbre_coups)
 
-            histo_victoires[joueur - 1].append(1)  # historique victoires/défaites joueur gagant
-            histo_victoires[joueur % 2].append(0)  # historique victoires/défaites joueur perdant
+            nbre_allumettes_a_retirer = mesurer(phases_coup[joueur], jouer, joueur, allumettes, parametres, boules,
+                                                etats, historique)  # on retire le nombre d'allumettes
 
-            if len(histo_victoires[0]) > 10:
-                histo_victoires[0].pop(0)  # supprime le premier élément de la liste des victoires du joueur 1
-                histo_victoires[1].pop(0)  # supprime le premier élément de la liste des victoires du joueur 2
+            allumettes -= nbre_allumettes_a_retirer
 
-            if len(histo_victoires[0]) == 10:  # Calcul de la Mmob sur 10 manches
-                scores[2] = 100 * mmob(histo_victoires[0], 10)  # mmob exprimée en %
-                scores[3] = 100 * mmob(histo_victoires[1], 10)  # mmob exprimée en %
+            if affichage_jeu:
+                print(str(parametres[joueur][3]) + ' retire ' + str(nbre_allumettes_a_retirer) + ' allumette(s)')
 
-            for j in range(2, 4):  # détermination de la manche à partir de laquelle les 50% de victoires sont acquis
-                if scores[j + 2] == 0:
-                    if scores[j] >= 50:
-                        scores[j + 2] = manche
-                else:
-                    if scores[j] < 50:
-                        scores[j + 2] = 0
+            if allumettes == 0:  # la manche est finie
+                mesurer('scores', update_scores, joueur, scores, histo_victoires, manche)
+                fin_de_manche(joueur, parametres, boules, etats, historique, manche, mesurer)
 
-            if parametres[1][2] == 0 or parametres[2][2] == 0:
-                update_listes_renforcement(joueur, parametres, boules, historique)
+                if parametres[1][0] == 0 or parametres[2][0] == 0:  # un humain au moins joue
 
-            if parametres[joueur][2] == 1:
-                update_epsilon_greedy(joueur, parametres, manche)  # update e-greedy du joueur
-            if parametres[joueur % 2 + 1][2] == 1:  # update e-greedy de l'autre joueur
-                update_epsilon_greedy(joueur % 2 + 1, parametres, manche)
+                    print()
+                    print("Scores :", scores)
+                    print()
 
-            if parametres[1][2] == 1 or parametres[2][2] == 1:
-                update_listes_fvaleur(joueur, parametres, etats, historique)
+        joueur1_commence = not (joueur1_commence)  # inverser le joueur pour la prochaine manche
+        if profil is not None:
+            profil.manche_terminee(perf_counter() - debut_manche, manche)
 
-            if parametres[1][0] == 0 or parametres[2][0] == 0:  # un humain au moins joue
+    # ******************** Fin de la partie ***********************************************
 
-                print()
-                print("Scores :", scores)
-                print()
+    # ******************** Affichage des résultats ****************************************
 
-    joueur1_commence = not (joueur1_commence)  # inverser le joueur pour la prochaine manche
+    print()
+    for j in range(2):
+        print("Joueur " + str(j + 1) + " : " + parametres[j + 1][3])
+        print('  Type de joueur           : ', ('Humain', 'IA')[parametres[j + 1][0]])
+        if parametres[j + 1][0] == 1:
+            print('  Mode de jeu              : ',
+                  ('Aléatoire', 'Optimal', 'Aléatoire/Optimal', 'Apprentissage')[parametres[j + 1][1]])
+            if parametres[j + 1][1] == 3:
+                print("  Type d'apprentissage     : ", ('Renforcement', 'Fonction valeur')[parametres[j + 1][2]])
+                if parametres[j + 1][2] == 1:
+                    print("  epsilon-greedy           : ", parametres[j + 1][4])
+        print("  Victoires                : ", scores[j])
+        print("  Moyenne de victoires (%) : ", scores[j + 2])
+        if parametres[j + 1][1] == 3:
+            print("  Manches d'apprentissage  : ", scores[j + 4])
+        print()
 
-# ******************** Fin de la partie ***********************************************
+    # impression du nombre de boules par allumette s'il y a au moins un apprentissage par renforcement
 
-# ******************** Affichage des résultats ****************************************
+    for j in range(2):
+        if parametres[j + 1][2] == 0:
+            print('*** Joueur ' + str(j + 1) + ' ***')
+            print()
+            for i in range(allumettes_en_jeu):
+                print('allumette', i + 1, boules.ligne(j, i).tolist())
+        print()
 
-print()
-for j in range(2):
-    print("Joueur " + str(j + 1) + " : " + parametres[j + 1][3])
-    print('  Type de joueur           : ', ('Humain', 'IA')[parametres[j + 1][0]])
-    if parametres[j + 1][0] == 1:
-        print('  Mode de jeu              : ',
-              ('Aléatoire', 'Optimal', 'Aléatoire/Optimal', 'Apprentissage')[parametres[j + 1][1]])
-        if parametres[j + 1][1] == 3:
-            print("  Type d'apprentissage     : ", ('Renforcement', 'Fonction valeur')[parametres[j + 1][2]])
-            if parametres[j + 1][2] == 1:
-                print("  epsilon-greedy           : ", parametres[j + 1][4])
-    print("  Victoires                : ", scores[j])
-    print("  Moyenne de victoires (%) : ", scores[j + 2])
-    if parametres[j + 1][1] == 3:
-        print("  Manches d'apprentissage  : ", scores[j + 4])
     print()
 
-# impression du nombre de boules par allumette s'il y a au moins un apprentissage par renforcement
+    # impression de la valeur des états s'il y a au moins un apprentissage par fonction de valeur
 
-for j in range(2):
-    if parametres[j + 1][2] == 0:
-        print('*** Joueur ' + str(j + 1) + ' ***')
+    for j in range(2):
+        if parametres[j + 1][2] == 1:
+            print('*** Joueur ' + str(j + 1) + ' ***')
+            print()
+            for i in range(allumettes_en_jeu):
+                print('état', i + 1, etats[j, i])
         print()
-        for i in range(allumettes_en_jeu):
-            print('allumette', i + 1, boules[j][i])
-    print()
 
-print()
+    print()
 
-# impression de la valeur des états s'il y a au moins un apprentissage par fonction de valeur
+    # répartition du temps entre les phases de la boucle de jeu
 
-for j in range(2):
-    if parametres[j + 1][2] == 1:
-        print('*** Joueur ' + str(j + 1) + ' ***')
+    if profil is not None:
+        print(profil.rapport())
         print()
-        for i in range(allumettes_en_jeu):
-            print('état', i + 1, etats[j][i])
-    print()
-
-print()
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+# """
+# Banc d'essai - Jeu de Nimm et neurone miam
+#
+# Mesure, avec des graines fixes, le débit, la latence et la mémoire maximale (tracemalloc) :
+#     - des 5 configurations 'clé sur porte' de Nimm_V1 : entraînement complet (SessionNimm) quand les 2 joueurs sont
+#       des IA ; sinon latence d'un coup de l'IA seule (jouer). La configuration humain / humain n'a pas d'IA et n'est
+#       pas mesurée
+#     - de l'entraînement optimal / renforcement et optimal / fonction de valeur sur des jeux de 8 à 100 allumettes
+#     - des points chauds de Nimm_V1 : tirage dans l'urne (tirage_boule) et mise à jour de la fonction de valeur
+#       (update_listes_fvaleur)
+#     - du neurone miam sur 10^3 à 10^6 pizzas : boucle du notebook, neurone_miam_lot, neurone_miam_bits et
+#       EntraineurMiam
+#
+# Chaque mesure garde la meilleure de plusieurs répétitions (la mémoire est mesurée à part, tracemalloc ralentissant
+# l'exécution). Les résultats peuvent être enregistrés comme référence (JSON), puis comparés à la référence lors des
+# exécutions suivantes : un débit plus faible, ou une latence ou une mémoire plus grande, de plus de seuil (10% par
+# défaut) est signalé comme régression et le programme se termine avec le code 1.
+#
+# La référence banc_essai_reference.json est fournie avec le dépôt. Elle a été mesurée sur la machine décrite par sa
+# clé _machine (système, processeur, nombre de processeurs, versions de Python et NumPy, date). Débits et latences
+# dépendent de la machine : sur une autre machine, un avertissement est affiché, et la référence doit être
+# réenregistrée (--enregistrer) avant de comparer. Sans référence, le programme se termine avec le code 2.
+#
+# Utilisation :
+#     python banc_essai.py --enregistrer        # mesure et enregistre la référence
+#     python banc_essai.py                      # mesure et compare à la référence
+#     python banc_essai.py --rapide --filtre nimm
+# """
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tracemalloc
+from copy import deepcopy
+from datetime import date
+from time import perf_counter
+
+import numpy as np
+
+from Nimm_V1 import jouer, initialiser_matrice, update_listes_fvaleur
+from neurone_miam import neurone_miam, neurone_miam_lot, neurone_miam_bits, empaqueter
+from neurone_miam_entrainement import EntraineurMiam
+from nimm_aleatoire import FluxAleatoire
+from nimm_session import SessionNimm
+from nimm_urne import tirage_boule
+
+REFERENCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'banc_essai_reference.json')
+GRAINE = 0
+
+# Les 5 configurations 'clé sur porte' de Nimm_V1 (le nombre de manches est celui de Nimm_V1, il n'est pas utilisé)
+CLE_SUR_PORTE = {
+    'optimal / renforcement': [[12, 3, 1000], [1, 1, None, "IA 1", [1.0, 0.05, 0.996, 5, 0.001]],
+                               [1, 3, 0, "IA 2", [1.0, 0.05, 0.996, 5, 0.001]]],
+    'humain / optimal': [[12, 3, 5], [0, None, None, "", [1.0, 0.05, 0.996, 5, 0.001]],
+                         [1, 1, None, "IA 2", [1.0, 0.05, 0.996, 5, 0.001]]],
+    'humain / humain': [[12, 3, 5], [0, None, None, "", [1.0, 0.05, 0.996, 5, 0.001]],
+                        [0, None, None, "", [1.0, 0.05, 0.996, 5, 0.001]]],
+    'optimal / fonction valeur': [[12, 3, 20000], [1, 1, None, "IA 1", [1.0, 0.05, 0.996, 20, 0.001]],
+                                  [1, 3, 1, "IA 2", [1.0, 0.05, 0.996, 20, 0.001]]],
+    'fonction valeur / renforcement': [[12, 3, 20000], [1, 3, 1, "IA 1", [1.0, 0.05, 0.996, 20, 0.001]],
+                                       [1, 3, 0, "IA 2", [1.0, 0.05, 0.996, 20, 0.001]]],
+}
+ALLUMETTES = (8, 12, 25, 50, 100)
+PIZZAS = (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6)
+
+
+class _CompteurCoups:
+    """ Remplace MetriquesEntrainement dans une session : compte seulement les coups joués """
+
+    def __init__(self):
+        self.coups = 0
+
+    def enregistrer(self, session, gagnant, nbre_coups):
+        self.coups += nbre_coups
+
+
+def _entrainement(parametres, nbre_manches):
+    """ Entraîne une session de nbre_manches manches ; retourne (manches, coups) """
+
+    compteur = _CompteurCoups()
+    SessionNimm(parametres, metriques=compteur, graine=GRAINE).entrainer(nbre_manches)
+    return nbre_manches, compteur.coups
+
+
+def _coups_ia(parametres, nbre_coups):
+    """ Joue nbre_coups coups des IA de parametres depuis toutes les positions possibles ; retourne (coups, coups) """
+
+    parametres = deepcopy(parametres)
+    allumettes_en_jeu, max_allumettes = parametres[0][0], parametres[0][1]
+    boules = initialiser_matrice('renforcement', parametres[1][2] == 0, parametres[2][2] == 0, allumettes_en_jeu,
+                                 max_allumettes)
+    etats = initialiser_matrice('fonction de valeur', parametres[1][2] == 1, parametres[2][2] == 1,
+                                allumettes_en_jeu, max_allumettes)
+    joueurs = [j for j in (1, 2) if parametres[j][0] == 1]
+    alea = FluxAleatoire(GRAINE)
+    historique = [[], []]
+    for coup in range(nbre_coups):
+        if coup % allumettes_en_jeu == 0:
+            historique[0].clear()
+            historique[1].clear()
+        jouer(joueurs[coup % len(joueurs)], coup % allumettes_en_jeu + 1, parametres, boules, etats, historique,
+              alea)
+    return nbre_coups, nbre_coups
+
+
+def _tirages_urne(max_allumettes, nbre_tirages):
+    """ nbre_tirages tirages dans une urne de max_allumettes couleurs ; retourne (tirages, tirages) """
+
+    alea = FluxAleatoire(GRAINE)
+    urne = [2 + 3 * couleur for couleur in range(max_allumettes)]
+    for _ in range(nbre_tirages):
+        tirage_boule(urne, False, alea)
+    return nbre_tirages, nbre_tirages
+
+
+def _fvaleur(allumettes_en_jeu, nbre_manches):
+    """ nbre_manches mises à jour de fin de manche des 2 IA par fonction de valeur ; retourne (manches, états) """
+
+    parametres = [[allumettes_en_jeu, 3, 0], [1, 3, 1, "IA 1", [1.0, 0.05, 0.996, 20, 0.001]],
+                  [1, 3, 1, "IA 2", [1.0, 0.05, 0.996, 20, 0.001]]]
+    etats = initialiser_matrice('fonction de valeur', True, True, allumettes_en_jeu, 3)
+    # une manche où chaque joueur retire 1 allumette à tour de rôle
+    historique = [list(range(allumettes_en_jeu - 1, -1, -2)), list(range(allumettes_en_jeu - 2, -1, -2))]
+    for manche in range(nbre_manches):
+        update_listes_fvaleur(manche % 2 + 1, parametres, etats, historique)
+    return nbre_manches, nbre_manches * allumettes_en_jeu
+
+
+def _pizzas(nbre_pizzas, nombre_ingredients=20):
+    """ Jeu de pizzas séparable (matrice, étiquettes, poids) de graine fixe """
+
+    rng = np.random.default_rng(GRAINE)
+    matrice = (rng.random((nbre_pizzas, nombre_ingredients)) < 0.3).astype(np.uint8)
+    poids = rng.integers(-3, 4, nombre_ingredients)
+    return matrice, (matrice @ poids > 0).astype(np.uint8), poids.tolist()
+
+
+def _boucle_notebook(pizzas, poids):
+    """ neurone_miam appelée pizza par pizza ; retourne (pizzas, pizzas) """
+
+    nombre_ingredients = len(poids)
+    for pizza in pizzas:
+        neurone_miam(nombre_ingredients, pizza, poids, 1)
+    return len(pizzas), len(pizzas)
+
+
+def _lot(fonction, entree, poids):
+    """ Notation vectorisée de toutes les pizzas ; retourne (pizzas, pizzas) """
+
+    fonction(entree, poids, 1)
+    return len(entree), len(entree)
+
+
+def _entraineur(matrice, etiquettes):
+    """ Entraînement par époques jusqu'à convergence ; retourne (pizzas, pizzas x époques) """
+
+    resultats = EntraineurMiam(matrice.shape[1], graine=GRAINE).entrainer_matrice(matrice, etiquettes)
+    return len(matrice), len(matrice) * resultats['epoques']
+
+
+def cas(rapide=False):
+    """ Liste des mesures (nom, unité, fonction sans argument retournant (unités, opérations)) """
+
+    facteur = 10 if rapide else 1
+    mesures = []
+    for nom, parametres in CLE_SUR_PORTE.items():
+        if parametres[1][0] == 1 and parametres[2][0] == 1:
+            mesures.append(('nimm/cle_sur_porte/' + nom, 'manches',
+                            lambda p=parametres: _entrainement(p, 20000 // facteur)))
+        elif parametres[1][0] == 1 or parametres[2][0] == 1:
+            mesures.append(('nimm/cle_sur_porte/' + nom + ' (coup IA)', 'coups',
+                            lambda p=parametres: _coups_ia(p, 200000 // facteur)))
+
+    for allumettes_en_jeu in ALLUMETTES:
+        for nom in ('optimal / renforcement', 'optimal / fonction valeur'):
+            parametres = deepcopy(CLE_SUR_PORTE[nom])
+            parametres[0][0] = allumettes_en_jeu
+            mesures.append(('nimm/allumettes_%d/%s' % (allumettes_en_jeu, nom), 'manches',
+                            lambda p=parametres, n=allumettes_en_jeu: _entrainement(p, 100000 // n // facteur)))
+
+    mesures.append(('nimm/points_chauds/tirage_boule', 'tirages', lambda: _tirages_urne(3, 200000 // facteur)))
+    for allumettes_en_jeu in (12, 100):
+        mesures.append(('nimm/points_chauds/update_listes_fvaleur_%d' % allumettes_en_jeu, 'manches',
+                        lambda n=allumettes_en_jeu: _fvaleur(n, 200000 // n // facteur)))
+
+    for nbre_pizzas in PIZZAS[:-1] if rapide else PIZZAS:
+        donnees = {}
+
+        def pizzas(nbre_pizzas=nbre_pizzas, donnees=donnees):
+            """ Jeu de pizzas construit à la première mesure qui l'utilise """
+
+            if not donnees:
+                matrice, etiquettes, poids = _pizzas(nbre_pizzas)
+                donnees.update(matrice=matrice, etiquettes=etiquettes, poids=poids, bits=empaqueter(matrice),
+                               listes=matrice[:10 ** 4].tolist())
+            return donnees
+
+        if nbre_pizzas <= 10 ** 4:  # la boucle du notebook est trop lente au-delà
+            mesures.append(('miam/pizzas_%d/boucle_notebook' % nbre_pizzas, 'pizzas',
+                            lambda d=pizzas: _boucle_notebook(d()['listes'], d()['poids'])))
+        mesures.append(('miam/pizzas_%d/neurone_miam_lot' % nbre_pizzas, 'pizzas',
+                        lambda d=pizzas: _lot(neurone_miam_lot, d()['matrice'], d()['poids'])))
+        mesures.append(('miam/pizzas_%d/neurone_miam_bits' % nbre_pizzas, 'pizzas',
+                        lambda d=pizzas: _lot(neurone_miam_bits, d()['bits'], d()['poids'])))
+        mesures.append(('miam/pizzas_%d/EntraineurMiam' % nbre_pizzas, 'pizzas',
+                        lambda d=pizzas: _entraineur(d()['matrice'], d()['etiquettes'])))
+    return mesures
+
+
+def mesurer(fonction, repetitions=3):
+    """ Meilleure des repetitions exécutions : débit (unités/s), latence par opération (µs), mémoire maximale (Mo) """
+
+    fonction()  # préchauffage : caches, imports, données construites à la première utilisation
+    duree = float('inf')
+    for _ in range(repetitions):
+        debut = perf_counter()
+        unites, operations = fonction()
+        duree = min(duree, perf_counter() - debut)
+
+    tracemalloc.start()
+    fonction()
+    memoire = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'debit': unites / duree, 'latence_us': 1e6 * duree / operations, 'memoire_mo': memoire / 2 ** 20}
+
+
+def machine():
+    """ Description de la machine de mesure, enregistrée avec la référence """
+
+    processeurs = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    return {'systeme': platform.platform(), 'processeur': platform.processor() or platform.machine(),
+            'processeurs': processeurs, 'python': platform.python_version(), 'numpy': np.__version__,
+            'date': date.today().isoformat()}
+
+
+def comparer(resultats, reference, seuil=0.1):
+    """ Liste des régressions (nom, grandeur, référence, valeur) de plus de seuil par rapport à la référence """
+
+    regressions = []
+    for nom, mesure in resultats.items():
+        if nom not in reference:
+            continue
+        ancienne = reference[nom]
+        grandeurs = ['latence_us', 'memoire_mo']
+        if mesure['debit'] < ancienne['debit'] * (1 - seuil):
+            regressions.append((nom, 'debit', ancienne['debit'], mesure['debit']))
+            grandeurs.remove('latence_us')  # même durée mesurée : déjà signalée par le débit
+        for grandeur in grandeurs:
+            # les mémoires de moins de 1 Mo varient trop d'une exécution à l'autre pour être comparées
+            if grandeur == 'memoire_mo' and max(mesure[grandeur], ancienne[grandeur]) < 1:
+                continue
+            if mesure[grandeur] > ancienne[grandeur] * (1 + seuil):
+                regressions.append((nom, grandeur, ancienne[grandeur], mesure[grandeur]))
+    return regressions
+
+
+def executer(rapide=False, filtre=None, repetitions=3, affichage=True):
+    """ Exécute les mesures dont le nom contient filtre ; retourne {nom: mesure} """
+
+    resultats = {}
+    for nom, unite, fonction in cas(rapide):
+        if filtre is not None and filtre not in nom:
+            continue
+        mesure = mesurer(fonction, repetitions)
+        mesure['unite'] = unite
+        resultats[nom] = mesure
+        if affichage:
+            print('%-62s %12.0f %s/s %10.3f µs %8.1f Mo' % (nom, mesure['debit'], unite, mesure['latence_us'],
+                                                             mesure['memoire_mo']))
+    return resultats
+
+
+def main(arguments=None):
+    analyseur = argparse.ArgumentParser(description="Banc d'essai du jeu de Nimm et du neurone miam")
+    analyseur.add_argument('--reference', default=REFERENCE, help='fichier JSON des mesures de référence')
+    analyseur.add_argument('--enregistrer', action='store_true', help='enregistre les mesures comme référence')
+    analyseur.add_argument('--seuil', type=float, default=0.1, help='écart relatif signalé comme régression')
+    analyseur.add_argument('--rapide', action='store_true', help='tailles réduites (10 fois moins de manches)')
+    analyseur.add_argument('--filtre', help='ne mesure que les cas dont le nom contient ce texte')
+    analyseur.add_argument('--repetitions', type=int, default=3)
+    arguments = analyseur.parse_args(arguments)
+
+    resultats = executer(arguments.rapide, arguments.filtre, arguments.repetitions)
+
+    if arguments.enregistrer:
+        reference = {}
+        if os.path.exists(arguments.reference):  # les cas non mesurés cette fois sont conservés
+            with open(arguments.reference, encoding='utf-8') as fichier:
+                reference = json.load(fichier)
+        reference.update(resultats)
+        reference['_machine'] = machine()
+        with open(arguments.reference, 'w', encoding='utf-8') as fichier:
+            json.dump(reference, fichier, indent=1, sort_keys=True)
+        print('Référence enregistrée dans', arguments.reference)
+        return 0
+
+    if not os.path.exists(arguments.reference):
+        print('Pas de référence (' + arguments.reference + ') : aucune comparaison. Lancer avec --enregistrer pour '
+              'en créer une sur cette machine')
+        return 2
+    with open(arguments.reference, encoding='utf-8') as fichier:
+        reference = json.load(fichier)
+    reference_machine, cette_machine = reference.get('_machine', {}), machine()
+    print()
+    print('Référence mesurée sur : ' + ', '.join(str(valeur) for valeur in reference_machine.values()))
+    if any(reference_machine.get(cle) != cette_machine[cle] for cle in ('systeme', 'processeur', 'processeurs')):
+        description = ', '.join(str(valeur) for cle, valeur in cette_machine.items() if cle != 'date')
+        print('ATTENTION : autre machine (' + description + ') : les écarts mesurent surtout la différence de machine ; réenregistrer la référence ici '
+              '(--enregistrer) avant de comparer')
+    regressions = comparer(resultats, reference, arguments.seuil)
+    print()
+    for nom, grandeur, ancienne, nouvelle in regressions:
+        print('RÉGRESSION %-58s %-11s %12.3f -> %12.3f (%+.1f%%)' % (nom, grandeur, ancienne, nouvelle,
+                                                                       100 * (nouvelle / ancienne - 1)))
+    print(str(len(regressions)) + ' régression(s) au-delà de ' + str(int(100 * arguments.seuil)) + '%')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
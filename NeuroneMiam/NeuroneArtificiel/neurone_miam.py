@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+# """
+# Neurone miam - Fonctions du notebook NeuroneArtificiel.ipynb et calcul par lots
+#
+# neurone_miam, entrainement_avec_bonne_pizza et entrainement_avec_mauvaise_pizza sont celles du notebook : une pizza
+# à la fois, boucle Python sur les ingrédients.
+#
+# Pour noter tout un catalogue de pizzas d'un coup (NumPy) :
+#     - neurone_miam_lot   : matrice 0/1 (pizzas x ingrédients), un produit matrice-vecteur par bloc de pizzas
+#     - neurone_miam_bits  : même matrice empaquetée en bits (empaqueter), 8 fois moins de mémoire ; chaque octet
+#                            d'une pizza est remplacé par la somme des poids de ses 8 ingrédients, lue dans une table
+#                            de 256 valeurs par octet
+#     - neurone_miam_creux : catalogue creux (beaucoup d'ingrédients, peu par pizza) donné par la liste des
+#                            ingrédients de chaque pizza (creuser) ; coût proportionnel au nombre d'ingrédients
+#                            présents, et non au nombre d'ingrédients possibles
+# Les 3 fonctions retournent le tableau des activations (0 ou 1) de toutes les pizzas. Les sommes sont calculées en
+# float64 : le résultat est exact pour des poids entiers, comme ceux de l'apprentissage +1/-1.
+#
+# Utilisation :
+#     activations = neurone_miam_lot([[1, 0, 0, 1, 0], [0, 1, 1, 0, 0]], [1, 1, -2, 1, -3], 1)  # [1, 0]
+# """
+
+import numpy as np
+
+
+def neurone_miam(nombre_ingredients,
+                 liste_neurone_ingredients,
+                 liste_poids_synaptiques_ingredients,
+                 seuil_neurone_miam):
+    """ Activation (0 ou 1) du neurone miam pour une pizza """
+
+    somme_activation = 0
+
+    for i in range(0, nombre_ingredients):
+        somme_activation = somme_activation + liste_neurone_ingredients[i] * liste_poids_synaptiques_ingredients[i]
+
+    activation_miam = 0
+    if somme_activation > seuil_neurone_miam:
+        activation_miam = 1
+
+    return activation_miam
+
+
+def entrainement_avec_bonne_pizza(nombre_ingredients,
+                                  liste_neurone_ingredients,
+                                  liste_poids_synaptiques_ingredients,
+                                  seuil_neurone_miam
+                                  ):
+    """ Corrige le neurone si une bonne pizza n'est pas reconnue ; retourne les poids et le seuil """
+
+    # On calcule l'activation du neurone miam pour les ingrédients donnés (étapes 1-5 de l'activité 2)
+    activation_miam = neurone_miam(nombre_ingredients=nombre_ingredients,
+                                   liste_neurone_ingredients=liste_neurone_ingredients,
+                                   liste_poids_synaptiques_ingredients=liste_poids_synaptiques_ingredients,
+                                   seuil_neurone_miam=seuil_neurone_miam)
+
+    # Si le neurone ne s'active pas, alors il faut corriger le neurone
+    if activation_miam == 0:
+
+        # Pour chaque ingrédient
+        for ingredient in range(nombre_ingredients):
+
+            # Si l'ingrédient est présent, on augmente de 1 le poids synaptique (étape 6 de l'activité 2)
+            if liste_neurone_ingredients[ingredient] == 1:
+                liste_poids_synaptiques_ingredients[ingredient] = liste_poids_synaptiques_ingredients[ingredient] + 1
+
+        # Et on diminue de 1 le seuil d'activité (étape 7 de l'activité 2)
+        seuil_neurone_miam = seuil_neurone_miam - 1
+
+    # La fonction renvoie la liste des poids synaptiques et le seuil d'activité éventuellement corrigés
+    return (liste_poids_synaptiques_ingredients, seuil_neurone_miam)
+
+
+def entrainement_avec_mauvaise_pizza(nombre_ingredients,
+                                     liste_neurone_ingredients,
+                                     liste_poids_synaptiques_ingredients,
+                                     seuil_neurone_miam
+                                     ):
+    """ Corrige le neurone si une mauvaise pizza est reconnue comme bonne ; retourne les poids et le seuil """
+
+    # On calcule l'activation du neurone miam pour les ingrédients donnés (étapes 1-5 de l'activité 2)
+    activation_miam = neurone_miam(nombre_ingredients=nombre_ingredients,
+                                   liste_neurone_ingredients=liste_neurone_ingredients,
+                                   liste_poids_synaptiques_ingredients=liste_poids_synaptiques_ingredients,
+                                   seuil_neurone_miam=seuil_neurone_miam)
+
+    # Si le neurone s'active, alors il faut corriger le neurone
+    if activation_miam == 1:
+
+        # Pour chaque ingrédient
+        for ingredient in range(nombre_ingredients):
+
+            # Si l'ingrédient est présent, on diminue de 1 le poids synaptique (étape 6 de l'activité 2)
+            if liste_neurone_ingredients[ingredient] == 1:
+                liste_poids_synaptiques_ingredients[ingredient] = liste_poids_synaptiques_ingredients[ingredient] - 1
+
+        # Et on augmente de 1 le seuil d'activité (étape 7 de l'activité 2)
+        seuil_neurone_miam = seuil_neurone_miam + 1
+
+    # La fonction renvoie la liste des poids synaptiques et le seuil d'activité éventuellement corrigés
+    return (liste_poids_synaptiques_ingredients, seuil_neurone_miam)
+
+
+def neurone_miam_lot(matrice_ingredients, liste_poids_synaptiques_ingredients, seuil_neurone_miam,
+                     taille_bloc=65536):
+    """ Activations (tableau uint8) de toutes les pizzas de matrice_ingredients (pizzas x ingrédients, 0/1)
+    Les pizzas sont converties en float64 par blocs de taille_bloc lignes, pour limiter la mémoire utilisée """
+
+    matrice = np.asarray(matrice_ingredients)
+    poids = np.asarray(liste_poids_synaptiques_ingredients, dtype=np.float64)
+    if matrice.ndim != 2 or matrice.shape[1] != len(poids):
+        raise ValueError("La matrice des ingrédients doit avoir une colonne par poids synaptique (" +
+                         str(len(poids)) + "), et non la forme " + str(matrice.shape))
+
+    activations = np.empty(len(matrice), dtype=np.uint8)
+    for debut in range(0, len(matrice), taille_bloc):
+        bloc = matrice[debut:debut + taille_bloc]
+        np.greater(bloc.astype(np.float64) @ poids, seuil_neurone_miam,
+                   out=activations[debut:debut + len(bloc)], casting='unsafe')
+    return activations
+
+
+def empaqueter(matrice_ingredients):
+    """ Matrice 0/1 (pizzas x ingrédients) empaquetée en bits : 8 ingrédients par octet, premier ingrédient sur le
+    bit de poids fort (numpy.packbits) """
+
+    return np.packbits(np.asarray(matrice_ingredients, dtype=bool), axis=1)
+
+
+def _tables_octets(liste_poids_synaptiques_ingredients, nombre_octets):
+    """ Pour chaque octet d'une pizza empaquetée, la somme des poids des ingrédients présents, pour les 256 valeurs
+    possibles de l'octet : tableau nombre_octets x 256 """
+
+    poids = np.zeros(8 * nombre_octets, dtype=np.float64)
+    poids[:len(liste_poids_synaptiques_ingredients)] = liste_poids_synaptiques_ingredients
+    bits = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1)  # 256 x 8
+    return poids.reshape(nombre_octets, 8) @ bits.T
+
+
+def neurone_miam_bits(pizzas_bits, liste_poids_synaptiques_ingredients, seuil_neurone_miam):
+    """ Activations (tableau uint8) des pizzas empaquetées par empaqueter """
+
+    pizzas_bits = np.asarray(pizzas_bits, dtype=np.uint8)
+    nombre_octets = pizzas_bits.shape[1]
+    if len(liste_poids_synaptiques_ingredients) > 8 * nombre_octets:
+        raise ValueError(str(len(liste_poids_synaptiques_ingredients)) + " poids synaptiques pour des pizzas de " +
+                         str(8 * nombre_octets) + " ingrédients au plus")
+
+    tables = _tables_octets(liste_poids_synaptiques_ingredients, nombre_octets)
+    somme_activation = np.zeros(len(pizzas_bits), dtype=np.float64)
+    for octet in range(nombre_octets):
+        somme_activation += tables[octet][pizzas_bits[:, octet]]
+    return (somme_activation > seuil_neurone_miam).view(np.uint8)
+
+
+def creuser(listes_ingredients):
+    """ Catalogue creux à partir de la liste des ingrédients (numéros) de chaque pizza : retourne (debuts,
+    ingredients), les ingrédients de la pizza i étant ingredients[debuts[i]:debuts[i + 1]] (format CSR) """
+
+    longueurs = np.fromiter((len(pizza) for pizza in listes_ingredients), dtype=np.int64,
+                            count=len(listes_ingredients))
+    debuts = np.zeros(len(longueurs) + 1, dtype=np.int64)
+    np.cumsum(longueurs, out=debuts[1:])
+    ingredients = np.fromiter((i for pizza in listes_ingredients for i in pizza), dtype=np.int64,
+                              count=int(debuts[-1]))
+    return debuts, ingredients
+
+
+def neurone_miam_creux(debuts, ingredients, liste_poids_synaptiques_ingredients, seuil_neurone_miam):
+    """ Activations (tableau uint8) d'un catalogue creux retourné par creuser : la somme d'activation d'une pizza
+    est la différence de 2 valeurs de la somme cumulée des poids de tous les ingrédients présents """
+
+    poids = np.asarray(liste_poids_synaptiques_ingredients, dtype=np.float64)
+    cumul = np.zeros(len(ingredients) + 1, dtype=np.float64)
+    np.cumsum(poids[ingredients], out=cumul[1:])
+    debuts = np.asarray(debuts)
+    somme_activation = cumul[debuts[1:]] - cumul[debuts[:-1]]
+    return (somme_activation > seuil_neurone_miam).view(np.uint8)
+
+
+if __name__ == '__main__':
+    # Débit comparé à la boucle du notebook, pizza par pizza (mesurée sur les 20000 premières pizzas)
+    from time import perf_counter
+
+    def mesurer(nom, fonction, nbre_pizzas):
+        debut = perf_counter()
+        activations = fonction()
+        pizzas_par_seconde = nbre_pizzas / (perf_counter() - debut)
+        print('  %-20s : %12.0f pizzas/s' % (nom, pizzas_par_seconde))
+        return np.asarray(activations, dtype=np.uint8), pizzas_par_seconde
+
+    rng = np.random.default_rng(0)
+    nbre_pizzas, nbre_boucle = 1000000, 20000
+
+    for nombre_ingredients, par_pizza in ((5, None), (64, None), (500, 6)):
+        if par_pizza is None:
+            matrice = (rng.random((nbre_pizzas, nombre_ingredients)) < 0.3).astype(np.uint8)
+            print('%d pizzas, %d ingrédients' % (nbre_pizzas, nombre_ingredients))
+        else:
+            listes = [rng.choice(nombre_ingredients, par_pizza, replace=False).tolist() for _ in range(nbre_pizzas)]
+            debuts, ingredients = creuser(listes)
+            matrice = np.zeros((nbre_pizzas, nombre_ingredients), dtype=np.uint8)
+            matrice[np.repeat(np.arange(nbre_pizzas), par_pizza), ingredients] = 1
+            print('%d pizzas, %d ingrédients, %d par pizza' % (nbre_pizzas, nombre_ingredients, par_pizza))
+        poids = rng.integers(-3, 4, nombre_ingredients).tolist()
+        echantillon = matrice[:nbre_boucle].tolist()
+        bits = empaqueter(matrice)
+
+        reference, boucle = mesurer('boucle neurone_miam', lambda: [
+            neurone_miam(nombre_ingredients, pizza, poids, 1) for pizza in echantillon], nbre_boucle)
+        calculs = [('neurone_miam_lot', lambda: neurone_miam_lot(matrice, poids, 1)),
+                   ('neurone_miam_bits', lambda: neurone_miam_bits(bits, poids, 1))]
+        if par_pizza is not None:
+            calculs.append(('neurone_miam_creux', lambda: neurone_miam_creux(debuts, ingredients, poids, 1)))
+        for nom, calcul in calculs:
+            activations, debit = mesurer(nom, calcul, nbre_pizzas)
+            if not np.array_equal(activations[:nbre_boucle], reference):
+                raise AssertionError(nom + " : activations différentes de la boucle du notebook")
+            print('  %-20s   x %.0f' % ('', debit / boucle))
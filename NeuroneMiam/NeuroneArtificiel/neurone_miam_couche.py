@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+# """
+# Neurone miam - Couche de plusieurs neurones miam
+#
+# Une couche contient un neurone miam par profil de goût (un par type de client, par exemple) : une matrice de poids
+# synaptiques (neurones x ingrédients) et un vecteur de seuils. Toutes les activations d'un lot de pizzas sont
+# calculées par un seul produit matriciel, et l'entraînement applique la règle du notebook à chaque neurone, pour
+# chaque pizza, en parallèle : les neurones qui se trompent sur une pizza sont corrigés ensemble (+1/-1 sur les
+# ingrédients présents, -1/+1 sur le seuil), les autres ne bougent pas.
+#
+# Les poids sont rangés en int8 (ou int16) : les corrections étant de +1/-1, ils restent petits. Si une correction
+# faisait dépasser le type, la matrice est élargie (int8 -> int16 -> int32 -> int64) avant la correction. Les sommes
+# d'activation sont calculées en float32 tant qu'elles sont exactes (moins de 2 ** 24), en float64 sinon.
+#
+# L'entraînement par époques suit neurone_miam_entrainement : la couche entière est notée d'un coup au début de chaque
+# époque, puis les pizzas sont parcourues par blocs notés avec les poids courants, et la couche est corrigée à la
+# première pizza d'un bloc où au moins un neurone se trompe. Chaque neurone obtient exactement les poids qu'il aurait
+# avec entrainement_avec_bonne_pizza / entrainement_avec_mauvaise_pizza appelées pizza par pizza.
+#
+# Utilisation :
+#     couche = CoucheMiam(3, 5)
+#     couche.entrainer(matrice_ingredients, etiquettes)  # etiquettes : pizzas x neurones, 1 bonne / 0 mauvaise
+#     couche.activations(catalogue)  # pizzas x neurones
+# """
+
+from time import perf_counter
+
+import numpy as np
+
+from neurone_miam_entrainement import _BLOC_MIN, _BLOC_MAX
+
+_TYPES_POIDS = (np.int8, np.int16, np.int32, np.int64)
+
+
+class CoucheMiam:
+    """ nombre_neurones neurones miam sur les mêmes nombre_ingredients ingrédients
+    poids : matrice initiale (neurones x ingrédients, zéros par défaut), seuils : vecteur initial (zéros par défaut)
+    type_poids : np.int8 ou np.int16, type initial de la matrice des poids """
+
+    def __init__(self, nombre_neurones, nombre_ingredients, poids=None, seuils=None, type_poids=np.int8, graine=None):
+        if type_poids not in _TYPES_POIDS:
+            raise ValueError("Type de poids non supporté : " + str(type_poids) + " (int8, int16, int32 ou int64)")
+        self.nombre_neurones = nombre_neurones
+        self.nombre_ingredients = nombre_ingredients
+        if poids is None:
+            self.poids = np.zeros((nombre_neurones, nombre_ingredients), dtype=type_poids)
+        else:
+            poids = np.asarray(poids)
+            if poids.shape != (nombre_neurones, nombre_ingredients):
+                raise ValueError("La matrice des poids doit avoir la forme " +
+                                 str((nombre_neurones, nombre_ingredients)) + ", et non " + str(poids.shape))
+            self.poids = poids.astype(type_poids)
+            if not np.array_equal(self.poids, poids):
+                raise ValueError("Les poids donnés ne tiennent pas dans le type " + np.dtype(type_poids).name)
+        self.seuils = np.zeros(nombre_neurones, dtype=np.int64) if seuils is None else np.array(seuils, dtype=np.int64)
+        self.rng = np.random.default_rng(graine)
+        self.corrections_par_epoque = []
+        self.converge = False
+        self.duree = 0.0
+
+    def _type_somme(self):
+        """ float32 si toutes les sommes d'activation possibles sont exactes en float32, float64 sinon """
+
+        borne = int(np.iinfo(self.poids.dtype).max) * self.nombre_ingredients
+        return np.float32 if borne < 2 ** 24 else np.float64
+
+    def _elargir(self):
+        """ Élargit le type des poids si une correction de +1/-1 peut le dépasser """
+
+        info = np.iinfo(self.poids.dtype)
+        if self.poids.max() >= info.max or self.poids.min() <= info.min:
+            self.poids = self.poids.astype(_TYPES_POIDS[_TYPES_POIDS.index(self.poids.dtype.type) + 1])
+
+    def activations(self, matrice_ingredients, taille_bloc=65536):
+        """ Activations (pizzas x neurones, uint8) de toutes les pizzas de matrice_ingredients (pizzas x ingrédients)
+        par blocs de taille_bloc pizzas """
+
+        matrice = np.asarray(matrice_ingredients)
+        if matrice.ndim != 2 or matrice.shape[1] != self.nombre_ingredients:
+            raise ValueError("La matrice des ingrédients doit avoir " + str(self.nombre_ingredients) +
+                             " colonnes, et non la forme " + str(matrice.shape))
+        type_somme = self._type_somme()
+        poids = self.poids.T.astype(type_somme)
+        activations = np.empty((len(matrice), self.nombre_neurones), dtype=np.uint8)
+        for debut in range(0, len(matrice), taille_bloc):
+            bloc = matrice[debut:debut + taille_bloc]
+            np.greater(bloc.astype(type_somme) @ poids, self.seuils, out=activations[debut:debut + len(bloc)],
+                       casting='unsafe')
+        return activations
+
+    def corriger(self, pizza, erreurs):
+        """ Corrige les neurones qui se trompent sur une pizza : erreurs vaut +1 pour une bonne pizza non reconnue,
+        -1 pour une mauvaise pizza reconnue comme bonne, 0 si le neurone a raison. Retourne la correction des poids
+        (neurones x ingrédients) """
+
+        self._elargir()
+        correction = np.multiply.outer(erreurs, pizza)
+        self.poids += correction.astype(self.poids.dtype)
+        self.seuils -= erreurs
+        return correction
+
+    def epoque(self, matrice, etiquettes, melanger=True):
+        """ Une passe sur tous les exemples (matrice pizzas x ingrédients, etiquettes pizzas x neurones) ; retourne
+        le nombre de corrections de neurones """
+
+        if np.array_equal(self.activations(matrice), etiquettes):
+            return 0
+
+        ordre = self.rng.permutation(len(matrice)) if melanger else np.arange(len(matrice))
+        type_somme = self._type_somme()
+        poids_reels = self.poids.T.astype(type_somme)
+        seuils = self.seuils
+        corrections = 0
+        position = 0
+        taille = _BLOC_MIN
+        while position < len(ordre):
+            indices = ordre[position:position + taille]
+            activations = matrice[indices].astype(type_somme) @ poids_reels > seuils
+            erreurs = etiquettes[indices] != activations
+            lignes = erreurs.any(axis=1).nonzero()[0]
+            if not lignes.size:
+                position += len(indices)
+                taille = min(2 * taille, _BLOC_MAX)
+                continue
+
+            # première pizza où au moins un neurone se trompe : on corrige ces neurones
+            ligne = lignes[0]
+            erreurs = etiquettes[indices[ligne]].astype(np.int64) - activations[ligne]
+            dtype = self.poids.dtype
+            poids_reels += self.corriger(matrice[indices[ligne]], erreurs).T
+            if self.poids.dtype != dtype and self._type_somme() is not type_somme:  # poids élargis
+                type_somme = self._type_somme()
+                poids_reels = self.poids.T.astype(type_somme)
+            corrections += int(np.count_nonzero(erreurs))
+            position += ligne + 1
+            taille = _BLOC_MIN
+        return corrections
+
+    def entrainer(self, matrice_ingredients, etiquettes, max_epoques=1000, melanger=True):
+        """ Enchaîne les époques jusqu'à une époque sans correction ou max_epoques époques, et retourne les
+        résultats de l'entraînement """
+
+        matrice = np.asarray(matrice_ingredients, dtype=np.uint8)
+        etiquettes = np.asarray(etiquettes, dtype=np.uint8).reshape(len(matrice), self.nombre_neurones)
+
+        debut = perf_counter()
+        self.converge = False
+        for _ in range(max_epoques):
+            corrections = self.epoque(matrice, etiquettes, melanger)
+            self.corrections_par_epoque.append(corrections)
+            if corrections == 0:
+                self.converge = True
+                break
+        self.duree += perf_counter() - debut
+        return self.resultats()
+
+    def resultats(self):
+        """ Dictionnaire des poids, des seuils et du déroulement de l'entraînement """
+
+        return {'poids': self.poids,
+                'seuils': self.seuils,
+                'epoques': len(self.corrections_par_epoque),
+                'converge': self.converge,
+                'corrections_par_epoque': self.corrections_par_epoque,
+                'duree': self.duree}
+
+
+if __name__ == '__main__':
+    # Une couche de nbre_neurones profils de goût contre nbre_neurones EntraineurMiam entraînés l'un après l'autre
+    from neurone_miam_entrainement import EntraineurMiam
+
+    rng = np.random.default_rng(0)
+    nombre_ingredients, nbre_pizzas = 30, 100000
+    for nbre_neurones in (8, 64):
+        poids_caches = rng.integers(-3, 4, (nbre_neurones, nombre_ingredients))
+        matrice = (rng.random((nbre_pizzas, nombre_ingredients)) < 0.3).astype(np.uint8)
+        etiquettes = (matrice @ poids_caches.T > 0).astype(np.uint8)  # séparables : sommes entières, seuil 0
+        print('%d neurones, %d pizzas, %d ingrédients' % (nbre_neurones, len(matrice), nombre_ingredients))
+
+        couche = CoucheMiam(nbre_neurones, nombre_ingredients)
+        resultats = couche.entrainer(matrice, etiquettes, melanger=False)
+        print('  CoucheMiam        : %6.2f s  %3d époques  poids %s (%d octets)' % (
+            resultats['duree'], resultats['epoques'], couche.poids.dtype, couche.poids.nbytes))
+
+        debut = perf_counter()
+        for j in range(nbre_neurones):
+            entraineur = EntraineurMiam(nombre_ingredients, melanger=False)
+            neurone = entraineur.entrainer_matrice(matrice, etiquettes[:, j])
+            if (neurone['liste_poids_synaptiques_ingredients'] != couche.poids[j].tolist() or
+                    neurone['seuil_neurone_miam'] != couche.seuils[j]):
+                raise AssertionError('Le neurone ' + str(j) + ' de la couche diffère de EntraineurMiam')
+        print('  EntraineurMiam x %d : %6.2f s' % (nbre_neurones, perf_counter() - debut))
+
+        debut = perf_counter()
+        activations = couche.activations(matrice)
+        print('  activations       : %6.0f pizzas x neurones / µs' % (
+            activations.size / (perf_counter() - debut) / 1e6))
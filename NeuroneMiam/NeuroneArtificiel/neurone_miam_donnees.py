@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+# """
+# Neurone miam - Jeux d'exemples sur disque
+#
+# Les exemples de pizzas (ingrédients 0/1 et étiquette : 1 bonne pizza, 0 mauvaise pizza) sont lus en CSV ou en JSONL
+# par blocs, puis convertis une fois pour toutes en un fichier binaire :
+#     - 'MIAM', le numéro de version du format, le nombre de pizzas (entier 64 bits) et le nombre d'ingrédients
+#     - une ligne par pizza : l'étiquette sur 1 octet, puis les ingrédients empaquetés en bits (neurone_miam.empaqueter)
+# Le fichier binaire est projeté en mémoire (numpy.memmap) : DonneesMiam.lot() ne lit que les pizzas du lot demandé.
+# Entraîner (EntraineurMiam.entrainer_donnees) ou noter (precision) un fichier plus grand que la mémoire n'utilise
+# donc qu'une mémoire proportionnelle à la taille des lots.
+#
+# Formats d'entrée :
+#     - CSV   : une pizza par ligne, les ingrédients (0 ou 1) puis l'étiquette ; une première ligne non numérique est
+#               un entête et est ignorée
+#     - JSONL : un objet par ligne, {"ingredients": [0, 1, 0, 1, 0], "bonne": 1}
+#
+# Utilisation :
+#     convertir('pizzas.csv', 'pizzas.miam')
+#     donnees = DonneesMiam('pizzas.miam')
+#     EntraineurMiam(donnees.nombre_ingredients).entrainer_donnees(donnees, taille_lot=65536)
+# """
+
+import csv
+import json
+import os
+import struct
+from itertools import chain, islice
+
+import numpy as np
+
+from neurone_miam import empaqueter, neurone_miam_bits
+
+MAGIE = b'MIAM'
+VERSION = 1
+_DEBUT = struct.Struct('<4sIQI4x')  # magie, version, nombre de pizzas, nombre d'ingrédients (24 octets)
+
+
+def lire_csv(chemin, taille_bloc=65536):
+    """ Blocs (matrice 0/1 des ingrédients, étiquettes) d'au plus taille_bloc pizzas lus dans un fichier CSV """
+
+    with open(chemin, encoding='utf-8', newline='') as fichier:
+        lignes = (ligne for ligne in csv.reader(fichier) if ligne)
+        premiere = next(lignes, None)
+        if premiere is None:
+            return
+        try:
+            premiere = [int(valeur) for valeur in premiere]
+        except ValueError:  # entête
+            premiere = None
+        lignes = (list(map(int, ligne)) for ligne in lignes)
+        if premiere is not None:
+            lignes = chain([premiere], lignes)
+        while True:
+            bloc = list(islice(lignes, taille_bloc))
+            if not bloc:
+                return
+            bloc = np.array(bloc, dtype=np.uint8)
+            yield bloc[:, :-1], bloc[:, -1]
+
+
+def lire_jsonl(chemin, taille_bloc=65536):
+    """ Blocs (matrice 0/1 des ingrédients, étiquettes) d'au plus taille_bloc pizzas lus dans un fichier JSONL """
+
+    with open(chemin, encoding='utf-8') as fichier:
+        objets = (json.loads(ligne) for ligne in fichier if ligne.strip())
+        while True:
+            bloc = list(islice(objets, taille_bloc))
+            if not bloc:
+                return
+            yield (np.array([objet['ingredients'] for objet in bloc], dtype=np.uint8),
+                   np.array([objet['bonne'] for objet in bloc], dtype=np.uint8))
+
+
+def ecrire(chemin, blocs):
+    """ Écrit dans chemin les blocs (matrice 0/1 des ingrédients, étiquettes) au format binaire, au fur et à mesure.
+    Le fichier est d'abord écrit à côté puis renommé. Retourne le nombre de pizzas écrites """
+
+    nombre_pizzas = 0
+    nombre_ingredients = None
+    temporaire = chemin + '.tmp'
+    with open(temporaire, 'wb') as fichier:
+        fichier.write(_DEBUT.pack(MAGIE, VERSION, 0, 0))  # réécrit à la fin, une fois les nombres connus
+        for matrice, etiquettes in blocs:
+            matrice = np.asarray(matrice, dtype=np.uint8)
+            if nombre_ingredients is None:
+                nombre_ingredients = matrice.shape[1]
+            elif matrice.shape[1] != nombre_ingredients:
+                raise ValueError("Pizza " + str(nombre_pizzas + 1) + " et suivantes : " + str(matrice.shape[1]) +
+                                 " ingrédients au lieu de " + str(nombre_ingredients))
+            if ((matrice > 1).any() or (np.asarray(etiquettes) > 1).any()):
+                raise ValueError("Pizza " + str(nombre_pizzas + 1) + " et suivantes : les ingrédients et les "
+                                 "étiquettes doivent valoir 0 ou 1")
+            lignes = np.empty((len(matrice), 1 + (nombre_ingredients + 7) // 8), dtype=np.uint8)
+            lignes[:, 0] = etiquettes
+            lignes[:, 1:] = empaqueter(matrice)
+            fichier.write(lignes.tobytes())
+            nombre_pizzas += len(matrice)
+        fichier.seek(0)
+        fichier.write(_DEBUT.pack(MAGIE, VERSION, nombre_pizzas, nombre_ingredients or 0))
+        fichier.flush()
+        os.fsync(fichier.fileno())
+    os.replace(temporaire, chemin)
+    return nombre_pizzas
+
+
+def convertir(source, destination, taille_bloc=65536):
+    """ Convertit un fichier CSV ou JSONL (d'après son extension) au format binaire ; retourne le nombre de pizzas """
+
+    extension = os.path.splitext(source)[1].lower()
+    if extension == '.csv':
+        return ecrire(destination, lire_csv(source, taille_bloc))
+    if extension in ('.jsonl', '.json'):
+        return ecrire(destination, lire_jsonl(source, taille_bloc))
+    raise ValueError(source + " : format non supporté (CSV ou JSONL)")
+
+
+class DonneesMiam:
+    """ Jeu d'exemples au format binaire, projeté en mémoire et lu par lots """
+
+    def __init__(self, chemin):
+        with open(chemin, 'rb') as fichier:
+            magie, version, nombre_pizzas, nombre_ingredients = _DEBUT.unpack(fichier.read(_DEBUT.size))
+        if magie != MAGIE:
+            raise ValueError(chemin + " n'est pas un fichier d'exemples de pizzas")
+        if version != VERSION:
+            raise ValueError(chemin + " : version " + str(version) + " non supportée")
+        self.chemin = chemin
+        self.nombre_pizzas = nombre_pizzas
+        self.nombre_ingredients = nombre_ingredients
+        self.lignes = np.memmap(chemin, dtype=np.uint8, mode='r', offset=_DEBUT.size,
+                                shape=(nombre_pizzas, 1 + (nombre_ingredients + 7) // 8)) if nombre_pizzas else (
+            np.zeros((0, 1 + (nombre_ingredients + 7) // 8), dtype=np.uint8))
+
+    def __len__(self):
+        return self.nombre_pizzas
+
+    def nombre_lots(self, taille_lot):
+        """ Nombre de lots de taille_lot pizzas (le dernier peut être plus petit) """
+
+        return -(-self.nombre_pizzas // taille_lot)
+
+    def lot_bits(self, numero, taille_lot):
+        """ Lot numero : (ingrédients empaquetés en bits, étiquettes), lus depuis le fichier """
+
+        lignes = self.lignes[numero * taille_lot:(numero + 1) * taille_lot]
+        return lignes[:, 1:], lignes[:, 0]
+
+    def lot(self, numero, taille_lot):
+        """ Lot numero : (matrice 0/1 des ingrédients, étiquettes) """
+
+        bits, etiquettes = self.lot_bits(numero, taille_lot)
+        return np.unpackbits(bits, axis=1, count=self.nombre_ingredients), np.array(etiquettes)
+
+    def lots(self, taille_lot=65536, bits=False):
+        """ Tous les lots, dans l'ordre du fichier """
+
+        lire_lot = self.lot_bits if bits else self.lot
+        for numero in range(self.nombre_lots(taille_lot)):
+            yield lire_lot(numero, taille_lot)
+
+
+def precision(donnees, liste_poids_synaptiques_ingredients, seuil_neurone_miam, taille_lot=65536):
+    """ Proportion des pizzas de donnees correctement reconnues par le neurone, lot par lot sans dépaqueter les
+    ingrédients (neurone_miam_bits) """
+
+    bien_reconnues = 0
+    for bits, etiquettes in donnees.lots(taille_lot, bits=True):
+        bien_reconnues += int(np.count_nonzero(
+            neurone_miam_bits(bits, liste_poids_synaptiques_ingredients, seuil_neurone_miam) == etiquettes))
+    return bien_reconnues / len(donnees) if len(donnees) else 1.0
+
+
+if __name__ == '__main__':
+    # Conversion CSV -> binaire, taille des fichiers, puis entraînement et notation par lots
+    import tempfile
+    import tracemalloc
+    from time import perf_counter
+
+    from neurone_miam_entrainement import EntraineurMiam
+
+    rng = np.random.default_rng(0)
+    nombre_ingredients, nbre_pizzas = 40, 1000000
+    poids_caches = rng.integers(-3, 4, nombre_ingredients)
+
+    with tempfile.TemporaryDirectory() as dossier:
+        source = os.path.join(dossier, 'pizzas.csv')
+        destination = os.path.join(dossier, 'pizzas.miam')
+        with open(source, 'w', encoding='utf-8', newline='') as fichier:
+            ecrivain = csv.writer(fichier)
+            ecrivain.writerow(['ingredient_' + str(i) for i in range(nombre_ingredients)] + ['bonne'])
+            for _ in range(nbre_pizzas // 100000):
+                matrice = (rng.random((100000, nombre_ingredients)) < 0.3).astype(np.uint8)
+                ecrivain.writerows(np.column_stack([matrice, matrice @ poids_caches > 0]).tolist())
+
+        debut = perf_counter()
+        convertir(source, destination)
+        print('conversion CSV -> binaire : %.1f s, %d Mo -> %d Mo' % (
+            perf_counter() - debut, os.path.getsize(source) >> 20, os.path.getsize(destination) >> 20))
+
+        donnees = DonneesMiam(destination)
+        tracemalloc.start()
+        entraineur = EntraineurMiam(nombre_ingredients, graine=0)
+        resultats = entraineur.entrainer_donnees(donnees, taille_lot=65536)
+        debut = perf_counter()
+        taux = precision(donnees, resultats['liste_poids_synaptiques_ingredients'], resultats['seuil_neurone_miam'])
+        duree_precision = perf_counter() - debut
+        pic = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print('entraînement par lots     : %.1f s, %d époques, corrections %s' % (
+            resultats['duree'], resultats['epoques'], resultats['corrections_par_epoque']))
+        print('précision                 : %.4f en %.2f s' % (taux, duree_precision))
+        print('mémoire maximale          : %.1f Mo pour %d pizzas' % (pic / 2 ** 20, len(donnees)))
+        del donnees
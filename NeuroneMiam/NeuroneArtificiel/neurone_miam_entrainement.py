@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+# """
+# Neurone miam - Entraînement par époques
+#
+# Même règle que entrainement_avec_bonne_pizza / entrainement_avec_mauvaise_pizza du notebook : une bonne pizza non
+# reconnue augmente de 1 le poids de ses ingrédients et diminue de 1 le seuil, une mauvaise pizza reconnue comme bonne
+# fait l'inverse. Une époque passe une fois sur tous les exemples, dans un ordre mélangé à chaque époque, et
+# l'entraînement s'arrête à la première époque sans correction (ou après max_epoques époques).
+#
+# Au début de chaque époque, toutes les pizzas sont notées d'un coup (neurone_miam_lot) : si aucune n'est mal
+# reconnue, l'entraînement est terminé. Sinon, les pizzas sont parcourues dans l'ordre de l'époque par blocs notés
+# d'un coup avec les poids courants ; à la première pizza mal reconnue d'un bloc, le neurone est corrigé et la suite
+# est notée avec les nouveaux poids. Le résultat est exactement celui de la boucle pizza par pizza du notebook (dans
+# le même ordre), mais le coût d'une époque dépend surtout du nombre de corrections, pas du nombre de pizzas. La
+# taille des blocs double tant qu'il n'y a pas d'erreur et revient au minimum après une correction.
+#
+# Utilisation :
+#     entraineur = EntraineurMiam(5)
+#     resultats = entraineur.entrainer(exemples_bonnes_pizzas, exemples_mauvaises_pizzas)
+#     resultats['liste_poids_synaptiques_ingredients'], resultats['seuil_neurone_miam'], resultats['epoques']
+# """
+
+from time import perf_counter
+
+import numpy as np
+
+from neurone_miam import neurone_miam_lot
+
+_BLOC_MIN = 64  # pizzas notées d'un coup juste après une correction
+_BLOC_MAX = 65536  # taille maximale d'un bloc, atteinte en doublant tant qu'il n'y a pas d'erreur
+
+
+def etiqueter(exemples_bonnes_pizzas, exemples_mauvaises_pizzas):
+    """ Jeu d'exemples (matrice 0/1 des ingrédients, étiquettes : 1 bonne pizza, 0 mauvaise pizza) """
+
+    bonnes = np.asarray(exemples_bonnes_pizzas, dtype=np.uint8).reshape(len(exemples_bonnes_pizzas), -1)
+    mauvaises = np.asarray(exemples_mauvaises_pizzas, dtype=np.uint8).reshape(len(exemples_mauvaises_pizzas), -1)
+    if bonnes.size and mauvaises.size and bonnes.shape[1] != mauvaises.shape[1]:
+        raise ValueError("Les bonnes et les mauvaises pizzas n'ont pas le même nombre d'ingrédients")
+    matrice = np.concatenate([bonnes, mauvaises]) if bonnes.size and mauvaises.size else (
+        bonnes if bonnes.size else mauvaises)
+    etiquettes = np.concatenate([np.ones(len(bonnes), dtype=np.uint8), np.zeros(len(mauvaises), dtype=np.uint8)])
+    return matrice, etiquettes
+
+
+class EntraineurMiam:
+    """ Entraîne un neurone miam (poids synaptiques et seuil) par époques jusqu'à ce qu'il ne fasse plus d'erreur
+    graine initialise le mélange des exemples ; melanger=False garde l'ordre des exemples (bonnes puis mauvaises) """
+
+    def __init__(self, nombre_ingredients, liste_poids_synaptiques_ingredients=None, seuil_neurone_miam=0,
+                 graine=None, melanger=True):
+        if liste_poids_synaptiques_ingredients is None:
+            liste_poids_synaptiques_ingredients = [0] * nombre_ingredients
+        if len(liste_poids_synaptiques_ingredients) != nombre_ingredients:
+            raise ValueError(str(len(liste_poids_synaptiques_ingredients)) + " poids synaptiques pour " +
+                             str(nombre_ingredients) + " ingrédients")
+        self.nombre_ingredients = nombre_ingredients
+        self.poids = np.array(liste_poids_synaptiques_ingredients, dtype=np.int64)
+        self.seuil = seuil_neurone_miam
+        self.rng = np.random.default_rng(graine)
+        self.melanger = melanger
+        self.corrections_par_epoque = []
+        self.converge = False
+        self.duree = 0.0
+
+    def epoque(self, matrice, etiquettes):
+        """ Une passe sur tous les exemples ; retourne le nombre de corrections """
+
+        activations = neurone_miam_lot(matrice, self.poids, self.seuil)
+        if np.array_equal(activations, etiquettes):  # aucune pizza mal reconnue : rien à corriger
+            return 0
+
+        ordre = self.rng.permutation(len(matrice)) if self.melanger else np.arange(len(matrice))
+        poids = self.poids
+        poids_reels = poids.astype(np.float64)
+        seuil = self.seuil
+        corrections = 0
+        position = 0
+        taille = _BLOC_MIN
+        while position < len(ordre):
+            indices = ordre[position:position + taille]
+            activations = matrice[indices].astype(np.float64) @ poids_reels > seuil
+            erreurs = np.flatnonzero(activations != etiquettes[indices])
+            if not erreurs.size:
+                position += len(indices)
+                taille = min(2 * taille, _BLOC_MAX)
+                continue
+
+            i = indices[erreurs[0]]  # première pizza mal reconnue : on corrige le neurone
+            if etiquettes[i]:  # bonne pizza reconnue comme mauvaise
+                poids += matrice[i]
+                seuil -= 1
+            else:  # mauvaise pizza reconnue comme bonne
+                poids -= matrice[i]
+                seuil += 1
+            poids_reels[:] = poids
+            corrections += 1
+            position += erreurs[0] + 1  # les pizzas suivantes sont notées avec les nouveaux poids
+            taille = _BLOC_MIN
+        self.seuil = seuil
+        return corrections
+
+    def entrainer(self, exemples_bonnes_pizzas, exemples_mauvaises_pizzas, max_epoques=1000):
+        """ Enchaîne les époques jusqu'à une époque sans correction ou max_epoques époques, et retourne les
+        résultats de l'entraînement """
+
+        matrice, etiquettes = etiqueter(exemples_bonnes_pizzas, exemples_mauvaises_pizzas)
+        return self.entrainer_matrice(matrice, etiquettes, max_epoques)
+
+    def entrainer_matrice(self, matrice, etiquettes, max_epoques=1000):
+        """ Comme entrainer, avec les exemples déjà sous forme de matrice 0/1 et d'étiquettes (voir etiqueter) """
+
+        matrice = np.asarray(matrice, dtype=np.uint8)
+        etiquettes = np.asarray(etiquettes, dtype=np.uint8)
+        if matrice.shape[1] != self.nombre_ingredients:
+            raise ValueError("Les pizzas ont " + str(matrice.shape[1]) + " ingrédients au lieu de " +
+                             str(self.nombre_ingredients))
+
+        debut = perf_counter()
+        self.converge = False
+        for _ in range(max_epoques):
+            corrections = self.epoque(matrice, etiquettes)
+            self.corrections_par_epoque.append(corrections)
+            if corrections == 0:
+                self.converge = True
+                break
+        self.duree += perf_counter() - debut
+        return self.resultats()
+
+    def entrainer_donnees(self, donnees, taille_lot=65536, max_epoques=1000):
+        """ Comme entrainer, avec les exemples lus lot par lot dans un fichier (neurone_miam_donnees.DonneesMiam) :
+        une époque passe sur tous les lots, dans un ordre mélangé, et mélange les pizzas à l'intérieur de chaque lot.
+        La mémoire utilisée ne dépend que de taille_lot """
+
+        if donnees.nombre_ingredients != self.nombre_ingredients:
+            raise ValueError("Les pizzas ont " + str(donnees.nombre_ingredients) + " ingrédients au lieu de " +
+                             str(self.nombre_ingredients))
+
+        debut = perf_counter()
+        self.converge = False
+        nombre_lots = donnees.nombre_lots(taille_lot)
+        for _ in range(max_epoques):
+            ordre = self.rng.permutation(nombre_lots) if self.melanger else range(nombre_lots)
+            corrections = 0
+            for numero in ordre:
+                corrections += self.epoque(*donnees.lot(numero, taille_lot))
+            self.corrections_par_epoque.append(corrections)
+            if corrections == 0:
+                self.converge = True
+                break
+        self.duree += perf_counter() - debut
+        return self.resultats()
+
+    def resultats(self):
+        """ Dictionnaire des poids, du seuil et du déroulement de l'entraînement """
+
+        return {'liste_poids_synaptiques_ingredients': self.poids.tolist(),
+                'seuil_neurone_miam': self.seuil,
+                'epoques': len(self.corrections_par_epoque),
+                'converge': self.converge,
+                'corrections_par_epoque': self.corrections_par_epoque,
+                'duree': self.duree}
+
+
+if __name__ == '__main__':
+    # Exemples du notebook, puis comparaison avec la boucle du notebook sur des exemples séparables générés
+    from neurone_miam import entrainement_avec_bonne_pizza, entrainement_avec_mauvaise_pizza
+
+    exemples_bonnes_pizzas = [[0, 1, 0, 1, 0], [1, 1, 0, 0, 0], [1, 0, 0, 1, 0]]
+    exemples_mauvaises_pizzas = [[0, 1, 1, 0, 0], [1, 0, 0, 0, 1], [0, 1, 0, 0, 0]]
+    resultats = EntraineurMiam(5, melanger=False).entrainer(exemples_bonnes_pizzas, exemples_mauvaises_pizzas)
+    print('notebook : poids %s, seuil %d, %d époques, corrections %s' % (
+        resultats['liste_poids_synaptiques_ingredients'], resultats['seuil_neurone_miam'], resultats['epoques'],
+        resultats['corrections_par_epoque']))
+
+    def boucle_notebook(bonnes, mauvaises, nombre_ingredients, max_epoques=1000):
+        """ Boucle while du notebook : bonnes puis mauvaises pizzas, une par une, jusqu'à ne plus rien corriger """
+
+        liste_poids_synaptiques_ingredients = [0] * nombre_ingredients
+        seuil_neurone_miam = 0
+        for epoque in range(1, max_epoques + 1):
+            corrections = 0
+            for exemples, entrainement in ((bonnes, entrainement_avec_bonne_pizza),
+                                           (mauvaises, entrainement_avec_mauvaise_pizza)):
+                for pizza in exemples:
+                    liste_poids_synaptiques_ingredients, nouveau_seuil = entrainement(
+                        nombre_ingredients, pizza, liste_poids_synaptiques_ingredients, seuil_neurone_miam)
+                    corrections += nouveau_seuil != seuil_neurone_miam
+                    seuil_neurone_miam = nouveau_seuil
+            if corrections == 0:
+                break
+        return liste_poids_synaptiques_ingredients, seuil_neurone_miam, epoque
+
+    rng = np.random.default_rng(0)
+    nombre_ingredients = 20
+    poids_caches = rng.integers(-3, 4, nombre_ingredients)
+    for nbre_exemples in (10000, 100000, 1000000):
+        matrice = (rng.random((nbre_exemples, nombre_ingredients)) < 0.3).astype(np.uint8)
+        sommes = matrice @ poids_caches
+        separables = sommes != 0  # une marge de 1 autour du seuil 0
+        matrice, etiquettes = matrice[separables], (sommes[separables] > 0).astype(np.uint8)
+        ordre = np.argsort(-etiquettes, kind='stable')  # bonnes puis mauvaises pizzas, comme le notebook
+        matrice, etiquettes = matrice[ordre], etiquettes[ordre]
+        print('%d exemples, %d ingrédients' % (len(matrice), nombre_ingredients))
+
+        for melanger in (True, False):
+            resultats = EntraineurMiam(nombre_ingredients, graine=0, melanger=melanger).entrainer_matrice(
+                matrice, etiquettes)
+            print('  EntraineurMiam %-9s : %7.2f s  %3d époques (convergé : %s)  corrections %s' % (
+                'mélangé' if melanger else 'en ordre', resultats['duree'], resultats['epoques'],
+                resultats['converge'], resultats['corrections_par_epoque'][:3] + ['...']))
+
+        if nbre_exemples <= 10000:
+            debut = perf_counter()
+            poids, seuil, epoques = boucle_notebook(matrice[etiquettes == 1].tolist(),
+                                                    matrice[etiquettes == 0].tolist(), nombre_ingredients)
+            print('  boucle notebook          : %7.2f s  %3d époques' % (perf_counter() - debut, epoques))
+            if (poids, seuil, epoques) != (resultats['liste_poids_synaptiques_ingredients'],
+                                           resultats['seuil_neurone_miam'], resultats['epoques']):
+                raise AssertionError("L'entraînement en ordre diffère de la boucle du notebook")
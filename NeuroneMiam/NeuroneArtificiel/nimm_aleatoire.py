@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# """
+# Jeu de Nimm - Flux de nombres aléatoires reproductibles
+#
+# Un FluxAleatoire est un générateur initialisé par une graine, qui remplace pour une session, un joueur ou un processus
+# les fonctions random() et randint() du module random :
+#     - même graine => même suite de nombres, donc mêmes tables boules / etats en fin d'entraînement
+#     - enfant(cle, ...) crée un flux indépendant, dont la graine est dérivée de celle du parent et des clés : un flux
+#       par joueur, par processus, ... sans qu'un joueur ou un processus influence les tirages des autres
+#     - les nombres uniformes sont tirés par blocs (NumPy si disponible, sinon random.Random) : random() et randint()
+#       ne font que lire le bloc en cours
+#
+# La même graine donne la même suite sur toutes les machines ayant le même moteur (NumPy ou non).
+# """
+
+import hashlib
+import secrets
+from itertools import chain, islice
+
+try:
+    import numpy as np
+except ImportError:  # sans NumPy, les blocs sont tirés avec random.Random
+    np = None
+    from random import Random
+
+
+class FluxAleatoire:
+    """ Générateur de nombres aléatoires ayant les méthodes random() et randint(a, b) du module random
+    random est la méthode __next__ d'un itérateur sur les blocs successifs : un tirage ne passe par aucune fonction
+    Python, sauf une fois par bloc pour tirer le bloc suivant """
+
+    __slots__ = ('entropie', 'taille_bloc', 'generateur', 'etat_bloc', 'courant', 'random')
+
+    def __init__(self, graine=None, taille_bloc=4096):
+        self.entropie = secrets.randbits(128) if graine is None else graine
+        self.taille_bloc = taille_bloc
+        if np is not None:
+            self.generateur = np.random.Generator(np.random.PCG64(self.entropie))
+        else:
+            self.generateur = Random(self.entropie)
+        self.etat_bloc = None  # état du générateur avant le tirage du bloc en cours
+        self.courant = None  # itérateur sur le bloc en cours
+        self.random = chain.from_iterable(self._blocs()).__next__
+
+    def enfant(self, *cles):
+        """ Flux indépendant dérivé de ce flux et des clés (entiers ou chaînes), par exemple enfant('joueur', 1) """
+
+        empreinte = hashlib.sha256(repr((self.entropie,) + cles).encode('utf-8')).digest()
+        return FluxAleatoire(int.from_bytes(empreinte[:16], 'little'), self.taille_bloc)
+
+    def _tirer_bloc(self):
+        """ Tire un bloc de nombres uniformes dans [0, 1[ et en retourne un itérateur """
+
+        if np is not None:
+            self.etat_bloc = self.generateur.bit_generator.state
+            bloc = self.generateur.random(self.taille_bloc).tolist()
+        else:
+            self.etat_bloc = self.generateur.getstate()
+            aleatoire = self.generateur.random
+            bloc = [aleatoire() for _ in range(self.taille_bloc)]
+        self.courant = iter(bloc)
+        return self.courant
+
+    def _blocs(self):
+        """ Suite infinie des blocs, tirés au fur et à mesure des besoins """
+
+        while True:
+            yield self._tirer_bloc()
+
+    def randint(self, a, b):
+        """ Entier uniforme entre a et b inclus """
+
+        return a + int(self.random() * (b - a + 1))
+
+    def getstate(self):
+        """ État du flux, sérialisable en JSON """
+
+        position = 0 if self.courant is None else self.taille_bloc - self.courant.__length_hint__()
+        return {'entropie': self.entropie, 'taille_bloc': self.taille_bloc, 'etat_bloc': self.etat_bloc,
+                'position': position}
+
+    def setstate(self, etat):
+        """ Rétablit un état retourné par getstate """
+
+        self.__init__(etat['entropie'], etat['taille_bloc'])
+        if etat['etat_bloc'] is not None:
+            if np is not None:
+                self.generateur.bit_generator.state = etat['etat_bloc']
+            else:
+                version, interne, gauss_suivant = etat['etat_bloc']
+                self.generateur.setstate((version, tuple(interne), gauss_suivant))
+            courant = self._tirer_bloc()
+            next(islice(courant, etat['position'], etat['position']), None)  # nombres déjà utilisés
+            self.random = chain.from_iterable(chain([courant], self._blocs())).__next__
+
+    @classmethod
+    def depuis_etat(cls, etat):
+        """ Recrée un flux à partir d'un état retourné par getstate """
+
+        flux = cls.__new__(cls)
+        flux.setstate(etat)
+        return flux
+
+
+if __name__ == '__main__':
+    # Coût d'un tirage : fonctions du module random contre lecture d'un bloc
+    import random
+    from timeit import timeit
+
+    flux = FluxAleatoire(0)
+    nbre = 1000000
+    for instruction in ('random.randint(1, 3)', 'flux.randint(1, 3)', 'random.random()', 'flux.random()'):
+        print('%-20s : %6.1f ns / tirage' % (instruction, 1e9 * timeit(instruction, number=nbre, globals=globals()) / nbre))
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# """
+# Jeu de Nimm - Balayage des hyperparamètres de l'apprentissage par fonction de valeur
+#
+# Les 5 valeurs de parametres[j][4] (epsilon-greedy, epsilon-greedy minimum, facteur de réduction, période,
+# learning rate) et la taille du jeu (parametres[0][0], parametres[0][1]) sont explorées sur une grille ou par tirage
+# aléatoire. Chaque configuration est entraînée contre l'IA optimale avec plusieurs graines, sur un ensemble de
+# processus, puis les configurations sont classées par nombre de manches nécessaires pour atteindre une moyenne mobile
+# de 50% de victoires, puis par pourcentage final de victoires contre l'IA optimale.
+#
+# Chaque entraînement terminé est ajouté au fichier cache (une ligne JSON par entraînement) : relancer un balayage
+# interrompu, ou l'étendre avec de nouvelles valeurs, ne recalcule pas les entraînements déjà faits.
+#
+# Utilisation :
+#     espace = {'epsilon': [1.0], 'epsilon_min': [0.05], 'facteur': [0.99, 0.996], 'periode': [5, 20],
+#               'learning_rate': [0.001, 0.01, 0.1], 'allumettes_en_jeu': [12], 'max_allumettes': [3]}
+#     classement = balayer(grille(espace), graines=range(4), nbre_manches=20000, cache='balayage.jsonl',
+#                          resultats='balayage.csv')
+# """
+
+import csv
+import itertools
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from nimm_metriques import MoyenneMobile
+from nimm_session import SessionNimm
+
+HYPERPARAMETRES = ('epsilon', 'epsilon_min', 'facteur', 'periode', 'learning_rate')
+DIMENSIONS = HYPERPARAMETRES + ('allumettes_en_jeu', 'max_allumettes')
+
+
+def grille(espace):
+    """ Toutes les configurations (dictionnaires) de la grille espace : {dimension: liste de valeurs} """
+
+    return [dict(zip(DIMENSIONS, valeurs)) for valeurs in itertools.product(*(espace[d] for d in DIMENSIONS))]
+
+
+def tirage(espace, nbre, graine=None):
+    """ nbre configurations tirées au hasard dans espace : une liste est un choix parmi ses valeurs, un tuple
+    (minimum, maximum) un intervalle (entier si les 2 bornes sont entières) """
+
+    alea = random.Random(graine)
+
+    def valeur(domaine):
+        if isinstance(domaine, tuple):
+            minimum, maximum = domaine
+            if isinstance(minimum, int) and isinstance(maximum, int):
+                return alea.randint(minimum, maximum)
+            return alea.uniform(minimum, maximum)
+        return alea.choice(domaine)
+
+    return [{d: valeur(espace[d]) for d in DIMENSIONS} for _ in range(nbre)]
+
+
+def parametres_configuration(configuration):
+    """ Paramètres de Nimm_V1 : joueur 1 optimal, joueur 2 apprenant par fonction de valeur avec la configuration """
+
+    e_greedy = [configuration[h] for h in HYPERPARAMETRES]
+    return [[configuration['allumettes_en_jeu'], configuration['max_allumettes'], 0],
+            [1, 1, None, "IA 1", list(e_greedy)],
+            [1, 3, 1, "IA 2", list(e_greedy)]]
+
+
+def cle(configuration, graine, nbre_manches):
+    """ Identifiant d'un entraînement dans le cache """
+
+    return json.dumps([[configuration[d] for d in DIMENSIONS], graine, nbre_manches])
+
+
+def entrainement(configuration, graine, nbre_manches, fenetre_finale=1000):
+    """ Entraîne une configuration avec une graine ; retourne la première manche où la moyenne mobile des victoires
+    de l'IA qui apprend atteint 50% (0 si jamais) et son pourcentage de victoires sur les fenetre_finale dernières
+    manches """
+
+    session = SessionNimm(parametres_configuration(configuration), graine=graine)
+    victoires = MoyenneMobile(fenetre_finale)
+    manche_50 = 0
+    for _ in range(nbre_manches):
+        victoires.ajouter(session.jouer_manche() == 2)
+        if not manche_50 and session.scores[5]:
+            manche_50 = session.manche
+    return {'configuration': configuration, 'graine': graine, 'nbre_manches': nbre_manches,
+            'manche_50': manche_50, 'victoires_finales': 100 * victoires.moyenne()}
+
+
+def lire_cache(chemin):
+    """ Entraînements déjà faits, par clé """
+
+    faits = {}
+    if chemin is not None and os.path.exists(chemin):
+        with open(chemin, encoding='utf-8') as fichier:
+            for ligne in fichier:
+                if ligne.strip():
+                    resultat = json.loads(ligne)
+                    faits[cle(resultat['configuration'], resultat['graine'], resultat['nbre_manches'])] = resultat
+    return faits
+
+
+def classer(configurations, graines, nbre_manches, faits):
+    """ Une ligne par configuration (moyennes sur les graines), triées de la meilleure à la moins bonne. Une graine
+    qui n'atteint pas 50% compte pour nbre_manches + 1 manches """
+
+    lignes = []
+    for configuration in configurations:
+        runs = [faits[cle(configuration, graine, nbre_manches)] for graine in graines]
+        manches = [r['manche_50'] or nbre_manches + 1 for r in runs]
+        ligne = dict(configuration)
+        ligne['manches_50'] = sum(manches) / len(manches)
+        ligne['atteint_50'] = sum(1 for r in runs if r['manche_50']) / len(runs)
+        ligne['victoires_finales'] = sum(r['victoires_finales'] for r in runs) / len(runs)
+        lignes.append(ligne)
+    lignes.sort(key=lambda ligne: (ligne['manches_50'], -ligne['victoires_finales']))
+    return lignes
+
+
+def balayer(configurations, graines=(0,), nbre_manches=20000, nbre_processus=None, cache=None, resultats=None):
+    """ Entraîne chaque configuration avec chaque graine (sauf celles déjà dans le cache) sur un ensemble de
+    processus, et retourne le classement des configurations, écrit aussi dans le fichier CSV resultats """
+
+    graines = list(graines)
+    faits = lire_cache(cache)
+    a_faire = [(configuration, graine) for configuration in configurations for graine in graines
+               if cle(configuration, graine, nbre_manches) not in faits]
+
+    if a_faire:
+        fichier_cache = open(cache, 'a', encoding='utf-8') if cache is not None else None
+        try:
+            with ProcessPoolExecutor(nbre_processus) as executeur:
+                futurs = [executeur.submit(entrainement, configuration, graine, nbre_manches)
+                          for configuration, graine in a_faire]
+                for futur in as_completed(futurs):
+                    resultat = futur.result()
+                    faits[cle(resultat['configuration'], resultat['graine'], nbre_manches)] = resultat
+                    if fichier_cache is not None:  # enregistré dès qu'il est terminé
+                        fichier_cache.write(json.dumps(resultat) + '\n')
+                        fichier_cache.flush()
+        finally:
+            if fichier_cache is not None:
+                fichier_cache.close()
+
+    classement = classer(configurations, graines, nbre_manches, faits)
+    if resultats is not None and classement:
+        with open(resultats, 'w', encoding='utf-8', newline='') as fichier:
+            ecrivain = csv.DictWriter(fichier, fieldnames=list(classement[0]))
+            ecrivain.writeheader()
+            ecrivain.writerows(classement)
+    return classement
+
+
+if __name__ == '__main__':
+    espace = {'epsilon': [1.0], 'epsilon_min': [0.05], 'facteur': [0.99, 0.996], 'periode': [5, 20],
+              'learning_rate': [0.001, 0.01, 0.1], 'allumettes_en_jeu': [12], 'max_allumettes': [3]}
+    classement = balayer(grille(espace), graines=range(2), nbre_manches=5000, cache='balayage.jsonl',
+                         resultats='balayage.csv')
+    for ligne in classement:
+        print(' '.join('%s=%s' % (d, ligne[d]) for d in HYPERPARAMETRES),
+              ' manches 50%%: %7.0f  victoires finales: %5.1f%%' % (ligne['manches_50'], ligne['victoires_finales']))
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# """
+# Jeu de Nimm - Entraînement progressif (curriculum) avec reprise des tables d'une taille de jeu à la suivante
+#
+# Chaque session part des boules (2 par coup possible) et des valeurs (0) de initialiser_matrice, même si l'IA a déjà
+# appris sur un jeu plus petit. En mode curriculum, l'IA est entraînée sur des jeux de plus en plus grands :
+#     etapes = [(12, 3), (30, 3), (60, 5), (100, 5)]  # (allumettes_en_jeu, max_allumettes)
+# et chaque étape démarre avec les tables de l'étape précédente, projetées sur la nouvelle taille (projeter_tables) :
+#     - allumettes déjà apprises : boules des coups déjà possibles et valeurs recopiées ; un nouveau coup (max_allumettes
+#       plus grand) reçoit les 2 boules de départ
+#     - nouvelles allumettes :
+#         'periodique' : même max_allumettes, la ligne apprise la plus haute ayant le même reste modulo
+#                        max_allumettes + 1 est recopiée (les positions gagnantes et les coups gagnants se répètent
+#                        avec cette période)
+#         'initiale'   : boules et valeur de départ de initialiser_matrice
+# L'epsilon-greedy réduit pendant une étape continue à l'étape suivante. Le gain vient surtout du renforcement : le coup
+# glouton de la fonction de valeur atteint l'objectif en quelques centaines de manches même sans curriculum, et la
+# recopie 'periodique' des valeurs le ralentit.
+#
+# Une étape s'arrête quand toutes les IA qui apprennent atteignent l'objectif : probabilité exacte de gagner contre
+# l'IA optimale (nimm_tournoi.probabilite_victoire, moyenne des manches commencées par chacune), la fonction de valeur
+# jouant son coup glouton (epsilon = 0). L'IA optimale gagne 50% des manches contre elle-même : objectif=0.45 demande
+# 90% de ce maximum. Le test a lieu toutes les periode_test manches.
+#
+# Utilisation :
+#     resultats = curriculum(parametres, [(12, 3), (30, 3), (60, 5), (100, 5)], objectif=0.45, graine=0)
+#     direct = curriculum(parametres, [(100, 5)], objectif=0.45, graine=0)  # entraînement direct
+#     resultats['manches'], resultats['duree'], resultats['etapes']
+# """
+
+from copy import deepcopy
+from time import perf_counter
+
+from Nimm_V1 import initialiser_matrice
+from nimm_aleatoire import FluxAleatoire
+from nimm_session import SessionNimm
+from nimm_tournoi import AgentNimm, probabilite_victoire
+
+EXTENSIONS = ('periodique', 'initiale')
+
+
+def projeter_tables(boules, etats, allumettes_en_jeu, max_allumettes, extension='periodique'):
+    """ Tables boules et etats d'un jeu plus petit projetées sur allumettes_en_jeu allumettes et un retrait maximum de
+    max_allumettes ; retourne les nouvelles tables """
+
+    if extension not in EXTENSIONS:
+        raise ValueError("Extension inconnue : " + str(extension) + " (periodique ou initiale)")
+    if allumettes_en_jeu < boules.allumettes_en_jeu or max_allumettes < boules.max_allumettes:
+        raise ValueError("Le nouveau jeu doit être au moins aussi grand que le précédent : " +
+                         str(boules.allumettes_en_jeu) + " allumettes, retrait max " + str(boules.max_allumettes))
+    anciennes, ancien_max = boules.allumettes_en_jeu, boules.max_allumettes
+    periode = max_allumettes + 1
+    nouvelles_boules = initialiser_matrice('renforcement', *boules.joueurs, allumettes_en_jeu, max_allumettes)
+    nouveaux_etats = initialiser_matrice('fonction de valeur', *etats.joueurs, allumettes_en_jeu, max_allumettes)
+    for j in range(2):
+        for allumette in range(allumettes_en_jeu):
+            source = allumette
+            if allumette >= anciennes:
+                if extension == 'initiale' or max_allumettes != ancien_max:
+                    continue
+                # ligne apprise la plus haute de même reste, où tous les coups sont possibles
+                source = allumette - ((allumette - anciennes) // periode + 1) * periode
+                if source < ancien_max - 1:
+                    continue
+            nouvelles_boules.ligne(j, allumette)[:ancien_max] = boules.ligne(j, source)
+            nouveaux_etats[j, allumette] = etats[j, source]
+    return nouvelles_boules, nouveaux_etats
+
+
+def victoires_contre_optimal(session, joueur):
+    """ Probabilité exacte que le joueur (1 ou 2) de la session, figé, gagne contre l'IA optimale, en moyenne sur les
+    manches qu'il commence et celles que commence l'IA optimale """
+
+    allumettes_en_jeu = session.allumettes_en_jeu
+    agent = AgentNimm.depuis_session(session, joueur, epsilon=0).politique
+    optimal = AgentNimm.optimal(allumettes_en_jeu, session.max_allumettes).politique
+    return float(probabilite_victoire(agent, optimal, allumettes_en_jeu) +
+                 1 - probabilite_victoire(optimal, agent, allumettes_en_jeu)) / 2
+
+
+def curriculum(parametres, etapes, objectif=0.45, periode_test=500, nbre_manches_max=500000,
+               extension='periodique', graine=None):
+    """ Entraîne les IA de parametres (jeu de parametres[0] ignoré) sur chaque étape (allumettes_en_jeu,
+    max_allumettes) jusqu'à l'objectif, au plus nbre_manches_max manches par étape. Une seule étape : entraînement
+    direct. Retourne manches et durée totales (en secondes, tests compris), et pour chaque étape : jeu, manches,
+    durée, victoires """
+
+    joueurs = [j for j in (1, 2) if parametres[j][1] == 3]
+    if not joueurs:
+        raise ValueError("Aucun joueur n'apprend : il n'y a rien à entraîner")
+    parametres = deepcopy(parametres)
+    flux = FluxAleatoire(graine)
+    boules = etats = None
+    resultats = {'etapes': [], 'manches': 0, 'duree': 0.0, 'atteint': True}
+    for numero, (allumettes_en_jeu, max_allumettes) in enumerate(etapes):
+        debut = perf_counter()
+        parametres[0] = [allumettes_en_jeu, max_allumettes, 0]
+        if boules is not None:
+            boules, etats = projeter_tables(boules, etats, allumettes_en_jeu, max_allumettes, extension)
+        session = SessionNimm(parametres, boules, etats, graine=flux.enfant('etape', numero))
+        victoires = [victoires_contre_optimal(session, j) for j in joueurs]
+        while min(victoires) < objectif and session.manche < nbre_manches_max:
+            session.entrainer(periode_test)
+            victoires = [victoires_contre_optimal(session, j) for j in joueurs]
+        duree = perf_counter() - debut  # entraînement, tests et projection des tables
+        resultats['etapes'].append({'allumettes_en_jeu': allumettes_en_jeu, 'max_allumettes': max_allumettes,
+                                    'manches': session.manche, 'duree': duree, 'victoires': victoires})
+        resultats['manches'] += session.manche
+        resultats['duree'] += duree
+        resultats['atteint'] = min(victoires) >= objectif
+        parametres, boules, etats = session.parametres, session.boules, session.etats  # epsilon-greedy réduit compris
+    return resultats
+
+
+if __name__ == '__main__':
+    # Manches et durée pour atteindre l'objectif sur le jeu final, entraînement direct ou progressif, IA optimale
+    # contre IA qui apprend (médianes sur plusieurs graines ; au plus nbre_manches_max manches par étape)
+    from statistics import median
+
+    graines, objectif, nbre_manches_max = range(3), 0.45, 200000
+    apprentissages = {
+        'renforcement': [[0, 0, 0], [1, 1, None, "IA 1", [1.0, 0.05, 0.996, 5, 0.001]],
+                         [1, 3, 0, "IA 2", [1.0, 0.05, 0.996, 5, 0.001]]],
+        'fonction valeur': [[0, 0, 0], [1, 1, None, "IA 1", [1.0, 0.05, 0.996, 20, 0.001]],
+                            [1, 3, 1, "IA 2", [1.0, 0.05, 0.996, 20, 0.001]]],
+    }
+    programmes = {
+        'direct 40/5': ([(40, 5)], 'initiale'),
+        '12/5, 24/5, 40/5 initiale': ([(12, 5), (24, 5), (40, 5)], 'initiale'),
+        'direct 100/5': ([(100, 5)], 'initiale'),
+        '12/5, 30/5, 60/5, 100/5 initiale': ([(12, 5), (30, 5), (60, 5), (100, 5)], 'initiale'),
+        '12/5, 30/5, 60/5, 100/5 periodique': ([(12, 5), (30, 5), (60, 5), (100, 5)], 'periodique'),
+        '12/3, 30/3, 60/5, 100/5 periodique': ([(12, 3), (30, 3), (60, 5), (100, 5)], 'periodique'),
+    }
+
+    for nom, parametres in apprentissages.items():
+        print(nom + ", objectif : %.0f%% de victoires contre l'IA optimale" % (100 * objectif))
+        print('  %-36s %10s %10s %8s   %s' % ('programme', 'manches', 'durée (s)', 'atteint', 'manches par étape'))
+        for programme, (etapes, extension) in programmes.items():
+            mesures = [curriculum(parametres, etapes, objectif, periode_test=100, nbre_manches_max=nbre_manches_max,
+                                  extension=extension, graine=graine) for graine in graines]
+            par_etape = [median(m['etapes'][i]['manches'] for m in mesures) for i in range(len(etapes))]
+            print('  %-36s %10d %10.2f %6d/%d   %s' % (
+                programme, median(m['manches'] for m in mesures), median(m['duree'] for m in mesures),
+                sum(m['atteint'] for m in mesures), len(mesures), ' + '.join('%d' % m for m in par_etape)))
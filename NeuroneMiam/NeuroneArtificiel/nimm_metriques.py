@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+# """
+# Jeu de Nimm - Métriques d'entraînement
+#
+# MoyenneMobile calcule une moyenne mobile en O(1) par valeur ajoutée (tampon circulaire et somme courante), au lieu
+# de retirer le premier élément d'une liste et de refaire la somme à chaque manche.
+#
+# MetriquesEntrainement suit, manche après manche, le pourcentage de victoires sur une ou plusieurs fenêtres, le nombre
+# de coups par manche, et, toutes les periode manches seulement, l'epsilon-greedy, l'écart des tables apprises à la
+# politique optimale (nimm_solveur) et leur variation depuis l'enregistrement précédent. Chaque enregistrement est un
+# dictionnaire envoyé à une sortie : SortieMemoire, SortieConsole, SortieCSV ou SortieJSONL, ou tout objet ayant les
+# méthodes ecrire(enregistrement) et fermer().
+#
+# Utilisation :
+#     metriques = MetriquesEntrainement(fenetres=(10, 100, 1000), periode=10000, sortie=SortieCSV('metriques.csv'))
+#     SessionNimm(parametres, metriques=metriques).entrainer(10000000)
+#     metriques.fermer()
+# """
+
+import csv
+import json
+from array import array
+
+
+class MoyenneMobile:
+    """ Moyenne des fenetre dernières valeurs ajoutées """
+
+    __slots__ = ('fenetre', 'valeurs', 'position', 'nbre', 'somme')
+
+    def __init__(self, fenetre, valeurs=()):
+        self.fenetre = fenetre
+        self.valeurs = array('d', bytes(8 * fenetre))
+        self.position = 0  # prochaine case à remplacer
+        self.nbre = 0
+        self.somme = 0.0
+        for valeur in valeurs:
+            self.ajouter(valeur)
+
+    def ajouter(self, valeur):
+        """ Ajoute une valeur, en remplaçant la plus ancienne si la fenêtre est pleine """
+
+        position = self.position
+        self.somme += valeur - self.valeurs[position]
+        self.valeurs[position] = valeur
+        position += 1
+        if position == self.fenetre:
+            position = 0
+            self.somme = sum(self.valeurs)  # évite l'accumulation des erreurs d'arrondi
+        self.position = position
+        if self.nbre < self.fenetre:
+            self.nbre += 1
+
+    def complete(self):
+        """ Vrai si la fenêtre contient fenetre valeurs """
+
+        return self.nbre == self.fenetre
+
+    def moyenne(self):
+        """ Moyenne des valeurs de la fenêtre (0 si elle est vide) """
+
+        return self.somme / self.nbre if self.nbre else 0.0
+
+    def liste(self):
+        """ Valeurs de la fenêtre, de la plus ancienne à la plus récente """
+
+        if self.nbre < self.fenetre:
+            return self.valeurs[:self.nbre].tolist()
+        return (self.valeurs[self.position:] + self.valeurs[:self.position]).tolist()
+
+
+class SortieMemoire:
+    """ Conserve les enregistrements dans la liste enregistrements """
+
+    def __init__(self):
+        self.enregistrements = []
+
+    def ecrire(self, enregistrement):
+        self.enregistrements.append(enregistrement)
+
+    def fermer(self):
+        pass
+
+
+class SortieConsole:
+    """ Affiche chaque enregistrement sur une ligne """
+
+    def ecrire(self, enregistrement):
+        print(' '.join(str(cle) + '=' + (('%.4g' % valeur) if isinstance(valeur, float) else str(valeur))
+                       for cle, valeur in enregistrement.items()))
+
+    def fermer(self):
+        pass
+
+
+class SortieJSONL:
+    """ Écrit un enregistrement JSON par ligne dans le fichier chemin """
+
+    def __init__(self, chemin):
+        self.fichier = open(chemin, 'w', encoding='utf-8')
+
+    def ecrire(self, enregistrement):
+        self.fichier.write(json.dumps(enregistrement) + '\n')
+
+    def fermer(self):
+        self.fichier.close()
+
+
+class SortieCSV:
+    """ Écrit les enregistrements dans le fichier CSV chemin ; les colonnes sont celles du premier enregistrement, les
+    suivants doivent avoir les mêmes clés """
+
+    def __init__(self, chemin):
+        self.fichier = open(chemin, 'w', encoding='utf-8', newline='')
+        self.ecrivain = None
+
+    def ecrire(self, enregistrement):
+        if self.ecrivain is None:
+            self.ecrivain = csv.DictWriter(self.fichier, fieldnames=list(enregistrement))
+            self.ecrivain.writeheader()
+        self.ecrivain.writerow(enregistrement)
+
+    def fermer(self):
+        self.fichier.close()
+
+
+class MetriquesEntrainement:
+    """ Métriques d'une session, mises à jour à chaque manche et émises toutes les periode manches """
+
+    def __init__(self, fenetres=(10,), periode=1000, sortie=None, convergence=True):
+        self.fenetres = tuple(fenetres)
+        self.periode = periode
+        self.sortie = SortieMemoire() if sortie is None else sortie
+        self.convergence = convergence  # écart à la politique optimale et variation des tables
+        self.victoires = [MoyenneMobile(fenetre) for fenetre in self.fenetres]  # victoires du joueur 1
+        self.coups = MoyenneMobile(max(self.fenetres))
+        self.precedentes = None  # copie des tables au dernier enregistrement
+
+    def enregistrer(self, session, gagnant, nbre_coups):
+        """ Appelé par la session à la fin de chaque manche """
+
+        victoire = gagnant == 1
+        for moyenne in self.victoires:
+            moyenne.ajouter(victoire)
+        self.coups.ajouter(nbre_coups)
+        if session.manche % self.periode == 0:
+            self.sortie.ecrire(self.enregistrement(session))
+
+    def enregistrement(self, session):
+        """ Dictionnaire des métriques courantes de la session """
+
+        enregistrement = {'manche': session.manche}
+        for fenetre, moyenne in zip(self.fenetres, self.victoires):
+            enregistrement['victoires_j1_' + str(fenetre)] = 100 * moyenne.moyenne()
+            enregistrement['victoires_j2_' + str(fenetre)] = 100 * (1 - moyenne.moyenne()) if moyenne.nbre else 0.0
+        enregistrement['coups_par_manche'] = self.coups.moyenne()
+
+        for j in (1, 2):
+            if session.parametres[j][2] == 1:
+                enregistrement['epsilon_j' + str(j)] = session.parametres[j][4][0]
+
+        if self.convergence:
+            for j, ecart in enumerate(session.ecart_optimal(), 1):
+                if ecart is not None:
+                    for cle, valeur in ecart.items():
+                        enregistrement[cle + '_j' + str(j)] = valeur
+            tables = (session.boules.valeurs.tolist(), session.etats.valeurs.tolist())
+            # mêmes clés dans tous les enregistrements (colonnes de SortieCSV) : None au premier enregistrement
+            enregistrement['variation_boules'] = enregistrement['variation_etats'] = None
+            if self.precedentes is not None:
+                enregistrement['variation_boules'] = sum(abs(a - b) for a, b in zip(tables[0], self.precedentes[0]))
+                enregistrement['variation_etats'] = sum(abs(a - b) for a, b in zip(tables[1], self.precedentes[1]))
+            self.precedentes = tables
+        return enregistrement
+
+    def fermer(self):
+        """ Ferme la sortie (fichier) des métriques """
+
+        self.sortie.fermer()
+
+
+if __name__ == '__main__':
+    # Coût des métriques pendant l'entraînement, puis vérification de la sortie CSV sur plusieurs périodes
+    import os
+    import tempfile
+
+    from nimm_session import SessionNimm
+
+    parametres = [[12, 3, 0], [1, 1, None, "IA 1", [1.0, 0.05, 0.996, 20, 0.001]],
+                  [1, 3, 1, "IA 2", [1.0, 0.05, 0.996, 20, 0.001]]]
+    sans = SessionNimm(parametres).entrainer(50000)['manches_par_seconde']
+    metriques = MetriquesEntrainement(fenetres=(10, 100, 1000), periode=10000)
+    avec = SessionNimm(parametres, metriques=metriques).entrainer(50000)['manches_par_seconde']
+    print('sans métriques : %8.0f manches/s' % sans)
+    print('avec métriques : %8.0f manches/s (%+.1f%%)' % (avec, 100 * (avec / sans - 1)))
+    for enregistrement in metriques.sortie.enregistrements:
+        SortieConsole().ecrire(enregistrement)
+
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, 'metriques.csv')
+        metriques = MetriquesEntrainement(fenetres=(10, 100), periode=1000, sortie=SortieCSV(chemin))
+        SessionNimm(parametres, metriques=metriques, graine=0).entrainer(3000)
+        metriques.fermer()
+        with open(chemin, encoding='utf-8', newline='') as fichier:
+            lignes = list(csv.DictReader(fichier))
+        assert [ligne['manche'] for ligne in lignes] == ['1000', '2000', '3000'], lignes
+        assert lignes[0]['variation_etats'] == '' and float(lignes[1]['variation_etats']) >= 0, lignes
+    print('sortie CSV     : %d enregistrements, mêmes colonnes' % len(lignes))
@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+# """
+# Jeu de Nimm - Plusieurs tas et grands jeux
+#
+# Nimm_V1 joue sur un seul tas de 8 à 100 allumettes et range une ligne par allumette (initialiser_matrice). JeuNimm
+# décrit un jeu plus général :
+#     - tas   : nombre d'allumettes de chaque tas au départ, par exemple (3, 4, 5)
+#     - coups : retraits autorisés, les mêmes pour tous les tas (1 à max_allumettes, ou un ensemble comme (1, 3, 4)),
+#               ou un ensemble par tas ; par défaut n'importe quel nombre d'allumettes d'un même tas (Nim classique)
+# Le joueur qui retire la dernière allumette gagne, comme dans Nimm_V1.
+#
+# Codage compact des états : les tas de mêmes coups autorisés sont interchangeables, ils sont donc rangés par ordre
+# croissant (forme canonique) puis empilés dans un entier, bits bits par tas :
+#     code = tas[0] + tas[1] << bits + tas[2] << 2 * bits + ...
+# (5, 3, 4) et (4, 5, 3) sont le même état (3, 4, 5). Le nombre d'états passe de (n + 1) ** k à C(n + k, k) pour k tas
+# de n allumettes au plus. Un coup est une action : tas (dans la forme canonique) * len(coups) + indice du coup ; pour
+# plusieurs tas de même taille, seul le premier porte des actions.
+#
+# SessionMultiTas entraîne les mêmes IA que Nimm_V1 (aléatoire, optimale, aléatoire/optimale, renforcement, fonction de
+# valeur, paramètres des joueurs au format de Nimm_V1) : boules et valeurs sont rangées dans des TableCreuse
+# (nimm_tables), une ligne par état rencontré, créée à la première visite. L'IA optimale utilise les nombres de Grundy
+# de nimm_solveur.
+#
+# Utilisation :
+#     jeu = JeuNimm((3, 4, 5), max_allumettes=3)
+#     session = SessionMultiTas(jeu, [[1, 1, None, "IA 1", [1.0, 0.05, 0.996, 20, 0.001]],
+#                                     [1, 3, 1, "IA 2", [1.0, 0.05, 0.996, 20, 0.001]]], graine=0)
+#     session.entrainer(20000)
+#     session.ecart_optimal(), len(session.etats[1]), session.etats[1].memoire()
+# """
+
+from array import array
+from copy import deepcopy
+from time import perf_counter
+
+from Nimm_V1 import update_epsilon_greedy, update_scores, pile_ou_face
+from nimm_aleatoire import FluxAleatoire
+from nimm_metriques import MoyenneMobile
+from nimm_solveur import resoudre
+from nimm_tables import TableCreuse
+from nimm_urne import tirage_boule
+
+
+class JeuNimm:
+    """ Tas de départ et coups autorisés d'un jeu de Nimm à un ou plusieurs tas, et codage des états """
+
+    def __init__(self, tas, coups=None, max_allumettes=None):
+        tas = tuple(tas)
+        if not tas or min(tas) < 1:
+            raise ValueError("Il faut au moins un tas, et au moins une allumette par tas : " + str(tas))
+        if coups is None:
+            coups = tuple(range(1, (max_allumettes or max(tas)) + 1))
+        if isinstance(coups, list):  # un ensemble de coups par tas
+            if len(coups) != len(tas):
+                raise ValueError("Il faut un ensemble de coups par tas : " + str(len(tas)) + " tas, " +
+                                 str(len(coups)) + " ensembles")
+            regles = [tuple(sorted(set(c))) for c in coups]
+        else:
+            regles = [tuple(sorted(set(coups)))] * len(tas)
+
+        # tas regroupés par coups autorisés (dans l'ordre de première apparition), puis triés dans chaque groupe
+        groupes = list(dict.fromkeys(regles))
+        ordre = sorted(range(len(tas)), key=lambda i: (groupes.index(regles[i]), tas[i]))
+        self.regles = tuple(regles[i] for i in ordre)
+        self.groupe = []  # (début, fin) du groupe de chaque tas
+        for i, regle in enumerate(self.regles):
+            debut = self.regles.index(regle)
+            self.groupe.append((debut, debut + self.regles.count(regle)))
+
+        self.bits = max(tas).bit_length()
+        if self.bits * len(tas) > 64:
+            raise ValueError("Un état de " + str(len(tas)) + " tas de " + str(self.bits) + " bits ne tient pas dans "
+                             "un entier de 64 bits")
+        self.nbre_tas = len(tas)
+        self.tas_initial = tuple(tas[i] for i in ordre)
+        self.code_initial = self.coder(self.tas_initial)
+        self.coups = tuple(sorted(set().union(*regles)))  # tous les retraits possibles, un indice chacun
+        self.largeur = self.nbre_tas * len(self.coups)  # nombre d'actions
+        # actions[i] : (action, coup) autorisés sur le tas i
+        self.actions_tas = [[(i * len(self.coups) + k, c) for k, c in enumerate(self.coups) if c in self.regles[i]]
+                            for i in range(self.nbre_tas)]
+        self.grundy = [resoudre(max(tas), coups=regle).grundy for regle in self.regles]
+
+    def coder(self, tas):
+        """ Entier représentant des tas sous forme canonique """
+
+        code = 0
+        for allumettes in reversed(tas):
+            code = (code << self.bits) | allumettes
+        return code
+
+    def decoder(self, code):
+        """ Tas (forme canonique) représentés par code """
+
+        masque = (1 << self.bits) - 1
+        return tuple((code >> (i * self.bits)) & masque for i in range(self.nbre_tas))
+
+    def canonique(self, tas):
+        """ Forme canonique de tas donnés dans l'ordre de tas_initial : chaque groupe de tas trié """
+
+        tas = list(tas)
+        for debut, fin in set(self.groupe):
+            tas[debut:fin] = sorted(tas[debut:fin])
+        return tuple(tas)
+
+    def actions(self, tas):
+        """ Actions possibles sur des tas sous forme canonique """
+
+        actions = []
+        for i, allumettes in enumerate(tas):
+            if allumettes == 0 or (i > self.groupe[i][0] and tas[i - 1] == allumettes):
+                continue  # tas vide, ou même tas que le précédent
+            actions.extend(action for action, coup in self.actions_tas[i] if coup <= allumettes)
+        return actions
+
+    def boules_initiales(self, tas):
+        """ Ligne de boules d'un nouvel état : 2 par action possible, 0 sinon """
+
+        ligne = [0] * self.largeur
+        for action in self.actions(tas):
+            ligne[action] = 2
+        return ligne
+
+    def successeur(self, tas, action):
+        """ Tas (forme canonique) après l'action """
+
+        i, k = divmod(action, len(self.coups))
+        tas = list(tas)
+        tas[i] -= self.coups[k]
+        debut, fin = self.groupe[i]
+        if fin - debut > 1:
+            tas[debut:fin] = sorted(tas[debut:fin])
+        return tuple(tas)
+
+    def nimber(self, tas):
+        """ Ou exclusif des nombres de Grundy des tas : 0 pour une position perdante """
+
+        somme = 0
+        for i, allumettes in enumerate(tas):
+            somme ^= self.grundy[i][allumettes]
+        return somme
+
+    def valeur(self, tas):
+        """ Récompense finale du joueur qui a la main en jeu parfait : 1 ou -1 """
+
+        return 1 if self.nimber(tas) else -1
+
+    def actions_gagnantes(self, tas):
+        """ Actions qui laissent l'adversaire sur une position perdante """
+
+        somme = self.nimber(tas)
+        if somme == 0:
+            return []
+        return [action for action in self.actions(tas)
+                if not self.nimber(self.successeur(tas, action))]
+
+    def coup_optimal(self, tas, alea):
+        """ Première action gagnante, action aléatoire sur une position perdante (comme l'IA optimale de Nimm_V1) """
+
+        somme = self.nimber(tas)
+        if somme:
+            for i, allumettes in enumerate(tas):
+                cible = self.grundy[i][allumettes] ^ somme
+                for action, coup in self.actions_tas[i]:
+                    if coup <= allumettes and self.grundy[i][allumettes - coup] == cible:
+                        return action
+        actions = self.actions(tas)
+        return actions[alea.randint(0, len(actions) - 1)]
+
+    def nbre_etats(self):
+        """ Nombre d'états sous forme canonique (tas vides compris) et nombre d'états d'une table dense """
+
+        canoniques = dense = 1
+        for debut, fin in sorted(set(self.groupe)):
+            k, n = fin - debut, max(self.tas_initial[debut:fin])
+            combinaisons = 1  # multi-ensembles de k tas de 0 à n allumettes : C(n + k, k)
+            for i in range(1, k + 1):
+                combinaisons = combinaisons * (n + i) // i
+            canoniques *= combinaisons
+            dense *= (n + 1) ** k
+        return canoniques, dense
+
+
+class SessionMultiTas:
+    """ Session de jeu entre 2 IA sur un JeuNimm : les paramètres des joueurs sont au format de Nimm_V1
+    (parametres[1] et parametres[2]), boules[j] et etats[j] sont les TableCreuse du joueur j + 1 (None s'il n'apprend
+    pas par ce mode) """
+
+    def __init__(self, jeu, joueurs, fenetre=10, graine=None):
+        for j in range(2):
+            if joueurs[j][0] == 0:
+                raise ValueError("Le joueur " + str(j + 1) + " est humain : une session sans interaction ne peut "
+                                 "opposer que des IA")
+        self.jeu = jeu
+        self.parametres = [None] + deepcopy(list(joueurs))
+        self.boules = [TableCreuse(jeu.largeur, 'q') if p[1] == 3 and p[2] == 0 else None
+                       for p in self.parametres[1:]]
+        self.etats = [TableCreuse(1, 'd') if p[1] == 3 and p[2] == 1 else None for p in self.parametres[1:]]
+        self.manche = 0
+        self.scores = [0, 0, 0, 0, 0, 0]
+        self.histo_victoires = [MoyenneMobile(fenetre), MoyenneMobile(fenetre)]
+        self.historique = [[], []]
+        self.duree = 0.0
+        self.flux = graine if isinstance(graine, FluxAleatoire) else FluxAleatoire(graine)
+        self.alea = [None, self.flux.enfant('joueur', 1), self.flux.enfant('joueur', 2)]
+        self.joueur1_commence = pile_ou_face(self.parametres[1][0], self.parametres[1][3], self.flux)
+
+    def jouer(self, joueur, tas):
+        """ Action choisie par le joueur (1 ou 2) sur des tas sous forme canonique ; enregistre les états et les
+        coups des IA qui apprennent """
+
+        jeu = self.jeu
+        parametres = self.parametres[joueur]
+        alea = self.alea[joueur]
+        mode_IA = parametres[1]
+        if mode_IA == 1 or (mode_IA == 2 and alea.randint(0, 1) and jeu.nimber(tas)):  # coup optimal
+            return jeu.coup_optimal(tas, alea)
+        if mode_IA != 3 or (parametres[2] == 1 and alea.random() < parametres[4][0]):  # coup aléatoire
+            actions = jeu.actions(tas)
+            action = actions[alea.randint(0, len(actions) - 1)]
+        elif parametres[2] == 0:  # renforcement : tirage d'une boule dans l'urne de l'état
+            code = jeu.coder(tas)
+            table = self.boules[joueur - 1]
+            indice = table.indice(code)
+            if indice < 0:
+                indice = table.ajouter(code, jeu.boules_initiales(tas))
+            action = tirage_boule(table.ligne(indice), False, alea)
+            self.historique[joueur - 1].append((code, action))
+            return action
+        else:  # fonction de valeur, exploitation : gagner si possible, sinon mener l'adversaire sur la plus petite
+            # valeur (les états non rencontrés valent 0)
+            table = self.etats[joueur - 1]
+            valeurs = table.valeurs
+            action, valeur = None, None
+            for possible in jeu.actions(tas):
+                suivant = jeu.successeur(tas, possible)
+                if not any(suivant):
+                    action = possible
+                    break
+                indice = table.indice(jeu.coder(suivant))
+                v = valeurs[indice] if indice >= 0 else 0.0
+                if valeur is None or v < valeur:
+                    action, valeur = possible, v
+        if mode_IA == 3:
+            self.historique[joueur - 1].append(jeu.coder(tas))
+        return action
+
+    def apprendre(self, gagnant):
+        """ Apprentissage des IA à la fin d'une manche remportée par gagnant, comme fin_de_manche de Nimm_V1 """
+
+        jeu = self.jeu
+        for joueur in (1, 2):
+            parametres = self.parametres[joueur]
+            if parametres[1] != 3:
+                continue
+            recompense = 1 if joueur == gagnant else -1
+            historique = self.historique[joueur - 1]
+            if parametres[2] == 0:
+                table = self.boules[joueur - 1]
+                for code, action in historique:
+                    ligne = table.ligne(table.indice(code))
+                    ligne[action] += recompense
+                    if recompense < 0 and sum(ligne) == 0:  # plus de boules : on réinitialise l'état
+                        ligne[:] = array('q', jeu.boules_initiales(jeu.decoder(code)))
+            else:
+                update_epsilon_greedy(joueur, self.parametres, self.manche)
+                table = self.etats[joueur - 1]
+                for code in historique:  # les ajouts peuvent déplacer les lignes : on les fait avant les indices
+                    table.ajouter(code)
+                valeurs = table.valeurs
+                learning_rate = parametres[4][4]
+                cible = recompense
+                for code in reversed(historique):
+                    indice = table.indice(code)
+                    valeurs[indice] += learning_rate * (cible - valeurs[indice])
+                    cible = valeurs[indice]
+
+    def jouer_manche(self):
+        """ Joue une manche complète, met à jour scores et tables et retourne le joueur gagnant """
+
+        jeu = self.jeu
+        self.historique[0].clear()
+        self.historique[1].clear()
+        self.manche += 1
+        tas = jeu.tas_initial
+        restantes = sum(tas)
+        joueur = 2 if self.joueur1_commence else 1
+        while restantes:
+            joueur = joueur % 2 + 1
+            suivant = jeu.successeur(tas, self.jouer(joueur, tas))
+            restantes -= sum(tas) - sum(suivant)
+            tas = suivant
+        update_scores(joueur, self.scores, self.histo_victoires, self.manche)
+        self.apprendre(joueur)
+        self.joueur1_commence = not self.joueur1_commence
+        return joueur
+
+    def entrainer(self, nbre_manches):
+        """ Joue nbre_manches manches supplémentaires et retourne les résultats de la session """
+
+        debut = perf_counter()
+        for _ in range(nbre_manches):
+            self.jouer_manche()
+        self.duree += perf_counter() - debut
+        return self.resultats()
+
+    def ecart_optimal(self):
+        """ Écart des tables apprises à la politique optimale, sur les états rencontrés (None pour un joueur qui
+        n'apprend pas) :
+            - fonction de valeur : ecart_moyen des valeurs aux récompenses exactes (1 ou -1)
+            - renforcement : probabilite_optimale moyenne de tirer une action gagnante sur les positions gagnantes """
+
+        jeu = self.jeu
+        ecarts = [None, None]
+        for j in range(2):
+            if self.etats[j] is not None:
+                table = self.etats[j]
+                ecart = sum(abs(table.valeurs[table.indice(code)] - jeu.valeur(jeu.decoder(code)))
+                            for code in table.etats())
+                ecarts[j] = {'etats': len(table), 'ecart_moyen': ecart / len(table) if len(table) else 0.0}
+            elif self.boules[j] is not None:
+                table = self.boules[j]
+                gagnantes, probabilite = 0, 0.0
+                for code in table.etats():
+                    actions = jeu.actions_gagnantes(jeu.decoder(code))
+                    if actions:
+                        ligne = table.ligne(table.indice(code))
+                        gagnantes += 1
+                        probabilite += sum(ligne[action] for action in actions) / sum(ligne)
+                ecarts[j] = {'etats': len(table),
+                             'probabilite_optimale': probabilite / gagnantes if gagnantes else 1.0}
+        return ecarts
+
+    def resultats(self):
+        """ Dictionnaire des scores, du débit et de la taille des tables de la session """
+
+        tables = [t for t in self.boules + self.etats if t is not None]
+        return {'parametres': self.parametres,
+                'scores': self.scores,
+                'manches': self.manche,
+                'duree': self.duree,
+                'manches_par_seconde': self.manche / self.duree if self.duree else 0.0,
+                'etats': sum(len(t) for t in tables),
+                'memoire': sum(t.memoire() for t in tables)}
+
+
+if __name__ == '__main__':
+    # 1. TableCreuse jusqu'à plusieurs millions d'états (8 tas de 0 à 31 allumettes, codés sur 40 bits) : mémoire par
+    #    état et débit de recherche, comparés à un dictionnaire Python {code: valeur}
+    # 2. Entraînement contre l'IA optimale sur des jeux à plusieurs tas : états rencontrés, mémoire et écart final
+    import tracemalloc
+    from timeit import timeit
+
+    import numpy as np
+
+    jeu = JeuNimm((31,) * 8)
+    canoniques, dense = jeu.nbre_etats()
+    print('8 tas de 31 allumettes : %d états canoniques, %d états pour une table dense (%.1f To de valeurs)'
+          % (canoniques, dense, 8 * dense / 1e12))
+    rng = np.random.default_rng(0)
+    tas = np.sort(rng.integers(0, 32, (6000000, 8)), axis=1)
+    codes = np.unique((tas << (jeu.bits * np.arange(8))).sum(axis=1).astype(np.uint64))
+    codes = codes[codes != 0]
+    rng.shuffle(codes)
+
+    print('%10s %12s %10s %14s %14s %14s %14s' % ('états', 'mémoire', 'octets/ét.', 'ajouts/s (lot)',
+                                                  'recherches/s', 'dict : rech./s', 'lot : rech./s'))
+    for nbre_etats in (10000, 100000, 1000000, 4000000):
+        cles = codes[:nbre_etats]
+        table = TableCreuse(1, 'd')
+        ajout = timeit(lambda: table.ajouter_lot(cles, cles.astype(np.float64)), number=1)
+        echantillon = [int(c) for c in cles[rng.integers(0, nbre_etats, 200000)]]
+        recherche = timeit(lambda: [table.indice(c) for c in echantillon], number=1)
+        lot = cles[rng.integers(0, nbre_etats, 1000000)]
+        recherche_lot = timeit(lambda: table.indices(lot), number=1)
+        if nbre_etats <= 1000000:
+            tracemalloc.start()
+            dictionnaire = dict(zip(cles.tolist(), cles.astype(np.float64).tolist()))
+            memoire_dict = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            recherche_dict = timeit(lambda: [dictionnaire[c] for c in echantillon], number=1)
+            del dictionnaire
+            reference = '%8.0f k' % (len(echantillon) / recherche_dict / 1000)
+            reference += ' (%3.0f o)' % (memoire_dict / nbre_etats)
+        else:
+            reference = '-'
+        print('%10d %9.1f Mo %10.1f %12.0f k %12.0f k %14s %12.0f k' % (
+            nbre_etats, table.memoire() / 1e6, table.memoire() / nbre_etats, nbre_etats / ajout / 1000,
+            len(echantillon) / recherche / 1000, reference, len(lot) / recherche_lot / 1000))
+
+    print()
+    jeux = {'(3, 4, 5), retrait 1 à 3': JeuNimm((3, 4, 5), max_allumettes=3),
+            '(5, 7, 9, 11), Nim classique': JeuNimm((5, 7, 9, 11)),
+            '(10, 10, 12, 15, 20), coups (1, 3, 4)': JeuNimm((10, 10, 12, 15, 20), coups=(1, 3, 4))}
+    nbre_manches = 20000
+    print('%-38s %-14s %10s %10s %10s %8s %22s' % ('jeu', 'IA', 'canoniques', 'rencontrés', 'mémoire', 'm/s',
+                                                   'écart'))
+    for nom, jeu in jeux.items():
+        for apprentissage, nom_ia in ((0, 'renforcement'), (1, 'fonction valeur')):
+            session = SessionMultiTas(jeu, [[1, 1, None, "IA 1", [1.0, 0.05, 0.996, 20, 0.001]],
+                                            [1, 3, apprentissage, "IA 2", [1.0, 0.05, 0.996, 20, 0.01]]], graine=0)
+            resultats = session.entrainer(nbre_manches)
+            ecart = session.ecart_optimal()[1]
+            cle = 'probabilite_optimale' if apprentissage == 0 else 'ecart_moyen'
+            print('%-38s %-14s %10d %10d %7.0f ko %8.0f %22s' % (
+                nom, nom_ia, jeu.nbre_etats()[0], resultats['etats'], resultats['memoire'] / 1000,
+                resultats['manches_par_seconde'], '%s %.3f' % (cle, ecart[cle])))
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+# """
+# Jeu de Nimm - Entraînement parallèle sur plusieurs processus
+#
+# Les tables boules et etats de référence sont placées en mémoire partagée (multiprocessing.shared_memory). Chaque
+# processus joue sa part des manches avec une copie locale des tables, par tours de manches_par_tour manches. À la fin
+# de chaque tour, il ajoute aux tables partagées ce qu'il a appris pendant le tour (table locale - table au début du
+# tour, en tableaux NumPy sur la mémoire partagée), puis repart des tables partagées, qui contiennent aussi
+# l'apprentissage des autres processus :
+#     - renforcement : les +1/-1 de update_listes_renforcement sont additifs, la fusion est exacte ; une allumette
+#       sans boules est réinitialisée comme dans test_boules_restantes
+#     - fonction de valeur : les petits pas de update_listes_fvaleur sont additionnés, comme s'ils avaient été joués
+#       l'un après l'autre
+#     - epsilon-greedy : recalculé à chaque tour à partir du nombre total de manches jouées par tous les processus
+# Les tables ne sont jamais transmises par pickle. Seul l'ajout des différences (une opération NumPy par table, plus
+# les lignes de boules modifiées) se fait sous le verrou ; différences et recopie des tables partagées se font hors du
+# verrou.
+# """
+
+import multiprocessing
+from multiprocessing import shared_memory
+from time import perf_counter
+
+import numpy as np
+
+from nimm_aleatoire import FluxAleatoire
+from nimm_session import SessionNimm
+from nimm_tables import TableBoules, TableEtats
+
+
+def _tables(parametres, memoire_boules, memoire_etats):
+    """ Tables de la configuration parametres, rangées dans les blocs de mémoire partagée donnés """
+
+    allumettes_en_jeu, max_allumettes = parametres[0][0], parametres[0][1]
+    taille_boules = 8 * 2 * allumettes_en_jeu * max_allumettes
+    boules = TableBoules(parametres[1][2] == 0, parametres[2][2] == 0, allumettes_en_jeu, max_allumettes,
+                         memoire_boules.buf[:taille_boules])
+    etats = TableEtats(parametres[1][2] == 1, parametres[2][2] == 1, allumettes_en_jeu,
+                       memoire_etats.buf[:8 * 2 * allumettes_en_jeu])
+    return boules, etats
+
+
+def _epsilon_greedy(e_greedy, manches):
+    """ Epsilon-greedy après manches manches, comme s'il avait été réduit par update_epsilon_greedy """
+
+    return max(e_greedy[0] * e_greedy[2] ** (manches // e_greedy[3]), e_greedy[1])
+
+
+def _copier(sources, *destinations):
+    """ Copie le contenu des tables sources dans chaque suite de tables de destinations """
+
+    for i, source in enumerate(sources):
+        for destination in destinations:
+            destination[i].valeurs[:] = source.valeurs
+
+
+def _fusionner(partagees, deltas, lignes, boules_initiales):
+    """ Ajoute aux tableaux partagés (boules, etats) les modifications d'un processus, en une opération par table.
+    Seules les lignes de boules modifiées (lignes[joueur, allumette]) sont ramenées à des nombres de boules positifs,
+    et réinitialisées si elles n'ont plus de boules. Appelé sous le verrou """
+
+    boules, etats = partagees
+    boules += deltas[0]
+    etats += deltas[1]
+    if lignes.any():
+        modifiees = np.maximum(boules[lignes], 0)
+        vides = modifiees.sum(axis=1) == 0
+        modifiees[vides] = boules_initiales[lignes][vides]
+        boules[lignes] = modifiees
+
+
+def _repartir(partagees, locales, instantanes, renforcement, boules_initiales):
+    """ Recopie les tableaux partagés dans les tableaux locaux et les instantanés de début de tour. La copie est
+    faite sans verrou : une fusion en cours peut y laisser des boules négatives ou une ligne vide, corrigées ici comme
+    dans _fusionner """
+
+    for partage, local, instantane in zip(partagees, locales, instantanes):
+        local[...] = partage
+    boules = locales[0]
+    np.maximum(boules, 0, out=boules)
+    vides = (boules.sum(axis=2) == 0) & renforcement[:, None]
+    boules[vides] = boules_initiales[vides]
+    for local, instantane in zip(locales, instantanes):
+        instantane[...] = local
+
+
+def _travailleur(numero, parametres, nom_boules, nom_etats, verrou, manches_globales, durees_50, arret,
+                 nbre_manches, manches_par_tour, arreter_a_50, graine, debut):
+    """ Processus d'entraînement : joue nbre_manches manches par tours et fusionne après chaque tour """
+
+    memoire_boules = shared_memory.SharedMemory(nom_boules)
+    memoire_etats = shared_memory.SharedMemory(nom_etats)
+    try:
+        tables = _tables(parametres, memoire_boules, memoire_etats)
+        allumettes_en_jeu, max_allumettes = tables[0].allumettes_en_jeu, tables[0].max_allumettes
+        partagees = (tables[0].tableau(), tables[1].tableau())
+        tables_locales = (TableBoules(*tables[0].joueurs, allumettes_en_jeu, max_allumettes),
+                          TableEtats(*tables[1].joueurs, allumettes_en_jeu))
+        locales = (tables_locales[0].tableau(), tables_locales[1].tableau())
+        instantanes = (np.empty_like(locales[0]), np.empty_like(locales[1]))
+        renforcement = np.array(tables[0].joueurs)
+        boules_initiales = TableBoules(True, True, allumettes_en_jeu, max_allumettes).tableau()
+        flux = None if graine is None else FluxAleatoire(graine).enfant('processus', numero)
+        session = SessionNimm(parametres, *tables_locales, graine=flux)
+        apprentissage_fvaleur = [j for j in (1, 2) if parametres[j][2] == 1]
+
+        _repartir(partagees, locales, instantanes, renforcement, boules_initiales)
+        manches = manches_globales.value
+
+        restantes = nbre_manches
+        while restantes > 0 and not arret.value:
+            for j in apprentissage_fvaleur:
+                session.parametres[j][4][0] = _epsilon_greedy(parametres[j][4], manches)
+            n = min(manches_par_tour, restantes)
+            session.entrainer(n)
+            restantes -= n
+
+            # différences calculées hors du verrou : seuls l'ajout et les lignes modifiées sont faits sous le verrou
+            deltas = (locales[0] - instantanes[0], locales[1] - instantanes[1])
+            lignes = deltas[0].any(axis=2) & renforcement[:, None]
+            with verrou:
+                _fusionner(partagees, deltas, lignes, boules_initiales)
+                manches_globales.value += n
+                manches = manches_globales.value
+                for j in range(2):
+                    if session.scores[j + 4] and not durees_50[j]:  # moyenne mobile de 50% atteinte
+                        durees_50[j] = perf_counter() - debut
+                        durees_50[j + 2] = manches
+                        if arreter_a_50 and parametres[j + 1][1] == 3:
+                            arret.value = True
+            _repartir(partagees, locales, instantanes, renforcement, boules_initiales)
+    finally:
+        # les vues sur la mémoire partagée doivent être libérées avant de la fermer
+        tables = partagees = tables_locales = locales = session = None
+        memoire_boules.close()
+        memoire_etats.close()
+
+
+def entrainer_parallele(parametres, nbre_manches, nbre_processus=None, manches_par_tour=1000,
+                        arreter_a_50=False, graine=None):
+    """ Entraîne les IA de parametres sur nbre_manches manches réparties entre nbre_processus processus
+    Si arreter_a_50 est vrai, tous les processus s'arrêtent dès qu'une IA qui apprend atteint une moyenne mobile de
+    50% de victoires. Retourne les tables fusionnées, le débit et, par joueur, le temps et le nombre total de manches
+    nécessaires pour atteindre les 50% (0 si non atteint) """
+
+    if nbre_processus is None:
+        nbre_processus = multiprocessing.cpu_count()
+    allumettes_en_jeu, max_allumettes = parametres[0][0], parametres[0][1]
+    contexte = multiprocessing.get_context()
+    memoire_boules = shared_memory.SharedMemory(create=True, size=8 * 2 * allumettes_en_jeu * max_allumettes)
+    memoire_etats = shared_memory.SharedMemory(create=True, size=8 * 2 * allumettes_en_jeu)
+    try:
+        partagees = _tables(parametres, memoire_boules, memoire_etats)
+        initiales = (TableBoules(*partagees[0].joueurs, allumettes_en_jeu, max_allumettes),
+                     TableEtats(*partagees[1].joueurs, allumettes_en_jeu))
+        _copier(initiales, partagees)
+
+        verrou = contexte.Lock()
+        manches_globales = contexte.Value('q', 0, lock=False)
+        durees_50 = contexte.Array('d', 4, lock=False)  # durées puis manches pour atteindre 50%, par joueur
+        arret = contexte.Value('b', False, lock=False)
+        debut = perf_counter()
+        processus = []
+        for numero in range(nbre_processus):
+            part = nbre_manches // nbre_processus + (numero < nbre_manches % nbre_processus)
+            processus.append(contexte.Process(target=_travailleur, args=(
+                numero, parametres, memoire_boules.name, memoire_etats.name, verrou, manches_globales, durees_50,
+                arret, part, manches_par_tour, arreter_a_50, graine, debut)))
+        for p in processus:
+            p.start()
+        for p in processus:
+            p.join()
+        duree = perf_counter() - debut
+        for p in processus:
+            if p.exitcode != 0:
+                raise RuntimeError("Un processus d'entraînement s'est terminé avec le code " + str(p.exitcode))
+
+        # copie des tables partagées dans des tables ordinaires avant de libérer la mémoire partagée
+        _copier(partagees, initiales)
+        partagees = None
+        return {'parametres': parametres,
+                'boules': initiales[0],
+                'etats': initiales[1],
+                'manches': manches_globales.value,
+                'duree': duree,
+                'manches_par_seconde': manches_globales.value / duree,
+                'duree_50': [durees_50[0], durees_50[1]],
+                'manches_50': [int(durees_50[2]), int(durees_50[3])]}
+    finally:
+        partagees = None
+        memoire_boules.close()
+        memoire_boules.unlink()
+        memoire_etats.close()
+        memoire_etats.unlink()
+
+
+if __name__ == '__main__':
+    # 1. Passage à l'échelle : durée (temps réel) d'un même entraînement de nbre_manches manches en fonction du nombre
+    #    de processus, accélération et efficacité par rapport à 1 processus (meilleure de 3 mesures). Les nombres de
+    #    processus à mesurer peuvent être donnés en arguments : python nimm_parallele.py 1 2 4 8 16
+    #    Au-delà du nombre de processeurs disponibles, les processus se partagent les processeurs : mesure marquée *
+    # 2. Temps pour atteindre une moyenne mobile de 50% de victoires en fonction du nombre de processus
+    import os
+    import sys
+
+    parametres = [[40, 4, 0], [1, 1, None, "IA 1", [1.0, 0.05, 0.996, 5, 0.001]],
+                  [1, 3, 0, "IA 2", [1.0, 0.05, 0.996, 5, 0.001]]]
+    processeurs = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else multiprocessing.cpu_count()
+    nombres = sorted({int(n) for n in sys.argv[1:]} or {1, 2, 4, processeurs})
+    nbre_manches = 200000
+    print('%d processeur(s) disponible(s), %d manches' % (processeurs, nbre_manches))
+    print('%10s %12s %12s %14s %12s' % ('processus', 'durée (s)', 'manches/s', 'accélération', 'efficacité'))
+    reference = None
+    for nbre_processus in nombres:
+        duree = min(entrainer_parallele(parametres, nbre_manches, nbre_processus, manches_par_tour=500,
+                                        graine=0)['duree'] for _ in range(3))
+        reference = duree if nbre_processus == 1 else reference
+        acceleration = reference / duree if reference else float('nan')
+        print('%9d%s %12.2f %12.0f %13.2fx %11.0f%%' % (
+            nbre_processus, '*' if nbre_processus > processeurs else ' ', duree, nbre_manches / duree, acceleration,
+            100 * acceleration / nbre_processus))
+
+    print()
+    for nbre_processus in nombres:
+        resultats = entrainer_parallele(parametres, 400000, nbre_processus, manches_par_tour=500,
+                                        arreter_a_50=True, graine=0)
+        print('%2d processus : 50%% atteints en %6.2f s, %7d manches au total, %8.0f manches/s' % (
+            nbre_processus, resultats['duree_50'][1], resultats['manches_50'][1], resultats['manches_par_seconde']))
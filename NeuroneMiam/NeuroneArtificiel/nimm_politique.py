@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+# """
+# Jeu de Nimm - Politique gloutonne en cache des IA par fonction de valeur
+#
+# En exploitation, coup_IA_PC parcourt à chaque coup les max_allumettes états atteignables pour trouver la plus petite
+# valeur, alors que les valeurs des états ne changent qu'en fin de manche. PolitiqueGloutonne garde le coup glouton de
+# chaque joueur pour chaque nombre d'allumettes :
+#     coups[j][allumettes - 1] -> coup (1 à max_allumettes) de coup_IA_PC en exploitation, pour le joueur j + 1
+# Quand la valeur de l'état s change, seuls les coups dont la fenêtre contient s (allumettes s + 2 à
+# s + max_allumettes + 1) sont marqués à recalculer ; ils sont recalculés au moment où ils sont demandés. Après
+# update_listes_fvaleur, les états modifiés sont ceux de l'historique de la manche ; TD(λ) en ligne (nimm_td_lambda)
+# invalide les siens à chaque coup et le tampon de rejeu (nimm_rejeu) invalide toute la table après un lot.
+# Pendant l'entraînement, les états mis à jour sont justement ceux où passe l'IA : une bonne partie des coups demandés
+# est recalculée, et le cache coûte à peu près ce qu'il fait gagner. Il rapporte surtout pour évaluer la politique.
+#
+# Le cache sert aussi à évaluer la politique figée : toutes les periode manches, nbre_manches manches gloutonnes
+# (epsilon = 0) sont jouées ensemble contre l'IA optimale, comme dans nimm_vectorise, avec un générateur propre à
+# l'évaluation. Ni epsilon, ni les tables, ni les tirages de la session ne sont modifiés : les courbes d'apprentissage
+# ne dépendent pas de l'exploration. Les enregistrements (manche, % de victoires de chaque IA par fonction de valeur)
+# sont envoyés à une sortie de nimm_metriques.
+#
+# Utilisation :
+#     politique = PolitiqueGloutonne(periode=1000, nbre_manches=2000, sortie=SortieCSV('courbe.csv'))
+#     SessionNimm(parametres, politique=politique).entrainer(100000)
+# """
+
+import numpy as np
+
+from nimm_metriques import SortieMemoire
+
+
+class PolitiqueGloutonne:
+    """ Coups gloutons des IA par fonction de valeur d'une session, recalculés à la demande après modification des
+    valeurs, et évaluation périodique de la politique figée contre l'IA optimale """
+
+    def __init__(self, periode=None, nbre_manches=1000, sortie=None, graine=None):
+        self.periode = periode  # None : pas d'évaluation périodique
+        self.nbre_manches = nbre_manches
+        self.sortie = SortieMemoire() if sortie is None else sortie
+        self.rng = np.random.default_rng(graine)
+        self.joueurs = ()
+        self.recalculs = 0
+
+    def attacher(self, session):
+        """ Associe le cache aux tables de la session : appelé par SessionNimm, et de nouveau si un joueur ou ses
+        tables sont remplacés """
+
+        self.allumettes_en_jeu = session.allumettes_en_jeu
+        self.max_allumettes = session.max_allumettes
+        self.joueurs = tuple(j for j in range(2) if session.parametres[j + 1][1] == 3
+                             and session.parametres[j + 1][2] == 1)
+        self.valeurs = [session.etats.ligne(j) for j in range(2)]
+        self.coups = [list(range(1, self.allumettes_en_jeu + 1)) for _ in range(2)]
+        # 1 : coup à recalculer ; max_allumettes cases de plus pour marquer une fenêtre sans tester la fin de table
+        self.a_recalculer = [bytearray(self.allumettes_en_jeu + self.max_allumettes) for _ in range(2)]
+        self._fenetre = b'\x01' * self.max_allumettes
+        self.tout_invalider()
+
+    def coup(self, j, allumettes):
+        """ Coup glouton du joueur j + 1 (indicé sur 0) avec allumettes restantes. S'il est à recalculer : même choix
+        que coup_IA_PC, toutes les allumettes si possible, sinon le premier coup qui mène à la plus petite valeur """
+
+        a_recalculer = self.a_recalculer[j]
+        if not a_recalculer[allumettes - 1]:
+            return self.coups[j][allumettes - 1]
+        max_allumettes = self.max_allumettes
+        if allumettes <= max_allumettes:
+            coup = allumettes
+        else:
+            valeurs = self.valeurs[j]
+            valeur = valeurs[allumettes - 2]
+            coup = 1
+            for c in range(2, max_allumettes + 1):
+                if valeurs[allumettes - 1 - c] < valeur:
+                    valeur = valeurs[allumettes - 1 - c]
+                    coup = c
+        self.coups[j][allumettes - 1] = coup
+        a_recalculer[allumettes - 1] = 0
+        self.recalculs += 1
+        return coup
+
+    def invalider(self, j, etats_modifies):
+        """ Marque à recalculer les coups du joueur j + 1 qui peuvent mener à l'un des états modifiés (indicés
+        sur 0) """
+
+        a_recalculer = self.a_recalculer[j]
+        max_allumettes = self.max_allumettes
+        fenetre = self._fenetre
+        for etat in etats_modifies:
+            a_recalculer[etat + 1:etat + 1 + max_allumettes] = fenetre
+
+    def tout_invalider(self):
+        """ Marque à recalculer tous les coups (tables modifiées en dehors de update_listes_fvaleur) """
+
+        for a_recalculer in self.a_recalculer:
+            a_recalculer[:] = b'\x01' * len(a_recalculer)
+
+    def apres_manche(self, session):
+        """ Appelé par la session à la fin de chaque manche, après l'apprentissage : invalide les coups menant aux
+        états de l'historique, puis évalue la politique figée toutes les periode manches """
+
+        for j in self.joueurs:
+            self.invalider(j, session.historique[j])
+        if self.periode and session.manche % self.periode == 0:
+            self.sortie.ecrire(self.evaluer(session.manche))
+
+    def tableau(self, j):
+        """ Coups gloutons du joueur j + 1 en tableau NumPy indicé par allumettes - 1, tous recalculés """
+
+        return np.array([self.coup(j, allumettes) for allumettes in range(1, self.allumettes_en_jeu + 1)])
+
+    def victoires_contre_optimal(self, j, nbre_manches=None):
+        """ Part des manches gagnées par la politique gloutonne figée du joueur j + 1 contre l'IA optimale, chacune
+        commençant une manche sur 2 ; les nbre_manches manches sont jouées ensemble """
+
+        nbre_manches = self.nbre_manches if nbre_manches is None else nbre_manches
+        max_allumettes = self.max_allumettes
+        coups = self.tableau(j)
+        allumettes = np.full(nbre_manches, self.allumettes_en_jeu)
+        a_la_main = np.arange(nbre_manches) % 2  # 0 : politique gloutonne, 1 : IA optimale
+        gagnant = np.zeros(nbre_manches, dtype=np.int64)
+        en_cours = np.arange(nbre_manches)
+        while en_cours.size:
+            restantes = allumettes[en_cours]
+            joueur = a_la_main[en_cours]
+            optimal = restantes % (max_allumettes + 1)
+            aleatoire = 1 + (self.rng.random(en_cours.size) * np.minimum(restantes, max_allumettes)).astype(np.int64)
+            coup = np.where(joueur == 0, coups[restantes - 1], np.where(optimal == 0, aleatoire, optimal))
+            restantes = restantes - coup
+            allumettes[en_cours] = restantes
+            finies = restantes == 0
+            gagnant[en_cours[finies]] = joueur[finies]
+            a_la_main[en_cours] = 1 - joueur
+            en_cours = en_cours[~finies]
+        return float(np.mean(gagnant == 0))
+
+    def evaluer(self, manche=None):
+        """ Enregistrement : manche et % de victoires contre l'IA optimale de chaque IA par fonction de valeur """
+
+        enregistrement = {'manche': manche}
+        for j in self.joueurs:
+            enregistrement['glouton_j' + str(j + 1)] = 100 * self.victoires_contre_optimal(j)
+        return enregistrement
+
+    def fermer(self):
+        """ Ferme la sortie des évaluations """
+
+        self.sortie.fermer()
+
+
+if __name__ == '__main__':
+    # 1. Débit, IA optimale contre IA par fonction de valeur qui exploite (epsilon = 0.05), sans et avec le cache
+    # 2. Coût d'une évaluation de la politique figée : manches gloutonnes jouées ensemble, ou une par une avec jouer()
+    #    avec les tables de la session (epsilon = 0, sans apprentissage)
+    from copy import deepcopy
+    from time import perf_counter
+
+    from Nimm_V1 import jouer
+    from nimm_session import SessionNimm
+
+    nbre_manches, nbre_evaluations = 10000, 2000
+    jeux = ((12, 3), (30, 3), (100, 5))
+
+    def parametres_jeu(allumettes_en_jeu, max_allumettes):
+        return [[allumettes_en_jeu, max_allumettes, 0], [1, 1, None, "IA 1", [0.05, 0.05, 0.996, 20, 0.001]],
+                [1, 3, 1, "IA 2", [0.05, 0.05, 0.996, 20, 0.001]]]
+
+    print('%-16s %16s %16s %12s' % ('jeu', 'sans cache', 'avec cache', 'recalculs'))
+    for allumettes_en_jeu, max_allumettes in jeux:
+        parametres = parametres_jeu(allumettes_en_jeu, max_allumettes)
+        durees = [[], []]
+        for repetition in range(5):  # meilleure de 5 mesures, sans et avec cache en alternance
+            for avec_cache in (0, 1):
+                politique = PolitiqueGloutonne() if avec_cache else None
+                session = SessionNimm(parametres, graine=repetition, politique=politique)
+                debut = perf_counter()
+                session.entrainer(nbre_manches)
+                durees[avec_cache].append(perf_counter() - debut)
+        print('%-16s %12.0f m/s %12.0f m/s %9.2f/m' % (
+            '%d / max %d' % (allumettes_en_jeu, max_allumettes), nbre_manches / min(durees[0]),
+            nbre_manches / min(durees[1]), politique.recalculs / nbre_manches))
+
+    print()
+    print('%-16s %16s %16s %12s' % ('évaluation', 'une par une', 'ensemble', '% victoires'))
+    for allumettes_en_jeu, max_allumettes in jeux:
+        session = SessionNimm(parametres_jeu(allumettes_en_jeu, max_allumettes), graine=0,
+                              politique=PolitiqueGloutonne(graine=0))
+        session.entrainer(nbre_manches)
+
+        parametres = deepcopy(session.parametres)  # epsilon = 0 sur une copie : la session n'est pas modifiée
+        parametres[2][4][0] = 0
+        historique = [[], []]
+        debut = perf_counter()
+        victoires = 0
+        for manche in range(nbre_evaluations):
+            historique[1].clear()
+            allumettes, joueur = allumettes_en_jeu, 1 + manche % 2  # l'IA optimale joue en premier une fois sur 2
+            while allumettes > 0:
+                joueur = joueur % 2 + 1
+                allumettes -= jouer(joueur, allumettes, parametres, session.boules, session.etats, historique)
+            victoires += joueur == 2
+        une_par_une = perf_counter() - debut
+
+        debut = perf_counter()
+        part = session.politique.victoires_contre_optimal(1, nbre_evaluations)
+        ensemble = perf_counter() - debut
+        print('%-16s %14.2f ms %14.2f ms %5.1f / %4.1f' % (
+            '%d / max %d' % (allumettes_en_jeu, max_allumettes), 1000 * une_par_une, 1000 * ensemble,
+            100 * victoires / nbre_evaluations, 100 * part))
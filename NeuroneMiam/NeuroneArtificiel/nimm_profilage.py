@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+# """
+# Jeu de Nimm - Profilage de la boucle de jeu
+#
+# ProfilNimm mesure le temps passé dans chaque phase d'une manche et compte les appels :
+#     - coup/<mode>       : choix d'un coup (jouer), par mode de joueur : humain, aléatoire, optimal,
+#                           aléatoire/optimal, renforcement, fonction valeur
+#     - scores            : update_scores (scores et histo_victoires)
+#     - renforcement      : update_listes_renforcement (avec test_boules_restantes)
+#     - epsilon           : update_epsilon_greedy
+#     - fonction valeur   : update_listes_fvaleur
+#     - affichage         : affichage du jeu (script Nimm_V1 ou jouer_manche(affichage_jeu=True))
+#     - rejeu             : TamponRejeu de la session (nimm_rejeu)
+#     - politique         : PolitiqueGloutonne de la session (nimm_politique) : invalidation et évaluations
+#     - metriques         : MetriquesEntrainement de la session
+#     - autre             : reste de la manche (boucle while, changement de joueur, ...)
+# Toutes les periode manches, un enregistrement (durées en secondes, parts en %, nombre d'appels) est envoyé à une
+# sortie de nimm_metriques (SortieConsole, SortieCSV, SortieJSONL, ...). Le profil peut aussi être écrit au format
+# des piles repliées de flamegraph.pl / speedscope (ecrire_flamegraph), et, avec cprofile=True, cProfile tourne
+# pendant l'entraînement (ecrire_pstats, statistiques).
+#
+# La boucle de jeu est la même avec et sans profil : chaque phase est appelée par mesurer(phase, fonction, *arguments),
+# ProfilNimm.mesurer avec un profil, Nimm_V1.appeler (simple appel de fonction) sans profil. Dans SessionNimm, la
+# fonction jouer de chaque joueur est choisie à la création : jouer chronométrée (chronometre) ou jouer elle-même.
+#
+# Utilisation :
+#     profil = ProfilNimm(periode=100000, sortie=SortieConsole())
+#     SessionNimm(parametres, profil=profil).entrainer(1000000)
+#     print(profil.rapport())
+#     profil.ecrire_flamegraph('nimm.folded')
+# Dans le script Nimm_V1 : PROFILAGE = True
+# """
+
+import cProfile
+import pstats
+from time import perf_counter
+
+from nimm_metriques import SortieMemoire
+
+MODES = ('aléatoire', 'optimal', 'aléatoire/optimal')
+PHASES_FIN_DE_MANCHE = ('renforcement', 'epsilon', 'fonction valeur')
+
+
+def mode_joueur(parametres, joueur):
+    """ Nom du mode de jeu du joueur (1 ou 2) : humain, aléatoire, optimal, aléatoire/optimal, renforcement ou
+    fonction valeur """
+
+    if parametres[joueur][0] == 0:
+        return 'humain'
+    if parametres[joueur][1] == 3:
+        return ('renforcement', 'fonction valeur')[parametres[joueur][2]]
+    return MODES[parametres[joueur][1]]
+
+
+class ProfilNimm:
+    """ Durées et nombres d'appels de chaque phase de la boucle de jeu, émis toutes les periode manches """
+
+    def __init__(self, periode=10000, sortie=None, cprofile=False):
+        self.periode = periode
+        self.sortie = SortieMemoire() if sortie is None else sortie
+        self.durees = {}
+        self.appels = {}
+        self.manches = 0
+        self.duree_manches = 0.0
+        self.profileur = cProfile.Profile() if cprofile else None
+
+    def ajouter(self, phase, duree, appels=1):
+        """ Ajoute duree secondes et appels appels à la phase """
+
+        self.durees[phase] = self.durees.get(phase, 0.0) + duree
+        self.appels[phase] = self.appels.get(phase, 0) + appels
+
+    def mesurer(self, phase, fonction, *arguments):
+        """ Appelle fonction(*arguments) en ajoutant sa durée à la phase ; retourne son résultat """
+
+        debut = perf_counter()
+        resultat = fonction(*arguments)
+        self.ajouter(phase, perf_counter() - debut)
+        return resultat
+
+    def chronometre(self, phase, fonction):
+        """ fonction, avec la durée de chaque appel ajoutée à la phase """
+
+        mesurer = self.mesurer
+
+        def fonction_chronometree(*arguments):
+            return mesurer(phase, fonction, *arguments)
+
+        return fonction_chronometree
+
+    def manche_terminee(self, duree, manche):
+        """ Appelé à la fin de chaque manche avec sa durée totale ; émet un enregistrement toutes les periode
+        manches """
+
+        self.manches += 1
+        self.duree_manches += duree
+        if manche % self.periode == 0:
+            self.sortie.ecrire(self.enregistrement(manche))
+
+    def demarrer(self):
+        """ Démarre cProfile (si cprofile=True) """
+
+        if self.profileur is not None:
+            self.profileur.enable()
+
+    def arreter(self):
+        """ Arrête cProfile (si cprofile=True) """
+
+        if self.profileur is not None:
+            self.profileur.disable()
+
+    def phases(self):
+        """ Durée de chaque phase, avec la phase autre (temps des manches hors phases mesurées), de la plus longue
+        à la plus courte """
+
+        durees = dict(self.durees)
+        durees['autre'] = max(self.duree_manches - sum(self.durees.values()), 0.0)
+        return dict(sorted(durees.items(), key=lambda phase: -phase[1]))
+
+    def enregistrement(self, manche=None):
+        """ Dictionnaire : manche, durée totale, puis durée (s), part (%) et nombre d'appels de chaque phase """
+
+        total = self.duree_manches
+        enregistrement = {'manche': self.manches if manche is None else manche, 'duree': total}
+        for phase, duree in self.phases().items():
+            enregistrement[phase] = duree
+            enregistrement[phase + ' %'] = 100 * duree / total if total else 0.0
+            if phase in self.appels:
+                enregistrement[phase + ' appels'] = self.appels[phase]
+        return enregistrement
+
+    def rapport(self):
+        """ Tableau des phases : durée, part du temps des manches, appels et durée moyenne d'un appel """
+
+        total = self.duree_manches
+        lignes = ['%d manches en %.3f s' % (self.manches, total),
+                  '%-28s %10s %7s %12s %10s' % ('phase', 'durée (s)', '%', 'appels', 'µs/appel')]
+        for phase, duree in self.phases().items():
+            appels = self.appels.get(phase, self.manches)
+            lignes.append('%-28s %10.3f %7.1f %12d %10.3f' % (phase, duree, 100 * duree / total if total else 0.0,
+                                                              appels, 1e6 * duree / appels if appels else 0.0))
+        return '\n'.join(lignes)
+
+    def ecrire_flamegraph(self, chemin):
+        """ Écrit les phases au format des piles repliées (une ligne 'manche;coup;renforcement 1234' par phase, en
+        microsecondes), lu par flamegraph.pl, speedscope, ... """
+
+        with open(chemin, 'w', encoding='utf-8') as fichier:
+            for phase, duree in self.phases().items():
+                if phase.startswith('coup/'):
+                    pile = 'manche;coup;' + phase[5:]
+                elif phase in PHASES_FIN_DE_MANCHE:
+                    pile = 'manche;fin de manche;' + phase
+                else:
+                    pile = 'manche;' + phase
+                fichier.write(pile.replace(' ', '_') + ' ' + str(round(1e6 * duree)) + '\n')
+
+    def ecrire_pstats(self, chemin):
+        """ Écrit les statistiques de cProfile (cprofile=True) dans chemin, lisible par pstats, snakeviz, ... """
+
+        if self.profileur is None:
+            raise ValueError("Le profil a été créé sans cprofile=True")
+        self.profileur.dump_stats(chemin)
+
+    def statistiques(self, tri='cumulative'):
+        """ Statistiques de cProfile (pstats.Stats), triées par tri """
+
+        if self.profileur is None:
+            raise ValueError("Le profil a été créé sans cprofile=True")
+        return pstats.Stats(self.profileur).sort_stats(tri)
+
+    def fermer(self):
+        """ Ferme la sortie des enregistrements """
+
+        self.sortie.fermer()
+
+
+if __name__ == '__main__':
+    # Coût du profilage et répartition du temps pour 2 configurations
+    from nimm_metriques import MetriquesEntrainement
+    from nimm_session import SessionNimm
+
+    configurations = {
+        'optimal / renforcement': [[12, 3, 0], [1, 1, None, "IA 1", [1.0, 0.05, 0.996, 5, 0.001]],
+                                   [1, 3, 0, "IA 2", [1.0, 0.05, 0.996, 5, 0.001]]],
+        'fonction valeur / renforcement': [[12, 3, 0], [1, 3, 1, "IA 1", [1.0, 0.05, 0.996, 20, 0.001]],
+                                           [1, 3, 0, "IA 2", [1.0, 0.05, 0.996, 20, 0.001]]],
+    }
+    nbre_manches = 50000
+
+    for nom, parametres in configurations.items():
+        metriques = MetriquesEntrainement(periode=10000, convergence=False)
+        sans = SessionNimm(parametres, graine=0, metriques=metriques).entrainer(nbre_manches)['manches_par_seconde']
+        profil = ProfilNimm(periode=nbre_manches)
+        metriques = MetriquesEntrainement(periode=10000, convergence=False)
+        avec = SessionNimm(parametres, graine=0, metriques=metriques, profil=profil).entrainer(
+            nbre_manches)['manches_par_seconde']
+        print(nom)
+        print('sans profil : %8.0f manches/s, avec profil : %8.0f manches/s' % (sans, avec))
+        print(profil.rapport())
+        print()
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+# """
+# Jeu de Nimm - Tampon de rejeu de l'expérience des IA qui apprennent
+#
+# update_listes_renforcement et update_listes_fvaleur n'utilisent chaque manche qu'une fois. Le tampon de rejeu garde
+# les transitions des manches récentes dans des tableaux NumPy de taille fixe :
+#     joueur (0 ou 1), allumette (indicée sur 0), coup (indicé sur 0, -1 pour la fonction de valeur), état suivant du
+#     même joueur dans la manche (-1 pour son dernier coup), résultat de la manche pour ce joueur (1 ou -1), priorité
+# et les réapplique par lots tirés au hasard (sans remise), tous d'un coup, aux tables de la session :
+#     - renforcement : les +1/-1 des boules sont additionnés ; une allumette dont toutes les boules ont disparu est
+#       réinitialisée comme dans test_boules_restantes
+#     - fonction de valeur : cible = résultat pour le dernier coup, valeur de l'état suivant sinon ; les k mises à
+#       jour d'un même état dans le lot sont regroupées comme dans nimm_vectorise :
+#       v += (1 - (1 - learning_rate) ** k) * (moyenne des cibles - v)
+#
+# ratio_rejeu est le nombre de transitions rejouées par transition nouvelle : les transitions rejouées s'accumulent et
+# un lot de taille_lot transitions est appliqué dès qu'il est complet.
+#
+# Quand le tampon est plein, les nouvelles transitions remplacent :
+#     - 'fifo'     : les plus anciennes
+#     - 'priorite' : celles de plus faible priorité, c'est-à-dire celles qui n'apprennent plus grand-chose à l'IA.
+#                    La priorité d'une transition de fonction de valeur est l'écart |cible - valeur| ; celle d'une
+#                    transition de renforcement est 1 - probabilité actuelle du coup joué pour une manche gagnée, la
+#                    probabilité du coup pour une manche perdue. Les priorités sont recalculées à chaque rejeu de la
+#                    transition. Les transitions remplacées sont choisies par paquets de capacite / 64, pour ne pas
+#                    parcourir tout le tampon à chaque manche.
+#
+# Utilisation :
+#     rejeu = TamponRejeu(capacite=20000, ratio_rejeu=4)
+#     SessionNimm(parametres, rejeu=rejeu).entrainer(20000)
+# """
+
+import numpy as np
+
+from nimm_tables import TableBoules
+
+MODES = ('fifo', 'priorite')
+
+
+class TamponRejeu:
+    """ Transitions des capacite dernières transitions (ou des plus prioritaires), rejouées par lots """
+
+    def __init__(self, capacite=20000, ratio_rejeu=4, taille_lot=256, mode='fifo', graine=None):
+        if mode not in MODES:
+            raise ValueError("Mode de tampon inconnu : " + str(mode) + " (fifo ou priorite)")
+        self.capacite = capacite
+        self.ratio_rejeu = ratio_rejeu
+        self.taille_lot = taille_lot
+        self.mode = mode
+        self.rng = np.random.default_rng(graine)
+        self.joueur = np.zeros(capacite, dtype=np.int8)
+        self.allumette = np.zeros(capacite, dtype=np.int16)
+        self.coup = np.zeros(capacite, dtype=np.int16)
+        self.suivant = np.zeros(capacite, dtype=np.int16)
+        self.resultat = np.zeros(capacite, dtype=np.int8)
+        self.priorite = np.zeros(capacite, dtype=np.float64)
+        self.taille = 0
+        self.position = 0  # prochaine case remplacée en mode fifo
+        self.liberees = []  # cases choisies pour être remplacées en mode priorite (priorité infinie en attendant)
+        self.a_rejouer = 0.0  # transitions à rejouer, en attente d'un lot complet
+        self.rejouees = 0
+        self._tables = None  # (boules, etats, boules initiales) en tableaux NumPy, pour les tables de la session
+
+    def __len__(self):
+        return self.taille
+
+    def getstate(self):
+        """ État du tampon sérialisable en JSON (sauvegarde de la session, voir SessionNimm.sauvegarder) : transitions
+        rangées, files de remplacement, lot en attente et générateur """
+
+        taille = self.taille
+        return {'capacite': self.capacite,
+                'colonnes': [colonne[:taille].tolist() for colonne in (self.joueur, self.allumette, self.coup,
+                                                                       self.suivant, self.resultat, self.priorite)],
+                'position': self.position,
+                'liberees': self.liberees,
+                'a_rejouer': self.a_rejouer,
+                'rejouees': self.rejouees,
+                'rng': self.rng.bit_generator.state}
+
+    def setstate(self, etat):
+        """ Restaure un état retourné par getstate() ; la capacité doit être la même """
+
+        if etat['capacite'] != self.capacite:
+            raise ValueError("Le tampon sauvegardé a une capacité de " + str(etat['capacite']) + " transitions, pas "
+                             + str(self.capacite))
+        self.taille = len(etat['colonnes'][0])
+        for colonne, valeurs in zip((self.joueur, self.allumette, self.coup, self.suivant, self.resultat,
+                                     self.priorite), etat['colonnes']):
+            colonne[:self.taille] = valeurs
+            colonne[self.taille:] = 0
+        self.position = etat['position']
+        self.liberees = list(etat['liberees'])
+        self.a_rejouer = etat['a_rejouer']
+        self.rejouees = etat['rejouees']
+        self.rng.bit_generator.state = etat['rng']
+        self._tables = None
+
+    def _cases(self, nbre):
+        """ Indices où ranger nbre nouvelles transitions """
+
+        libres = min(nbre, self.capacite - self.taille)
+        cases = list(range(self.taille, self.taille + libres))
+        self.taille += libres
+        reste = nbre - libres
+        if reste and self.mode == 'fifo':
+            cases += [(self.position + i) % self.capacite for i in range(reste)]
+            self.position = (self.position + reste) % self.capacite
+        elif reste:
+            if len(self.liberees) < reste:
+                # parmi les cases qui ne sont pas déjà choisies (priorité finie) : une case n'est jamais choisie 2 fois
+                valides = np.flatnonzero(np.isfinite(self.priorite))
+                nbre_liberees = min(max(reste - len(self.liberees), self.capacite // 64), valides.size)
+                liberees = valides[np.argpartition(self.priorite[valides], nbre_liberees - 1)[:nbre_liberees]]
+                self.priorite[liberees] = np.inf
+                self.liberees += liberees.tolist()
+            cases += self.liberees[-reste:]
+            del self.liberees[-reste:]
+        return cases
+
+    def _priorites(self, choisis, priorites):
+        """ Nouvelles priorités des transitions rejouées (sauf celles qui vont être remplacées) """
+
+        self.priorite[choisis] = np.where(np.isinf(self.priorite[choisis]), np.inf, priorites)
+
+    def ajouter_manche(self, gagnant, parametres, historique, boules, etats):
+        """ Range les transitions de la manche gagnée par gagnant (1 ou 2), pour chaque joueur qui apprend """
+
+        transitions = []
+        for j in range(2):
+            if parametres[j + 1][1] != 3:
+                continue
+            resultat = 1 if j + 1 == gagnant else -1
+            coups = historique[j]
+            if parametres[j + 1][2] == 0:
+                for allumette, coup in coups:
+                    ligne = boules[j, allumette]
+                    probabilite = ligne[coup] / ligne.sum()
+                    transitions.append((j, allumette, coup, -1, resultat,
+                                        1 - probabilite if resultat > 0 else probabilite))
+            else:
+                for i, allumette in enumerate(coups):
+                    suivant = coups[i + 1] if i + 1 < len(coups) else -1
+                    cible = resultat if suivant < 0 else etats[j, suivant]
+                    transitions.append((j, allumette, -1, suivant, resultat, abs(cible - etats[j, allumette])))
+        if transitions:
+            transitions = transitions[-self.capacite:]  # une manche plus longue que le tampon : ses derniers coups
+            cases = self._cases(len(transitions))
+            for colonne, valeurs in zip((self.joueur, self.allumette, self.coup, self.suivant, self.resultat,
+                                         self.priorite), zip(*transitions)):
+                colonne[cases] = valeurs
+        return len(transitions)
+
+    def rejouer(self, parametres, boules, etats, boules_initiales, nbre):
+        """ Applique un lot de nbre transitions (au plus la taille du tampon) tirées au hasard dans le tampon, sans
+        remise : chaque transition est appliquée au plus une fois par lot """
+
+        nbre = min(nbre, self.taille)
+        lot = self.rng.choice(self.taille, nbre, replace=False)
+        joueurs = self.joueur[lot]
+        renforcement = self.coup[lot] >= 0
+        for j in range(2):
+            if parametres[j + 1][1] != 3:
+                continue
+            du_joueur = joueurs == j
+            if parametres[j + 1][2] == 0:
+                choisis = lot[du_joueur & renforcement]
+                table = boules[j]
+                np.add.at(table, (self.allumette[choisis], self.coup[choisis]), self.resultat[choisis])
+                np.maximum(table, 0, out=table)
+                vides = table.sum(axis=1) == 0  # plus de boules : on réinitialise l'allumette
+                table[vides] = boules_initiales[vides]
+                lignes = table[self.allumette[choisis]]
+                probabilites = lignes[np.arange(len(choisis)), self.coup[choisis]] / lignes.sum(axis=1)
+                self._priorites(choisis, np.where(self.resultat[choisis] > 0, 1 - probabilites, probabilites))
+            else:
+                choisis = lot[du_joueur & ~renforcement]
+                table = etats[j]
+                s, suivants = self.allumette[choisis].astype(np.int64), self.suivant[choisis]
+                cibles = np.where(suivants < 0, self.resultat[choisis], table[np.maximum(suivants, 0)])
+                nbre_par_etat = np.bincount(s, minlength=table.size)
+                somme = np.bincount(s, weights=cibles, minlength=table.size)
+                vus = nbre_par_etat > 0
+                pas = 1 - (1 - parametres[j + 1][4][4]) ** nbre_par_etat[vus]
+                table[vus] += pas * (somme[vus] / nbre_par_etat[vus] - table[vus])
+                self._priorites(choisis, np.abs(cibles - table[s]))
+        self.rejouees += nbre
+
+    def apres_manche(self, session, gagnant):
+        """ Appelé par la session à la fin de chaque manche, après l'apprentissage de Nimm_V1 : range la manche puis
+        rejoue les lots complets """
+
+        if self._tables is None or self._tables[3] is not session.boules:
+            self._tables = (session.boules.tableau(), session.etats.tableau(),
+                            TableBoules(True, False, session.allumettes_en_jeu,
+                                        session.max_allumettes).tableau()[0], session.boules)
+        boules, etats, boules_initiales, _ = self._tables
+        self.a_rejouer += self.ratio_rejeu * self.ajouter_manche(gagnant, session.parametres, session.historique,
+                                                                 boules, etats)
+        rejoues = self.rejouees
+        while self.a_rejouer >= self.taille_lot and self.taille:
+            self.rejouer(session.parametres, boules, etats, boules_initiales, self.taille_lot)
+            self.a_rejouer -= self.taille_lot
+        if self.rejouees != rejoues and session.politique is not None:
+            session.politique.tout_invalider()  # valeurs modifiées en dehors de update_listes_fvaleur
+
+
+if __name__ == '__main__':
+    # Manches nécessaires, IA optimale contre IA qui apprend, sans rejeu et avec rejeu (médianes sur plusieurs graines) :
+    #     - renforcement : pour atteindre 50% de victoires (moyenne mobile des 10 dernières manches, scores[5])
+    #     - fonction valeur : pour que l'écart moyen des valeurs apprises aux valeurs exactes passe sous 0.10 (le
+    #       passage à 50% de victoires dépend surtout de la décroissance d'epsilon, pas des valeurs apprises)
+    from statistics import median
+    from time import perf_counter
+
+    from nimm_session import SessionNimm
+
+    graines, periode_test, nbre_manches_max = range(5), 500, 60000
+    configurations = {
+        'renforcement, 30 allumettes, manches pour 50% de victoires': (
+            [[30, 3, 0], [1, 1, None, "IA 1", [1.0, 0.05, 0.996, 5, 0.001]],
+             [1, 3, 0, "IA 2", [1.0, 0.05, 0.996, 5, 0.001]]],
+            lambda session: session.scores[5] > 0),
+        'fonction valeur, 12 allumettes, manches pour un écart moyen <= 0.10': (
+            [[12, 3, 0], [1, 1, None, "IA 1", [1.0, 0.05, 0.996, 20, 0.001]],
+             [1, 3, 1, "IA 2", [1.0, 0.05, 0.996, 20, 0.001]]],
+            lambda session: session.ecart_optimal()[1]['ecart_moyen'] <= 0.10),
+    }
+    variantes = {'sans rejeu': None,
+                 'fifo, ratio 4': dict(ratio_rejeu=4),
+                 'fifo, ratio 16': dict(ratio_rejeu=16),
+                 'fifo, ratio 64': dict(ratio_rejeu=64),
+                 'priorité, ratio 16': dict(ratio_rejeu=16, mode='priorite')}
+
+    def apprentissage(parametres, objectif, options, graine):
+        """ Manche où l'objectif est atteint (testé toutes les periode_test manches) et durée """
+
+        rejeu = None if options is None else TamponRejeu(graine=graine, **options)
+        session = SessionNimm(parametres, graine=graine, rejeu=rejeu)
+        debut = perf_counter()
+        while session.manche < nbre_manches_max:
+            session.entrainer(periode_test)
+            if objectif(session):
+                return session.manche, perf_counter() - debut
+        return nbre_manches_max + 1, perf_counter() - debut
+
+    for nom, (parametres, objectif) in configurations.items():
+        print(nom)
+        print('  %-20s %10s %10s %10s' % ('', 'manches', 'atteint', 'durée (s)'))
+        for variante, options in variantes.items():
+            mesures = [apprentissage(parametres, objectif, options, graine) for graine in graines]
+            atteint = sum(m[0] <= nbre_manches_max for m in mesures)
+            print('  %-20s %10d %7d/%d %10.2f' % (variante, median(m[0] for m in mesures), atteint, len(mesures),
+                                                  median(m[1] for m in mesures)))
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# """
+# Jeu de Nimm - Sauvegarde binaire des IA entraînées
+#
+# Un fichier de sauvegarde contient, dans l'ordre :
+#     - 'NIMM', le numéro de version du format et la longueur de l'entête (2 entiers 32 bits)
+#     - l'entête JSON : paramètres (avec l'epsilon-greedy réduit), scores, manche, états des flux aléatoires, ...
+#       complété par des espaces pour que les tables commencent sur un multiple de 8 octets
+#     - la table des boules (entiers 64 bits) puis la table des états (réels 64 bits), dans l'ordre des octets de la
+#       machine, telles que rangées en mémoire par nimm_tables
+#
+# À la lecture, le fichier est projeté en mémoire (mmap) : les tables ne sont ni lues ni converties, elles sont
+# directement utilisées par TableBoules et TableEtats. Par défaut, la projection est en copie sur écriture : continuer
+# l'entraînement ne modifie pas le fichier.
+# """
+
+import json
+import mmap
+import os
+import struct
+
+from nimm_tables import TableBoules, TableEtats
+
+MAGIE = b'NIMM'
+VERSION = 1
+_DEBUT = struct.Struct('<4sII')  # magie, version, longueur de l'entête
+
+
+def ecrire(chemin, entete, boules, etats):
+    """ Écrit entete (dictionnaire sérialisable en JSON) et les 2 tables dans chemin. Le fichier est d'abord écrit à
+    côté puis renommé : une sauvegarde interrompue ne remplace jamais la précédente """
+
+    entete = dict(entete, allumettes_en_jeu=boules.allumettes_en_jeu, max_allumettes=boules.max_allumettes,
+                  joueurs_boules=list(boules.joueurs), joueurs_etats=list(etats.joueurs))
+    texte = json.dumps(entete).encode('utf-8')
+    texte += b' ' * (-(_DEBUT.size + len(texte)) % 8)
+
+    temporaire = chemin + '.tmp'
+    with open(temporaire, 'wb') as fichier:
+        fichier.write(_DEBUT.pack(MAGIE, VERSION, len(texte)))
+        fichier.write(texte)
+        fichier.write(boules.valeurs.cast('B'))
+        fichier.write(etats.valeurs.cast('B'))
+        fichier.flush()
+        os.fsync(fichier.fileno())
+    os.replace(temporaire, chemin)
+
+
+def lire(chemin, ecriture=False):
+    """ Projette chemin en mémoire et retourne (entete, boules, etats). Avec ecriture=True, les modifications des
+    tables sont reportées dans le fichier """
+
+    with open(chemin, 'r+b' if ecriture else 'rb') as fichier:
+        projection = mmap.mmap(fichier.fileno(), 0, access=mmap.ACCESS_WRITE if ecriture else mmap.ACCESS_COPY)
+
+    magie, version, longueur = _DEBUT.unpack_from(projection)
+    if magie != MAGIE:
+        raise ValueError(chemin + " n'est pas une sauvegarde de Nimm")
+    if version != VERSION:
+        raise ValueError(chemin + " : version de sauvegarde " + str(version) + " non supportée")
+    entete = json.loads(projection[_DEBUT.size:_DEBUT.size + longueur])
+
+    allumettes_en_jeu = entete['allumettes_en_jeu']
+    max_allumettes = entete['max_allumettes']
+    vue = memoryview(projection)
+    debut = _DEBUT.size + longueur
+    fin = debut + 8 * 2 * allumettes_en_jeu * max_allumettes
+    boules = TableBoules(*entete['joueurs_boules'], allumettes_en_jeu, max_allumettes, vue[debut:fin])
+    etats = TableEtats(*entete['joueurs_etats'], allumettes_en_jeu, vue[fin:fin + 8 * 2 * allumettes_en_jeu])
+    return entete, boules, etats
+
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+# """
+# Jeu de Nimm - Serveur de parties humain contre IA (asyncio)
+#
+# Un seul processus sert autant de joueurs humains que de connexions TCP. Chaque connexion est une partie contre
+# l'IA : ses allumettes, son historique de coups, ses scores et le joueur qui commence (alterné à chaque manche,
+# comme joueur1_commence) lui sont propres. L'IA est la même pour toutes les parties : une politique figée
+# (nimm_tournoi.AgentNimm), construite une fois depuis les tables apprises et lue par toutes les parties ;
+# changer_agent() la remplace par une IA plus récente sans interrompre les parties en cours.
+#
+# Les coups de l'IA ne sont pas calculés partie par partie : les demandes arrivées pendant un même tour de la boucle
+# asyncio sont regroupées en un lot, et tout le lot est tiré d'un coup par NumPy (une ligne de la politique cumulée
+# par partie, un nombre aléatoire par partie).
+#
+# Protocole : une ligne par message.
+#     - client -> serveur : le nombre d'allumettes à retirer, '2' ou {"coup": 2}
+#     - serveur -> client : un objet JSON
+#           {"etat": "a_toi", "manche": 1, "allumettes": 9, "max_allumettes": 3, "ia": 3}
+#           {"etat": "fin", "manche": 1, "gagnant": "humain" | "ia", "ia": 1, "scores": {"humain": 1, "ia": 0}}
+#           {"etat": "erreur", "message": "...", "allumettes": 9}
+#       "ia" est le coup que l'IA vient de jouer (null si elle n'a pas joué). Après une fin de manche, la manche
+#       suivante commence aussitôt.
+# Un joueur peut donc jouer avec netcat : nc 127.0.0.1 7777
+#
+# Utilisation :
+#     python nimm_serveur.py --sauvegarde nimm.sav --joueur 2 --port 7777
+#     python nimm_serveur.py --banc  # générateur de charge : latence p50 / p99 des coups
+# """
+
+import asyncio
+import json
+from collections import deque
+from time import perf_counter
+
+import numpy as np
+
+from nimm_aleatoire import FluxAleatoire
+
+
+class PartieNimm:
+    """ État d'une partie humain contre IA, propre à une connexion """
+
+    __slots__ = ('allumettes', 'historique', 'manche', 'ia_commence', 'scores')
+
+    def __init__(self, ia_commence):
+        self.allumettes = 0
+        self.historique = []  # coups de la manche en cours : ('humain' ou 'ia', coup)
+        self.manche = 0
+        self.ia_commence = ia_commence
+        self.scores = {'humain': 0, 'ia': 0}
+
+
+class ServeurNimm:
+    """ Parties humain contre IA simultanées, coups de l'IA tirés par lots
+    agent : AgentNimm (nimm_tournoi) partagé par toutes les parties, taille_lot : nombre maximal de coups par lot
+    fenetre_latences : nombre de coups récents dont la latence est conservée pour statistiques() """
+
+    def __init__(self, agent, graine=None, taille_lot=4096, fenetre_latences=100000):
+        self.agent = None
+        self.changer_agent(agent)
+        self.flux = graine if isinstance(graine, FluxAleatoire) else FluxAleatoire(graine)
+        self.rng = np.random.default_rng(self.flux.randint(0, 2 ** 63 - 1))
+        self.taille_lot = taille_lot
+        self.attente = []  # (allumettes, futur) des coups de l'IA demandés pendant ce tour de boucle
+        # secondes entre la réception d'un coup humain et l'envoi de la réponse, pour les fenetre_latences derniers
+        # coups (file bornée : mémoire bornée pendant servir())
+        self.latences = deque(maxlen=fenetre_latences)
+        self.coups_humains = 0
+        self.lots = 0
+        self.coups_ia = 0
+        self.parties = 0
+        self.serveur = None
+
+    def changer_agent(self, agent):
+        """ Remplace l'IA de toutes les parties ; les coups déjà en attente sont tirés avec la nouvelle IA """
+
+        if self.agent is not None and (agent.allumettes_en_jeu, agent.max_allumettes) != (
+                self.agent.allumettes_en_jeu, self.agent.max_allumettes):
+            raise ValueError("La nouvelle IA ne joue pas au même jeu (allumettes en jeu, retrait max)")
+        self.agent = agent
+        self.cumuls = np.cumsum(agent.politique, axis=1)
+        self.allumettes_en_jeu = agent.allumettes_en_jeu
+        self.max_allumettes = agent.max_allumettes
+
+    def coup_ia(self, allumettes):
+        """ Futur du coup de l'IA avec allumettes allumettes : la demande rejoint le lot du tour de boucle en cours """
+
+        futur = asyncio.get_running_loop().create_future()
+        if not self.attente:
+            asyncio.get_running_loop().call_soon(self._tirer_lot)
+        self.attente.append((allumettes, futur))
+        if len(self.attente) >= self.taille_lot:
+            self._tirer_lot()
+        return futur
+
+    def _tirer_lot(self):
+        """ Tire en une fois les coups de toutes les demandes en attente """
+
+        attente = self.attente
+        if not attente:
+            return
+        self.attente = []
+        allumettes = np.fromiter((a for a, _ in attente), dtype=np.int64, count=len(attente))
+        tirages = self.rng.random(len(attente))
+        coups = 1 + np.minimum((self.cumuls[allumettes] <= tirages[:, None]).sum(axis=1), self.max_allumettes - 1)
+        for (_, futur), coup in zip(attente, coups.tolist()):
+            if not futur.done():
+                futur.set_result(coup)
+        self.lots += 1
+        self.coups_ia += len(attente)
+
+    async def _tour_ia(self, partie):
+        """ Coup de l'IA dans la partie ; retourne le coup """
+
+        coup = await self.coup_ia(partie.allumettes)
+        partie.allumettes -= coup
+        partie.historique.append(('ia', coup))
+        return coup
+
+    async def _nouvelle_manche(self, partie):
+        """ Commence la manche suivante (l'IA joue d'abord si c'est son tour) ; retourne le message à envoyer """
+
+        partie.manche += 1
+        partie.allumettes = self.allumettes_en_jeu
+        partie.historique = []
+        coup = await self._tour_ia(partie) if partie.ia_commence else None
+        partie.ia_commence = not partie.ia_commence  # inverser le joueur pour la prochaine manche
+        return {'etat': 'a_toi', 'manche': partie.manche, 'allumettes': partie.allumettes,
+                'max_allumettes': self.max_allumettes, 'ia': coup}
+
+    async def _jouer(self, partie, ligne):
+        """ Traite le coup humain reçu dans ligne ; retourne les messages à envoyer """
+
+        try:
+            donnees = json.loads(ligne)
+            coup = donnees['coup'] if isinstance(donnees, dict) else donnees
+            if not isinstance(coup, int) or isinstance(coup, bool):
+                raise ValueError
+        except (ValueError, KeyError):
+            return [{'etat': 'erreur', 'message': "Coup attendu : un nombre d'allumettes, 2 ou {\"coup\": 2}",
+                     'allumettes': partie.allumettes}]
+        if not 1 <= coup <= min(self.max_allumettes, partie.allumettes):  # comme choix() de Nimm_V1
+            return [{'etat': 'erreur', 'message': "Il faut retirer entre 1 et " +
+                     str(min(self.max_allumettes, partie.allumettes)) + " allumettes", 'allumettes': partie.allumettes}]
+
+        partie.allumettes -= coup
+        partie.historique.append(('humain', coup))
+        coup_ia = None
+        if partie.allumettes > 0:
+            coup_ia = await self._tour_ia(partie)
+            if partie.allumettes > 0:
+                return [{'etat': 'a_toi', 'manche': partie.manche, 'allumettes': partie.allumettes,
+                         'max_allumettes': self.max_allumettes, 'ia': coup_ia}]
+        gagnant = partie.historique[-1][0]  # le joueur qui retire la dernière allumette gagne
+        partie.scores[gagnant] += 1
+        return [{'etat': 'fin', 'manche': partie.manche, 'gagnant': gagnant, 'ia': coup_ia,
+                 'scores': dict(partie.scores)},
+                await self._nouvelle_manche(partie)]
+
+    async def _session(self, lecteur, ecrivain):
+        """ Une connexion : une partie, jusqu'à la déconnexion du client """
+
+        self.parties += 1
+        partie = PartieNimm(self.flux.randint(0, 1) == 1)  # pile ou face pour la première manche
+
+        async def envoyer(messages):
+            ecrivain.write(''.join(json.dumps(message) + '\n' for message in messages).encode('utf-8'))
+            await ecrivain.drain()
+
+        try:
+            await envoyer([await self._nouvelle_manche(partie)])
+            while True:
+                ligne = await lecteur.readline()
+                if not ligne:
+                    break
+                debut = perf_counter()
+                messages = await self._jouer(partie, ligne)
+                await envoyer(messages)
+                self.latences.append(perf_counter() - debut)
+                self.coups_humains += 1
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):  # ValueError : ligne trop longue
+            pass
+        finally:
+            self.parties -= 1
+            ecrivain.close()
+
+    async def demarrer(self, hote='127.0.0.1', port=7777, backlog=1024):
+        """ Ouvre le serveur ; port=0 choisit un port libre (self.port). backlog : connexions en attente d'acceptation,
+        à augmenter si beaucoup de joueurs se connectent en même temps """
+
+        self.serveur = await asyncio.start_server(self._session, hote, port, limit=1024, backlog=backlog)
+        self.port = self.serveur.sockets[0].getsockname()[1]
+        return self.serveur
+
+    def statistiques(self):
+        """ Latence des fenetre_latences derniers coups (p50, p99, max en millisecondes), nombre total de coups et
+        taille moyenne des lots de l'IA """
+
+        latences = np.fromiter(self.latences, dtype=np.float64, count=len(self.latences)) * 1000
+        return {'coups': self.coups_humains,
+                'p50_ms': float(np.percentile(latences, 50)) if len(latences) else 0.0,
+                'p99_ms': float(np.percentile(latences, 99)) if len(latences) else 0.0,
+                'max_ms': float(latences.max()) if len(latences) else 0.0,
+                'lots': self.lots,
+                'coups_par_lot': self.coups_ia / self.lots if self.lots else 0.0}
+
+
+async def client_charge(hote, port, nbre_coups, latences, alea):
+    """ Joueur simulé : nbre_coups coups aléatoires, en notant la durée de chaque aller-retour """
+
+    lecteur, ecrivain = await asyncio.open_connection(hote, port)
+    message = json.loads(await lecteur.readline())
+    for _ in range(nbre_coups):
+        coup = alea.randint(1, min(message['max_allumettes'], message['allumettes']))
+        debut = perf_counter()
+        ecrivain.write(b'%d\n' % coup)
+        message = json.loads(await lecteur.readline())
+        if message['etat'] == 'fin':
+            message = json.loads(await lecteur.readline())
+        latences.append(perf_counter() - debut)
+    ecrivain.close()
+    await ecrivain.wait_closed()
+
+
+async def generer_charge(hote, port, nbre_clients, nbre_coups, graine=0):
+    """ nbre_clients joueurs simultanés jouant nbre_coups coups chacun ; retourne les latences vues des clients (s) et
+    la durée totale """
+
+    flux = FluxAleatoire(graine)
+    latences = []
+    debut = perf_counter()
+    await asyncio.gather(*(client_charge(hote, port, nbre_coups, latences, flux.enfant('client', numero))
+                           for numero in range(nbre_clients)))
+    return latences, perf_counter() - debut
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from nimm_tournoi import AgentNimm
+
+    analyseur = argparse.ArgumentParser(description="Serveur de parties de Nimm humain contre IA")
+    analyseur.add_argument('--sauvegarde', help="sauvegarde (nimm_sauvegarde) de l'IA ; IA optimale par défaut")
+    analyseur.add_argument('--joueur', type=int, default=2, help="joueur (1 ou 2) de la sauvegarde qui sert d'IA")
+    analyseur.add_argument('--epsilon', type=float, help="epsilon-greedy d'une IA par fonction de valeur")
+    analyseur.add_argument('--hote', default='127.0.0.1')
+    analyseur.add_argument('--port', type=int, default=7777)
+    analyseur.add_argument('--banc', action='store_true',
+                           help="générateur de charge : latence des coups pour 10 à 1000 joueurs simultanés")
+    arguments = analyseur.parse_args()
+
+    if arguments.sauvegarde:
+        agent = AgentNimm.depuis_sauvegarde(arguments.sauvegarde, arguments.joueur, epsilon=arguments.epsilon)
+    else:
+        agent = AgentNimm.optimal(12, 3)
+
+    async def servir():
+        serveur = await ServeurNimm(agent).demarrer(arguments.hote, arguments.port)
+        print('Serveur de Nimm sur ' + arguments.hote + ':' + str(arguments.port))
+        async with serveur:
+            await serveur.serve_forever()
+
+    async def banc():
+        # clients et serveur partagent le même processus : les latences comprennent le travail des clients
+        print('%8s %14s %8s %10s %10s %12s %12s %10s %10s' % (
+            'clients', 'IA', 'coups', 'p50 (ms)', 'p99 (ms)', 'serveur p50', 'serveur p99', 'coups/lot', 'coups/s'))
+        for nbre_clients, nbre_coups in ((10, 500), (100, 200), (1000, 50)):
+            for nom, taille_lot in (('coup par coup', 1), ('par lots', 4096)):
+                serveur = ServeurNimm(agent, graine=0, taille_lot=taille_lot)
+                await serveur.demarrer(arguments.hote, 0)
+                latences, duree = await generer_charge(arguments.hote, serveur.port, nbre_clients, nbre_coups)
+                serveur.serveur.close()
+                await serveur.serveur.wait_closed()
+                statistiques = serveur.statistiques()
+                latences = np.array(latences) * 1000
+                print('%8d %14s %8d %10.3f %10.3f %12.3f %12.3f %10.1f %10.0f' % (
+                    nbre_clients, nom, len(latences), np.percentile(latences, 50), np.percentile(latences, 99),
+                    statistiques['p50_ms'], statistiques['p99_ms'], statistiques['coups_par_lot'],
+                    len(latences) / duree))
+
+    asyncio.run(banc() if arguments.banc else servir())
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+# """
+# Jeu de Nimm - Moteur d'entraînement sans interaction
+#
+# Permet d'entraîner les IA de Nimm_V1 (renforcement et fonction de valeur) sur un grand nombre de manches, sans
+# input() ni print() dans la boucle de jeu. Les fonctions de jeu et d'apprentissage sont celles de Nimm_V1 :
+# jouer, update_listes_renforcement, update_listes_fvaleur, update_epsilon_greedy.
+#
+# Utilisation :
+#     from nimm_session import SessionNimm, entrainer
+#     resultats = entrainer(parametres, 100000)
+#     resultats['boules'], resultats['etats'], resultats['scores'], resultats['manches_par_seconde']
+#
+# Sauvegarde et reprise (voir nimm_sauvegarde) :
+#     session.entrainer(10000000, chemin_sauvegarde='nimm.sav', periode_sauvegarde=100000)
+#     session = SessionNimm.reprendre('nimm.sav')  # reprend à la manche sauvegardée, même suite aléatoire
+#     session = SessionNimm.reprendre('nimm.sav', rejeu=TamponRejeu())  # avec le tampon de rejeu sauvegardé
+#     session.installer_agent('nimm.sav', 2, 1)  # l'IA 2 sauvegardée devient le joueur 1 d'une autre session
+#
+# Reproductibilité (voir nimm_aleatoire) : SessionNimm(parametres, graine=42) donne toujours les mêmes manches et les
+# mêmes tables. Chaque joueur tire dans son propre flux, dérivé de la graine de la session.
+# """
+
+from copy import deepcopy
+from time import perf_counter
+
+from Nimm_V1 import (jouer, update_scores, fin_de_manche, initialiser_matrice, pile_ou_face, affiche_jeu, appeler)
+from nimm_aleatoire import FluxAleatoire
+from nimm_metriques import MoyenneMobile
+from nimm_profilage import mode_joueur
+from nimm_sauvegarde import ecrire, lire
+from nimm_solveur import resoudre, distance_boules, distance_etats
+
+
+class SessionNimm:
+    """ Session de jeu entre 2 IA : conserve les paramètres, les tables d'apprentissage et les scores d'une manche
+    à l'autre. Les paramètres sont copiés, la liste parametres de l'appelant n'est donc jamais modifiée
+    fenetre est le nombre de manches de la moyenne mobile des scores, metriques un éventuel MetriquesEntrainement
+    graine est un entier, un FluxAleatoire, ou None pour une graine tirée au hasard
+    profil est un éventuel ProfilNimm (nimm_profilage) : les phases de chaque manche sont alors mesurées
+    rejeu est un éventuel TamponRejeu (nimm_rejeu) : l'expérience des manches récentes est rejouée par lots
+    politique est une éventuelle PolitiqueGloutonne (nimm_politique) : coups gloutons de la fonction de valeur en
+    cache et évaluation périodique de la politique figée """
+
+    def __init__(self, parametres, boules=None, etats=None, fenetre=10, metriques=None, graine=None, profil=None,
+                 rejeu=None, politique=None):
+        for j in range(1, 3):
+            if parametres[j][0] == 0:
+                raise ValueError("Le joueur " + str(j) + " est humain : une session sans interaction ne peut opposer "
+                                 "que des IA")
+
+        self.parametres = deepcopy(parametres)
+        self.allumettes_en_jeu = self.parametres[0][0]
+        self.max_allumettes = self.parametres[0][1]
+
+        if boules is None:
+            boules = initialiser_matrice('renforcement', self.parametres[1][2] == 0, self.parametres[2][2] == 0,
+                                         self.allumettes_en_jeu, self.max_allumettes)
+        if etats is None:
+            etats = initialiser_matrice('fonction de valeur', self.parametres[1][2] == 1,
+                                        self.parametres[2][2] == 1, self.allumettes_en_jeu, self.max_allumettes)
+        self.boules = boules
+        self.etats = etats
+        self.solution = resoudre(self.allumettes_en_jeu, self.max_allumettes)  # coups des IA optimales
+
+        self.manche = 0
+        self.scores = [0, 0, 0, 0, 0, 0]
+        self.histo_victoires = [MoyenneMobile(fenetre), MoyenneMobile(fenetre)]
+        self.metriques = metriques
+        self.rejeu = rejeu
+        self.politique = politique
+        if politique is not None:
+            politique.attacher(self)
+        self.profil = profil
+        # une seule boucle de jeu : avec un profil, les phases de la manche sont appelées par profil.mesurer et la
+        # fonction jouer de chaque joueur est chronométrée ; sans profil, appels directs
+        if profil is None:
+            self.mesurer = appeler
+            self.jouer = [None, jouer, jouer]
+        else:
+            self.mesurer = profil.mesurer
+            self.jouer = [None] + [profil.chronometre('coup/' + mode_joueur(self.parametres, j), jouer)
+                                   for j in (1, 2)]
+        self.historique = [[], []]  # réutilisé d'une manche à l'autre
+        self.duree = 0.0  # temps passé dans entrainer(), en secondes
+        self.flux = graine if isinstance(graine, FluxAleatoire) else FluxAleatoire(graine)
+        self.alea = [None, self.flux.enfant('joueur', 1), self.flux.enfant('joueur', 2)]  # indicé par joueur
+        self.joueur1_commence = pile_ou_face(self.parametres[1][0], self.parametres[1][3], self.flux)
+
+    def jouer_manche(self, affichage_jeu=False):
+        """ Joue une manche complète, met à jour scores et tables d'apprentissage et retourne le joueur gagnant
+        Avec un profil, la durée de chaque phase est ajoutée au profil """
+
+        profil = self.profil
+        if profil is not None:
+            debut_manche = perf_counter()
+        mesurer = self.mesurer
+        jouer_joueur = self.jouer
+        parametres = self.parametres
+        historique = self.historique
+        alea = self.alea
+        historique[0].clear()
+        historique[1].clear()
+        self.manche += 1
+        allumettes = self.allumettes_en_jeu
+        joueur = 2 if self.joueur1_commence else 1  # le premier coup est joué par l'autre joueur
+        nbre_coups = 0
+        while allumettes > 0:
+            if affichage_jeu:
+                mesurer('affichage', affiche_jeu, allumettes, self.max_allumettes)
+            joueur = joueur % 2 + 1
+            nbre_coups += 1
+            allumettes -= jouer_joueur[joueur](joueur, allumettes, parametres, self.boules, self.etats, historique,
+                                               alea[joueur], self.politique, self.solution)
+
+        mesurer('scores', update_scores, joueur, self.scores, self.histo_victoires, self.manche)
+        fin_de_manche(joueur, parametres, self.boules, self.etats, historique, self.manche, mesurer)
+        if self.rejeu is not None:
+            mesurer('rejeu', self.rejeu.apres_manche, self, joueur)
+        if self.politique is not None:
+            mesurer('politique', self.politique.apres_manche, self)
+        if self.metriques is not None:
+            mesurer('metriques', self.metriques.enregistrer, self, joueur, nbre_coups)
+
+        self.joueur1_commence = not self.joueur1_commence  # inverser le joueur pour la prochaine manche
+        if profil is not None:
+            profil.manche_terminee(perf_counter() - debut_manche, self.manche)
+        return joueur
+
+    def entrainer(self, nbre_manches, chemin_sauvegarde=None, periode_sauvegarde=100000):
+        """ Joue nbre_manches manches supplémentaires et retourne les résultats de la session
+        Si chemin_sauvegarde est donné, la session y est sauvegardée toutes les periode_sauvegarde manches et à la fin
+        """
+
+        jouer_manche = self.jouer_manche
+        if self.profil is not None:
+            self.profil.demarrer()
+        debut = perf_counter()
+        if chemin_sauvegarde is None:
+            for _ in range(nbre_manches):
+                jouer_manche()
+        else:
+            for _ in range(nbre_manches):
+                jouer_manche()
+                if self.manche % periode_sauvegarde == 0:
+                    maintenant = perf_counter()
+                    self.duree += maintenant - debut
+                    debut = maintenant
+                    self.sauvegarder(chemin_sauvegarde)
+        self.duree += perf_counter() - debut
+        if self.profil is not None:
+            self.profil.arreter()
+        if chemin_sauvegarde is not None and self.manche % periode_sauvegarde != 0:
+            self.sauvegarder(chemin_sauvegarde)
+        return self.resultats()
+
+    def sauvegarder(self, chemin):
+        """ Sauvegarde la session entre 2 manches : tables, paramètres (epsilon-greedy réduit compris), scores,
+        manche en cours, état des flux aléatoires de la session et des joueurs, et contenu du tampon de rejeu """
+
+        ecrire(chemin, {'parametres': self.parametres,
+                        'manche': self.manche,
+                        'scores': self.scores,
+                        'histo_victoires': [h.liste() for h in self.histo_victoires],
+                        'fenetre': self.histo_victoires[0].fenetre,
+                        'joueur1_commence': self.joueur1_commence,
+                        'duree': self.duree,
+                        'aleatoire': [self.flux.getstate(), self.alea[1].getstate(), self.alea[2].getstate()],
+                        'rejeu': None if self.rejeu is None else self.rejeu.getstate()},
+               self.boules, self.etats)
+
+    @classmethod
+    def reprendre(cls, chemin, metriques=None, profil=None, rejeu=None, politique=None):
+        """ Recrée une session sauvegardée, prête à jouer la manche suivante. Les tables sont projetées en mémoire
+        depuis le fichier, qui n'est pas modifié par la suite de l'entraînement
+        metriques, profil, rejeu et politique sont ceux de SessionNimm (politique est attachée aux tables reprises).
+        Le contenu d'un tampon de rejeu sauvegardé avec la session est restauré dans rejeu (même capacité) : la suite
+        de l'entraînement est celle de la session non interrompue. Sans rejeu, le tampon sauvegardé est ignoré ; une
+        session sauvegardée sans tampon reprend avec rejeu vide """
+
+        entete, boules, etats = lire(chemin)
+        session = cls(entete['parametres'], boules, etats, metriques=metriques, profil=profil, rejeu=rejeu,
+                      politique=politique)
+        if rejeu is not None and entete.get('rejeu') is not None:
+            rejeu.setstate(entete['rejeu'])
+        session.manche = entete['manche']
+        session.scores = entete['scores']
+        session.histo_victoires = [MoyenneMobile(entete['fenetre'], h) for h in entete['histo_victoires']]
+        session.joueur1_commence = entete['joueur1_commence']
+        session.duree = entete['duree']
+        session.flux, alea1, alea2 = (FluxAleatoire.depuis_etat(etat) for etat in entete['aleatoire'])
+        session.alea = [None, alea1, alea2]
+        return session
+
+    def installer_agent(self, chemin, joueur_sauvegarde, joueur):
+        """ Remplace le joueur (1 ou 2) de la session par l'IA joueur_sauvegarde d'une sauvegarde : ses paramètres
+        et ses tables apprises sont copiés dans la session """
+
+        entete, boules, etats = lire(chemin)
+        if (entete['allumettes_en_jeu'], entete['max_allumettes']) != (self.allumettes_en_jeu, self.max_allumettes):
+            raise ValueError("La sauvegarde " + chemin + " a été entraînée sur un autre jeu : " +
+                             str(entete['allumettes_en_jeu']) + " allumettes, retrait max " +
+                             str(entete['max_allumettes']))
+
+        parametres = deepcopy(entete['parametres'][joueur_sauvegarde])
+        if parametres[0] == 0:
+            raise ValueError("Le joueur " + str(joueur_sauvegarde) + " de la sauvegarde est humain")
+        self.parametres[joueur] = parametres
+
+        j, j_sauvegarde = joueur - 1, joueur_sauvegarde - 1
+        for allumette in range(self.allumettes_en_jeu):
+            self.boules.ligne(j, allumette)[:] = boules.ligne(j_sauvegarde, allumette)
+        self.etats.ligne(j)[:] = etats.ligne(j_sauvegarde)
+        joueurs = list(self.boules.joueurs)
+        joueurs[j] = parametres[2] == 0
+        self.boules.joueurs = tuple(joueurs)
+        joueurs = list(self.etats.joueurs)
+        joueurs[j] = parametres[2] == 1
+        self.etats.joueurs = tuple(joueurs)
+        if self.politique is not None:
+            self.politique.attacher(self)
+
+    def manches_par_seconde(self):
+        """ Débit moyen de la session depuis sa création """
+
+        if self.duree == 0:
+            return 0.0
+        return self.manche / self.duree
+
+    def ecart_optimal(self):
+        """ Écart des tables apprises par chaque IA à la politique optimale calculée par nimm_solveur
+        (None pour un joueur qui n'apprend pas) """
+
+        solution = self.solution
+        ecarts = [None, None]
+        for j in range(2):
+            if self.parametres[j + 1][2] == 0:
+                ecarts[j] = distance_boules(solution, self.boules, j)
+            elif self.parametres[j + 1][2] == 1:
+                ecarts[j] = distance_etats(solution, self.etats, j)
+        return ecarts
+
+    def resultats(self):
+        """ Dictionnaire des tables apprises, des scores et du débit de la session """
+
+        return {'parametres': self.parametres,
+                'boules': self.boules,
+                'etats': self.etats,
+                'scores': self.scores,
+                'manches': self.manche,
+                'duree': self.duree,
+                'manches_par_seconde': self.manches_par_seconde()}
+
+
+def entrainer(parametres, nbre_manches, graine=None):
+    """ Crée une session pour les paramètres donnés, l'entraîne sur nbre_manches manches et retourne ses résultats """
+
+    return SessionNimm(parametres, graine=graine).entrainer(nbre_manches)
+
+
+if __name__ == '__main__':
+    # Comparaison du débit avec la boucle du script Nimm_V1 (affichage du jeu redirigé vers /dev/null)
+    import os
+    import sys
+
+    configurations = {
+        'optimal / renforcement': [[12, 3, 0], [1, 1, None, "IA 1", [1.0, 0.05, 0.996, 5, 0.001]],
+                                   [1, 3, 0, "IA 2", [1.0, 0.05, 0.996, 5, 0.001]]],
+        'optimal / fonction valeur': [[12, 3, 0], [1, 1, None, "IA 1", [1.0, 0.05, 0.996, 20, 0.001]],
+                                      [1, 3, 1, "IA 2", [1.0, 0.05, 0.996, 20, 0.001]]],
+    }
+    nbre_manches = 5000
+
+    for nom, parametres in configurations.items():
+        resultats = entrainer(parametres, nbre_manches)
+        print(nom)
+        print('  session               : %10.0f manches/s' % resultats['manches_par_seconde'])
+
+        session = SessionNimm(parametres)
+        sortie = sys.stdout
+        with open(os.devnull, 'w') as sys.stdout:
+            debut = perf_counter()
+            for _ in range(nbre_manches):
+                session.jouer_manche(affichage_jeu=True)
+            duree = perf_counter() - debut
+        sys.stdout = sortie
+        print('  script avec affichage : %10.0f manches/s' % (nbre_manches / duree))
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# """
+# Jeu de Nimm - Résolution exacte
+#
+# Calcule une fois pour toutes, par induction à rebours depuis 0 allumette, si chaque position est gagnante ou
+# perdante pour le joueur qui a la main, et quels coups gagnent. Le joueur qui retire la dernière allumette gagne ; un
+# joueur qui ne peut plus jouer perd.
+#
+# Les coups autorisés sont 1, 2, ... max_allumettes comme dans Nimm_V1, ou n'importe quel ensemble de coups (par exemple
+# (1, 3, 4)). Pour plusieurs tas, on utilise les nombres de Grundy d'un tas : une position est perdante si le ou
+# exclusif des nombres de Grundy des tas est nul.
+#
+# La solution sert :
+#     - de politique optimale en O(1) : coup_optimal(allumettes, alea) lit coups_gagnants ; c'est le coup des IA
+#       optimale et aléatoire/optimale de Nimm_V1.jouer, valable pour tout ensemble de coups. Pour plusieurs tas,
+#       nimm_multi_tas.JeuNimm.coup_optimal combine les nombres de Grundy de chaque tas
+#     - d'oracle : distance_etats et distance_boules mesurent l'écart des tables apprises à la politique optimale,
+#       sans jouer de manches supplémentaires
+# """
+
+from functools import lru_cache
+
+
+class SolutionNimm:
+    """ Valeur et coups gagnants de chaque position d'un tas de 0 à allumettes_en_jeu allumettes """
+
+    __slots__ = ('coups', 'grundy', 'coups_gagnants')
+
+    def __init__(self, allumettes_en_jeu, coups):
+        self.coups = coups
+        self.grundy = [0] * (allumettes_en_jeu + 1)
+        self.coups_gagnants = [()] * (allumettes_en_jeu + 1)
+        for allumettes in range(1, allumettes_en_jeu + 1):
+            possibles = [c for c in coups if c <= allumettes]
+            suivants = {self.grundy[allumettes - c] for c in possibles}
+            g = 0
+            while g in suivants:  # plus petit entier absent (mex)
+                g += 1
+            self.grundy[allumettes] = g
+            # un coup gagne s'il laisse l'adversaire sur une position perdante
+            self.coups_gagnants[allumettes] = tuple(c for c in possibles if self.grundy[allumettes - c] == 0)
+
+    def gagnante(self, allumettes):
+        """ Vrai si le joueur qui a la main avec allumettes allumettes gagne en jouant parfaitement """
+
+        return self.grundy[allumettes] != 0
+
+    def valeur(self, allumettes):
+        """ Récompense finale du joueur qui a la main en jeu parfait : 1 ou -1 """
+
+        return 1 if self.grundy[allumettes] else -1
+
+    def coup_optimal(self, allumettes, alea):
+        """ Plus petit coup gagnant, ou coup tiré par alea (module random ou flux de nimm_aleatoire) parmi les coups
+        possibles si la position est perdante, comme l'IA optimale de Nimm_V1 """
+
+        gagnants = self.coups_gagnants[allumettes]
+        if gagnants:
+            return gagnants[0]
+        possibles = [c for c in self.coups if c <= allumettes]
+        return possibles[alea.randint(0, len(possibles) - 1)]
+
+
+@lru_cache(maxsize=None)
+def resoudre(allumettes_en_jeu, max_allumettes=None, coups=None):
+    """ Solution d'un tas jusqu'à allumettes_en_jeu allumettes, avec les coups 1 à max_allumettes ou l'ensemble de
+    coups donné (tuple). Les solutions sont mises en cache """
+
+    if coups is None:
+        if max_allumettes is None:
+            raise ValueError("Il faut donner max_allumettes ou l'ensemble des coups autorisés")
+        coups = tuple(range(1, max_allumettes + 1))
+    return SolutionNimm(allumettes_en_jeu, tuple(sorted(set(coups))))
+
+
+def distance_etats(solution, etats, j):
+    """ Écart des valeurs apprises par le joueur j + 1 (indicé sur 0) aux valeurs exactes (1 pour une position
+    gagnante, -1 pour une position perdante) :
+        - ecart_moyen : moyenne des écarts absolus sur toutes les positions
+        - accord      : proportion des positions gagnantes où le coup glouton de la fonction de valeur est gagnant """
+
+    allumettes_en_jeu = etats.allumettes_en_jeu
+    ecart = 0.0
+    gagnantes = accords = 0
+    for allumettes in range(1, allumettes_en_jeu + 1):
+        ecart += abs(etats[j, allumettes - 1] - solution.valeur(allumettes))
+        if solution.gagnante(allumettes):
+            gagnantes += 1
+            possibles = [c for c in solution.coups if c <= allumettes]
+            # coup glouton : prendre toutes les allumettes si possible, sinon mener l'adversaire sur la plus petite
+            # valeur
+            if allumettes in possibles:
+                glouton = allumettes
+            else:
+                glouton = min(possibles, key=lambda c: etats[j, allumettes - c - 1])
+            accords += glouton in solution.coups_gagnants[allumettes]
+    return {'ecart_moyen': ecart / allumettes_en_jeu,
+            'accord': accords / gagnantes if gagnantes else 1.0}
+
+
+def distance_boules(solution, boules, j):
+    """ Écart de la distribution des coups tirés dans les urnes du joueur j + 1 (indicé sur 0) à la politique
+    optimale, sur les positions gagnantes :
+        - probabilite_optimale : probabilité moyenne de tirer un coup gagnant
+        - variation_totale     : distance en variation totale moyenne à la politique qui joue uniformément
+                                 les coups gagnants """
+
+    gagnantes = 0
+    probabilite = variation = 0.0
+    for allumettes in range(1, boules.allumettes_en_jeu + 1):
+        gagnants = solution.coups_gagnants[allumettes]
+        if not gagnants:
+            continue
+        gagnantes += 1
+        ligne = boules.ligne(j, allumettes - 1)
+        total = sum(ligne)
+        for coup, nbre in enumerate(ligne, 1):
+            p = nbre / total
+            p_optimale = 1 / len(gagnants) if coup in gagnants else 0.0
+            if p_optimale:
+                probabilite += p
+            variation += abs(p - p_optimale) / 2
+    return {'probabilite_optimale': probabilite / gagnantes if gagnantes else 1.0,
+            'variation_totale': variation / gagnantes if gagnantes else 0.0}
+
+
+if __name__ == '__main__':
+    solution = resoudre(12, 3)
+    print('12 allumettes, retrait 1 à 3 : positions perdantes',
+          [a for a in range(13) if not solution.gagnante(a)])
+    solution = resoudre(30, coups=(1, 3, 4))
+    print('30 allumettes, coups (1, 3, 4) : positions perdantes',
+          [a for a in range(31) if not solution.gagnante(a)])
+    somme = solution.grundy[5] ^ solution.grundy[7] ^ solution.grundy[9]
+    print('tas (5, 7, 9), coups (1, 3, 4) : position', 'gagnante' if somme else 'perdante')
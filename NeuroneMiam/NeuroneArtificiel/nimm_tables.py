@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+# """
+# Jeu de Nimm - Tables d'apprentissage compactes
+#
+# Les nombres de boules (apprentissage par renforcement) et les valeurs des états (apprentissage par fonction de
+# valeur) sont rangés dans un seul bloc mémoire contigu d'entiers 64 bits ou de réels 64 bits, au lieu de listes de
+# listes de listes d'objets Python :
+#     boules[j, allumette, coup]  -> nombre de boules du joueur j + 1 (indicé sur 0), comme boules[j][allumette][coup]
+#     etats[j, allumette]         -> valeur de l'état, comme etats[j][allumette]
+#
+# Le bloc mémoire (attribut valeurs) est une memoryview : il peut provenir d'un array.array ou de tout autre tampon
+# (fichier projeté en mémoire, mémoire partagée) et peut être vu sans copie comme un tableau NumPy par tableau().
+#
+# Quand les états ne sont plus numérotés de 1 à allumettes_en_jeu (plusieurs tas, voir nimm_multi_tas), TableCreuse
+# range une ligne par état rencontré, indicée par le code entier de l'état :
+#     table.ligne(table.indice(code))  -> boules ou valeur de l'état
+# Adressage ouvert avec sondage linéaire dans 2 blocs contigus (clés, lignes) ; la table double quand elle est à moitié
+# pleine, la mémoire suit donc le nombre d'états rencontrés et non le nombre d'états possibles.
+# """
+
+from array import array
+
+
+class TableBoules:
+    """ Nombre de boules de chaque couleur, par joueur et par allumette, pour l'apprentissage par renforcement """
+
+    __slots__ = ('allumettes_en_jeu', 'max_allumettes', 'joueurs', 'valeurs')
+
+    def __init__(self, j1, j2, allumettes_en_jeu, max_allumettes, valeurs=None):
+        """ j1 et j2 indiquent si les joueurs 1 et 2 apprennent par renforcement. Si valeurs n'est pas donné,
+        chaque coup possible reçoit 2 boules et chaque coup impossible 0 """
+
+        self.allumettes_en_jeu = allumettes_en_jeu
+        self.max_allumettes = max_allumettes
+        self.joueurs = (j1, j2)
+        if valeurs is None:
+            valeurs = array('q', bytes(8 * 2 * allumettes_en_jeu * max_allumettes))
+            for j in range(2):
+                for allumette in range(allumettes_en_jeu):
+                    self.reinitialiser(j, allumette, valeurs)
+        self.valeurs = memoryview(valeurs).cast('B').cast('q')
+
+    def __getitem__(self, cle):
+        j, allumette, coup = cle
+        return self.valeurs[(j * self.allumettes_en_jeu + allumette) * self.max_allumettes + coup]
+
+    def __setitem__(self, cle, nbre):
+        j, allumette, coup = cle
+        self.valeurs[(j * self.allumettes_en_jeu + allumette) * self.max_allumettes + coup] = nbre
+
+    def ajouter(self, j, allumette, coup, nbre):
+        """ Ajoute nbre boules (négatif pour en retirer) : équivaut à boules[j, allumette, coup] += nbre en un seul
+        calcul d'indice """
+
+        self.valeurs[(j * self.allumettes_en_jeu + allumette) * self.max_allumettes + coup] += nbre
+
+    def ligne(self, j, allumette):
+        """ Vue (sans copie) sur les boules de chaque couleur pour une allumette """
+
+        debut = (j * self.allumettes_en_jeu + allumette) * self.max_allumettes
+        return self.valeurs[debut:debut + self.max_allumettes]
+
+    def reinitialiser(self, j, allumette, valeurs=None):
+        """ Remet 2 boules par coup possible (et 0 pour les coups impossibles) pour une allumette """
+
+        if valeurs is None:
+            valeurs = self.valeurs
+        debut = (j * self.allumettes_en_jeu + allumette) * self.max_allumettes
+        for coup in range(self.max_allumettes):
+            valeurs[debut + coup] = 2 if coup <= allumette else 0
+
+    def en_listes(self):
+        """ Tables au format listes de listes de Nimm_V1 : [] pour un joueur qui n'apprend pas par renforcement """
+
+        return [[self.ligne(j, allumette).tolist() for allumette in range(self.allumettes_en_jeu)]
+                if self.joueurs[j] else [] for j in range(2)]
+
+    def tableau(self):
+        """ Tableau NumPy [joueur, allumette, coup] partageant la mémoire de la table """
+
+        import numpy as np
+        return np.frombuffer(self.valeurs, dtype=np.int64).reshape(2, self.allumettes_en_jeu, self.max_allumettes)
+
+
+class TableEtats:
+    """ Valeur de chaque état (allumette), par joueur, pour l'apprentissage par fonction de valeur """
+
+    __slots__ = ('allumettes_en_jeu', 'joueurs', 'valeurs')
+
+    def __init__(self, j1, j2, allumettes_en_jeu, valeurs=None):
+        """ j1 et j2 indiquent si les joueurs 1 et 2 apprennent par fonction de valeur. Les valeurs sont
+        initialement nulles """
+
+        self.allumettes_en_jeu = allumettes_en_jeu
+        self.joueurs = (j1, j2)
+        if valeurs is None:
+            valeurs = array('d', bytes(8 * 2 * allumettes_en_jeu))
+        self.valeurs = memoryview(valeurs).cast('B').cast('d')
+
+    def __getitem__(self, cle):
+        j, allumette = cle
+        return self.valeurs[j * self.allumettes_en_jeu + allumette]
+
+    def __setitem__(self, cle, valeur):
+        j, allumette = cle
+        self.valeurs[j * self.allumettes_en_jeu + allumette] = valeur
+
+    def ligne(self, j):
+        """ Vue (sans copie) sur les valeurs des états d'un joueur """
+
+        return self.valeurs[j * self.allumettes_en_jeu:(j + 1) * self.allumettes_en_jeu]
+
+    def en_listes(self):
+        """ Tables au format listes de Nimm_V1 : [] pour un joueur qui n'apprend pas par fonction de valeur """
+
+        return [self.ligne(j).tolist() if self.joueurs[j] else [] for j in range(2)]
+
+    def tableau(self):
+        """ Tableau NumPy [joueur, allumette] partageant la mémoire de la table """
+
+        import numpy as np
+        return np.frombuffer(self.valeurs, dtype=np.float64).reshape(2, self.allumettes_en_jeu)
+
+
+_FIBONACCI = 11400714819323198485  # 2 ** 64 / nombre d'or : hachage de Fibonacci des clés
+_MASQUE_64 = (1 << 64) - 1
+CHARGE_MAX = 0.5  # remplissage au-delà duquel la table creuse double
+
+
+class TableCreuse:
+    """ Lignes de largeur valeurs (entiers 64 bits 'q' ou réels 64 bits 'd'), une par état rencontré, indicées par la
+    clé entière de l'état (de 1 à 2 ** 64 - 1, 0 marque une case vide) """
+
+    __slots__ = ('largeur', 'type_valeurs', 'capacite', 'taille', 'cles', 'valeurs', '_decalage')
+
+    def __init__(self, largeur, type_valeurs='d', capacite=1024):
+        """ capacite est arrondie à la puissance de 2 supérieure """
+
+        self.largeur = largeur
+        self.type_valeurs = type_valeurs
+        self.taille = 0
+        self._allouer(max(1 << (capacite - 1).bit_length(), 8))
+
+    def _allouer(self, capacite):
+        """ Nouveaux blocs vides de capacite cases """
+
+        self.capacite = capacite
+        self._decalage = 64 - (capacite.bit_length() - 1)  # la case d'une clé est formée des bits de poids fort
+        self.cles = memoryview(array('Q', bytes(8 * capacite))).cast('B').cast('Q')
+        self.valeurs = memoryview(array(self.type_valeurs, bytes(8 * capacite * self.largeur))).cast('B').cast(
+            self.type_valeurs)
+
+    def __len__(self):
+        return self.taille
+
+    def __contains__(self, cle):
+        return self.indice(cle) >= 0
+
+    def indice(self, cle):
+        """ Numéro de la ligne de l'état cle, -1 s'il n'a pas été rencontré """
+
+        cles = self.cles
+        masque = self.capacite - 1
+        case = ((cle * _FIBONACCI) & _MASQUE_64) >> self._decalage
+        while True:
+            trouvee = cles[case]
+            if trouvee == cle:
+                return case
+            if trouvee == 0:
+                return -1
+            case = (case + 1) & masque
+
+    def ajouter(self, cle, ligne=None):
+        """ Numéro de la ligne de l'état cle, créée avec les valeurs ligne (nulles par défaut) s'il n'a pas été
+        rencontré. Les numéros de ligne obtenus avant un ajout ne sont plus valables s'il a fait doubler la table """
+
+        if cle <= 0:
+            raise ValueError("La clé d'un état doit être un entier positif : 0 marque une case vide")
+        cles = self.cles
+        masque = self.capacite - 1
+        case = ((cle * _FIBONACCI) & _MASQUE_64) >> self._decalage
+        while True:
+            trouvee = cles[case]
+            if trouvee == cle:
+                return case
+            if trouvee == 0:
+                break
+            case = (case + 1) & masque
+        if self.taille + 1 > CHARGE_MAX * self.capacite:
+            self._agrandir(2 * self.capacite)
+            return self.ajouter(cle, ligne)
+        cles[case] = cle
+        self.taille += 1
+        if ligne is not None:
+            self.valeurs[case * self.largeur:(case + 1) * self.largeur] = array(self.type_valeurs, ligne)
+        return case
+
+    def ligne(self, indice):
+        """ Vue (sans copie) sur les valeurs de la ligne indice """
+
+        return self.valeurs[indice * self.largeur:(indice + 1) * self.largeur]
+
+    def etats(self):
+        """ Clés des états rencontrés, dans l'ordre des cases """
+
+        return [cle for cle in self.cles if cle]
+
+    def memoire(self):
+        """ Octets occupés par les 2 blocs """
+
+        return self.cles.nbytes + self.valeurs.nbytes
+
+    def tableau_cles(self):
+        """ Tableau NumPy des clés de chaque case (0 pour une case vide), partageant la mémoire de la table """
+
+        import numpy as np
+        return np.frombuffer(self.cles, dtype=np.uint64)
+
+    def tableau(self):
+        """ Tableau NumPy [case, valeur] partageant la mémoire de la table """
+
+        import numpy as np
+        return np.frombuffer(self.valeurs, dtype=np.dtype(self.type_valeurs)).reshape(self.capacite, self.largeur)
+
+    def _cases(self, cles):
+        """ Case de départ du sondage de chaque clé d'un tableau NumPy """
+
+        import numpy as np
+        return ((cles * np.uint64(_FIBONACCI)) >> np.uint64(self._decalage)).astype(np.int64)
+
+    def indices(self, cles):
+        """ Numéros des lignes d'un tableau de clés (-1 pour les états non rencontrés), cherchés tous ensemble """
+
+        import numpy as np
+        cles = np.asarray(cles, dtype=np.uint64)
+        table = self.tableau_cles()
+        masque = self.capacite - 1
+        resultat = np.full(cles.shape[0], -1, dtype=np.int64)
+        en_cours = np.arange(cles.shape[0])
+        cases = self._cases(cles)
+        while en_cours.size:
+            trouvees = table[cases]
+            egales = trouvees == cles[en_cours]
+            resultat[en_cours[egales]] = cases[egales]
+            suite = ~egales & (trouvees != 0)
+            en_cours, cases = en_cours[suite], (cases[suite] + 1) & masque
+        return resultat
+
+    def _placer(self, cles):
+        """ Range tous ensemble des clés absentes de la table et distinctes ; retourne leurs cases """
+
+        import numpy as np
+        table = self.tableau_cles()
+        masque = self.capacite - 1
+        resultat = np.empty(cles.shape[0], dtype=np.int64)
+        en_cours = np.arange(cles.shape[0])
+        cases = self._cases(cles)
+        while en_cours.size:
+            libres = np.flatnonzero(table[cases] == 0)
+            # parmi les clés qui visent la même case libre, la première la prend ; les autres passent à la suivante
+            _, premieres = np.unique(cases[libres], return_index=True)
+            placees = libres[premieres]
+            table[cases[placees]] = cles[en_cours[placees]]
+            resultat[en_cours[placees]] = cases[placees]
+            suite = np.ones(en_cours.size, dtype=bool)
+            suite[placees] = False
+            en_cours, cases = en_cours[suite], (cases[suite] + 1) & masque
+        return resultat
+
+    def _agrandir(self, capacite):
+        """ Passe à capacite cases (puissance de 2) en replaçant les états rencontrés """
+
+        import numpy as np
+        cles, valeurs = self.tableau_cles(), self.tableau()
+        occupees = np.flatnonzero(cles)
+        anciennes_cles, anciennes_valeurs = cles[occupees].copy(), valeurs[occupees].copy()
+        self._allouer(capacite)
+        self.tableau()[self._placer(anciennes_cles)] = anciennes_valeurs
+
+    def ajouter_lot(self, cles, lignes=None):
+        """ ajouter pour tout un tableau de clés (lignes : tableau NumPy [clé, valeur] des valeurs initiales) ;
+        retourne les numéros de ligne """
+
+        import numpy as np
+        cles = np.asarray(cles, dtype=np.uint64)
+        if cles.size and cles.min() == 0:
+            raise ValueError("La clé d'un état doit être un entier positif : 0 marque une case vide")
+        absentes = np.flatnonzero(self.indices(cles) < 0)
+        nouvelles, premieres = np.unique(cles[absentes], return_index=True)
+        capacite = self.capacite
+        while self.taille + nouvelles.size > CHARGE_MAX * capacite:
+            capacite *= 2
+        if capacite != self.capacite:
+            self._agrandir(capacite)
+        cases = self._placer(nouvelles)
+        self.taille += nouvelles.size
+        if lignes is not None:
+            self.tableau()[cases] = np.asarray(lignes).reshape(-1, self.largeur)[absentes[premieres]]
+        return self.indices(cles)
+
+
+if __name__ == '__main__':
+    # Comparaison mémoire / débit avec les listes de listes de Nimm_V1, à la taille maximale du jeu
+    import tracemalloc
+    from random import randrange
+    from timeit import timeit
+
+    allumettes_en_jeu, max_allumettes = 100, 5
+
+    def listes_boules():
+        return [[[2] * max_allumettes for _ in range(allumettes_en_jeu)] for _ in range(2)]
+
+    for nom, creation in (('listes', listes_boules),
+                          ('TableBoules', lambda: TableBoules(True, True, allumettes_en_jeu, max_allumettes))):
+        tracemalloc.start()
+        boules = creation()
+        memoire = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print('%-12s : %8d octets' % (nom, memoire))
+
+    acces = [(randrange(2), randrange(allumettes_en_jeu), randrange(max_allumettes)) for _ in range(100000)]
+    listes = listes_boules()
+    table = TableBoules(True, True, allumettes_en_jeu, max_allumettes)
+
+    def maj_listes():
+        for j, allumette, coup in acces:
+            listes[j][allumette][coup] += 1
+
+    def maj_table():
+        for j, allumette, coup in acces:
+            table.ajouter(j, allumette, coup, 1)
+
+    import numpy as np
+    indices = tuple(np.array(acces).T)
+
+    def maj_tableau():  # mise à jour groupée, comme dans le simulateur vectorisé
+        np.add.at(table.tableau(), indices, 1)
+
+    for nom, maj in (('listes', maj_listes), ('TableBoules', maj_table), ('tableau()', maj_tableau)):
+        print('%-12s : %8.0f mises à jour/ms' % (nom, len(acces) / 1000 / timeit(maj, number=1)))
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+# """
+# Jeu de Nimm - Apprentissage par fonction de valeur avec traces d'éligibilité (TD(λ))
+#
+# update_listes_fvaleur de Nimm_V1 parcourt l'historique du joueur de la fin vers le début et rapproche chaque état de
+# la valeur de l'état suivant (TD(0)) : la récompense ne remonte que d'un état par manche, au rythme du learning rate.
+# Avec TD(λ), chaque état est rapproché d'un mélange de la récompense et des valeurs des états suivants : la cible de
+# l'état i est (1 - λ) * etats[état i + 1] + λ * cible de l'état i + 1, la cible du dernier état étant la récompense.
+#     - λ = 0 : exactement la mise à jour de update_listes_fvaleur
+#     - λ = 1 : chaque état est rapproché directement de la récompense de la manche (Monte-Carlo)
+# Les états d'un joueur ne se répètent pas au cours d'une manche (les allumettes ne font que diminuer) : les traces
+# d'éligibilité sont de simples puissances de λ et n'ont pas besoin d'être rangées.
+#
+# Deux façons d'appliquer la mise à jour :
+#     - en fin de manche (par défaut) : les cibles sont calculées de la fin vers le début, comme dans
+#       update_listes_fvaleur
+#     - en ligne : à chaque coup du joueur, l'écart entre le nouvel état et le précédent est appliqué tout de suite à
+#       tous les états déjà joués de la manche (trace λ ** distance) ; les coups suivants de la manche voient donc des
+#       valeurs déjà mises à jour. La récompense est appliquée de la même façon en fin de manche.
+#
+# Activation : 2 valeurs optionnelles à la suite des 5 paramètres epsilon-greedy du joueur
+#     parametres[j][4] = [epsilon, epsilon minimum, facteur, période, learning rate, λ, en ligne (0 ou 1)]
+# Sans ces valeurs, Nimm_V1 garde sa mise à jour d'origine.
+# """
+
+
+def parametres_td_lambda(parametres, joueur):
+    """ (λ, en_ligne) du joueur, ou (None, False) s'il utilise la mise à jour d'origine. La mise à jour en ligne
+    demande un λ : ValueError sinon """
+
+    e_greedy = parametres[joueur][4]
+    lambda_td = e_greedy[5] if len(e_greedy) > 5 else None
+    en_ligne = len(e_greedy) > 6 and bool(e_greedy[6])
+    if lambda_td is None:
+        if en_ligne:
+            raise ValueError("TD(λ) en ligne demandé pour " + str(parametres[joueur][3]) + " sans valeur de λ "
+                             "(parametres[" + str(joueur) + "][4][5])")
+        return None, False
+    return lambda_td, en_ligne
+
+
+def transitions_td_lambda(etats, j, historique_j, recompense, learning_rate, lambda_td):
+    """ Mise à jour de fin de manche des états historique_j du joueur j + 1 (indicé sur 0), de la fin vers le début """
+
+    cible = recompense
+    for i in range(len(historique_j) - 1, -1, -1):
+        etat = historique_j[i]
+        valeur = etats[j, etat]
+        valeur += learning_rate * (cible - valeur)
+        etats[j, etat] = valeur
+        cible = (1 - lambda_td) * valeur + lambda_td * cible
+
+
+def ecart_td_lambda(etats, j, historique_j, fin, ecart, learning_rate, lambda_td):
+    """ Applique l'écart de l'état historique_j[fin - 1] à cet état et aux états joués avant lui, pondéré par leur
+    trace d'éligibilité (1 pour cet état, λ pour le précédent, ...) """
+
+    pas = learning_rate * ecart
+    for i in range(fin - 1, -1, -1):
+        etats[j, historique_j[i]] += pas
+        pas *= lambda_td
+        if pas == 0:
+            break
+
+
+def coup_td_lambda(etats, j, historique_j, learning_rate, lambda_td):
+    """ Mise à jour en ligne après un coup du joueur j + 1 : historique_j se termine par le nouvel état ; l'écart
+    entre sa valeur et celle de l'état précédent est appliqué aux états précédents """
+
+    fin = len(historique_j) - 1
+    if fin > 0:
+        ecart_td_lambda(etats, j, historique_j, fin, etats[j, historique_j[fin]] - etats[j, historique_j[fin - 1]],
+                        learning_rate, lambda_td)
+
+
+def fin_td_lambda(etats, j, historique_j, recompense, learning_rate, lambda_td, en_ligne):
+    """ Mise à jour des états du joueur j + 1 à la fin d'une manche, avec la récompense (1 ou -1) """
+
+    if en_ligne:  # les écarts entre états ont déjà été appliqués coup par coup : il reste la récompense
+        if historique_j:
+            ecart_td_lambda(etats, j, historique_j, len(historique_j), recompense - etats[j, historique_j[-1]],
+                            learning_rate, lambda_td)
+    else:
+        transitions_td_lambda(etats, j, historique_j, recompense, learning_rate, lambda_td)
+
+
+if __name__ == '__main__':
+    # Manches nécessaires, IA optimale contre IA fonction de valeur, pour que l'écart moyen des valeurs apprises aux
+    # valeurs exactes (nimm_solveur.distance_etats) descende sous un seuil proche du point fixe, et écart final
+    from statistics import median
+
+    from nimm_session import SessionNimm
+
+    graines, periode_test = range(3), 500
+    jeux = {12: (0.10, 60000), 30: (0.25, 100000)}  # allumettes : (seuil de l'écart moyen, manches jouées)
+    variantes = {"update_listes_fvaleur (d'origine)": [],
+                 'TD(0.5) fin de manche': [0.5, 0],
+                 'TD(0.8) fin de manche': [0.8, 0],
+                 'TD(0.8) en ligne': [0.8, 1],
+                 'TD(1) fin de manche': [1.0, 0]}
+
+    def convergence(allumettes_en_jeu, variante, graine):
+        """ Première manche où l'écart moyen passe sous le seuil, écart final et débit """
+
+        seuil, nbre_manches = jeux[allumettes_en_jeu]
+        parametres = [[allumettes_en_jeu, 3, 0], [1, 1, None, "IA 1", [1.0, 0.05, 0.996, 20, 0.001]],
+                      [1, 3, 1, "IA 2", [1.0, 0.05, 0.996, 20, 0.001] + variante]]
+        session = SessionNimm(parametres, graine=graine)
+        manche_seuil = None
+        while session.manche < nbre_manches:
+            session.entrainer(periode_test)
+            ecart = session.ecart_optimal()[1]['ecart_moyen']
+            if manche_seuil is None and ecart <= seuil:
+                manche_seuil = session.manche
+        return manche_seuil or nbre_manches + 1, ecart, session.manches_par_seconde()
+
+    for allumettes_en_jeu, (seuil, nbre_manches) in jeux.items():
+        print('%d allumettes, écart moyen <= %.2f (médianes sur %d graines)' % (allumettes_en_jeu, seuil,
+                                                                              len(graines)))
+        print('  %-34s %10s %14s %10s' % ('mise à jour', 'manches', 'écart final', 'manches/s'))
+        for nom, variante in variantes.items():
+            mesures = [convergence(allumettes_en_jeu, variante, graine) for graine in graines]
+            print('  %-34s %10d %14.3f %10.0f' % (nom, median(m[0] for m in mesures), median(m[1] for m in mesures),
+                                                   median(m[2] for m in mesures)))
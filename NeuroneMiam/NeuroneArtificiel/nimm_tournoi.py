@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+# """
+# Jeu de Nimm - Tournoi toutes rondes entre IA figées
+#
+# Un tournoi oppose n'importe quel nombre d'IA : aléatoire, optimale, aléatoire/optimale, et IA ayant appris par
+# renforcement ou par fonction de valeur, chargées depuis une sauvegarde (nimm_sauvegarde) ou depuis une session, à
+# différents stades de leur entraînement. Pendant le tournoi les IA n'apprennent plus : chacune est résumée par sa
+# politique, la probabilité de chaque coup pour chaque nombre d'allumettes restantes :
+#     politique[allumettes, coup - 1]
+# calculée comme le ferait jouer() de Nimm_V1 (urne de boules de nimm_urne, epsilon-greedy de la fonction de valeur).
+#
+# Chaque paire d'IA joue manches_par_paire manches, en alternant le joueur qui commence comme joueur1_commence. Les
+# manches de plusieurs paires sont jouées ensemble, comme dans nimm_vectorise : à chaque pas, un coup est tiré dans
+# toutes les manches encore en cours. Les paires sont réparties par tâches sur un ensemble de processus ; le résultat
+# ne dépend que de la graine et de paires_par_tache, pas du nombre de processus.
+#
+# Résultats : la matrice des victoires (victoires[i, j] : manches gagnées par l'IA i contre l'IA j) et un classement
+# Elo : modèle de Bradley-Terry ajusté par maximum de vraisemblance sur toutes les manches, ramené à l'échelle Elo
+# (400 points = 10 contre 1), moyenne 1500, avec un intervalle de confiance à 95% tiré de la matrice d'information.
+#
+# Utilisation :
+#     agents = [AgentNimm.optimal(12, 3), AgentNimm.aleatoire(12, 3),
+#               AgentNimm.depuis_sauvegarde('nimm.sav', 2, nom='IA 2 - 1M manches', epsilon=0)]
+#     resultats = tournoi(agents, manches_par_paire=2000, graine=0)
+#     print(rapport(resultats))
+# """
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from math import log
+from time import perf_counter
+
+import numpy as np
+
+from Nimm_V1 import URNE_ARRONDIE
+from nimm_sauvegarde import lire
+
+ELO_MOYEN = 1500
+_ECHELLE_ELO = 400 / log(10)
+
+
+class AgentNimm:
+    """ IA figée : nom et politique (tableau allumettes_en_jeu + 1 x max_allumettes, la ligne 0 n'est pas utilisée) """
+
+    def __init__(self, nom, politique):
+        politique = np.asarray(politique, dtype=np.float64)
+        sommes = politique[1:].sum(axis=1)
+        if not np.allclose(sommes, 1):
+            raise ValueError("La politique de " + nom + " doit donner des probabilités de somme 1 pour chaque "
+                             "nombre d'allumettes")
+        self.nom = nom
+        self.politique = politique
+
+    @property
+    def allumettes_en_jeu(self):
+        return self.politique.shape[0] - 1
+
+    @property
+    def max_allumettes(self):
+        return self.politique.shape[1]
+
+    @staticmethod
+    def _uniforme(allumettes_en_jeu, max_allumettes):
+        """ Probabilités d'un coup aléatoire : uniforme sur les coups possibles """
+
+        politique = np.zeros((allumettes_en_jeu + 1, max_allumettes))
+        for allumettes in range(1, allumettes_en_jeu + 1):
+            politique[allumettes, :min(max_allumettes, allumettes)] = 1 / min(max_allumettes, allumettes)
+        return politique
+
+    @classmethod
+    def aleatoire(cls, allumettes_en_jeu, max_allumettes, nom='aléatoire'):
+        return cls(nom, cls._uniforme(allumettes_en_jeu, max_allumettes))
+
+    @classmethod
+    def optimal(cls, allumettes_en_jeu, max_allumettes, nom='optimal'):
+        """ Coup allumettes % (max_allumettes + 1), aléatoire sur une position perdante """
+
+        politique = cls._uniforme(allumettes_en_jeu, max_allumettes)
+        for allumettes in range(1, allumettes_en_jeu + 1):
+            coup = allumettes % (max_allumettes + 1)
+            if coup:
+                politique[allumettes] = 0
+                politique[allumettes, coup - 1] = 1
+        return cls(nom, politique)
+
+    @classmethod
+    def aleatoire_optimal(cls, allumettes_en_jeu, max_allumettes, nom='aléatoire/optimal'):
+        """ Une fois sur 2 le coup optimal (s'il existe), sinon un coup aléatoire """
+
+        politique = cls._uniforme(allumettes_en_jeu, max_allumettes)
+        for allumettes in range(1, allumettes_en_jeu + 1):
+            coup = allumettes % (max_allumettes + 1)
+            if coup:
+                politique[allumettes] /= 2
+                politique[allumettes, coup - 1] += 0.5
+        return cls(nom, politique)
+
+    @classmethod
+    def renforcement(cls, boules, j, nom, arrondi=URNE_ARRONDIE):
+        """ Tirage dans l'urne des boules du joueur j + 1 (indicé sur 0), comme nimm_urne.tirage_boule """
+
+        politique = np.zeros((boules.allumettes_en_jeu + 1, boules.max_allumettes))
+        t = sum(range(boules.max_allumettes))
+        for allumette in range(boules.allumettes_en_jeu):
+            ligne = np.array(boules.ligne(j, allumette), dtype=np.float64)
+            if arrondi:
+                ligne = np.ceil(ligne / t)
+            politique[allumette + 1] = ligne / ligne.sum()
+        return cls(nom, politique)
+
+    @classmethod
+    def fonction_valeur(cls, etats, j, max_allumettes, epsilon, nom):
+        """ Epsilon-greedy sur les valeurs des états du joueur j + 1 (indicé sur 0), comme coup_IA_PC : toutes les
+        allumettes si possible, sinon le premier coup qui mène l'adversaire sur la plus petite valeur """
+
+        allumettes_en_jeu = etats.allumettes_en_jeu
+        valeurs = np.array(etats.ligne(j))
+        politique = cls._uniforme(allumettes_en_jeu, max_allumettes) * epsilon
+        for allumettes in range(1, allumettes_en_jeu + 1):
+            if allumettes <= max_allumettes:
+                coup = allumettes
+            else:
+                coup = 1 + int(np.argmin(valeurs[allumettes - 1 - np.arange(1, max_allumettes + 1)]))
+            politique[allumettes, coup - 1] += 1 - epsilon
+        return cls(nom, politique)
+
+    @classmethod
+    def depuis_parametres(cls, parametres_joueur, boules, etats, j, nom=None, epsilon=None):
+        """ IA décrite par parametres[j + 1] de Nimm_V1, avec ses tables apprises. epsilon remplace l'epsilon-greedy
+        courant d'une IA par fonction de valeur (0 : toujours le coup glouton) """
+
+        nom = parametres_joueur[3] if nom is None else nom
+        allumettes_en_jeu, max_allumettes = boules.allumettes_en_jeu, boules.max_allumettes
+        if parametres_joueur[0] == 0:
+            raise ValueError(nom + " est un joueur humain")
+        mode = parametres_joueur[1]
+        if mode == 0:
+            return cls.aleatoire(allumettes_en_jeu, max_allumettes, nom)
+        if mode == 1:
+            return cls.optimal(allumettes_en_jeu, max_allumettes, nom)
+        if mode == 2:
+            return cls.aleatoire_optimal(allumettes_en_jeu, max_allumettes, nom)
+        if parametres_joueur[2] == 0:
+            return cls.renforcement(boules, j, nom)
+        return cls.fonction_valeur(etats, j, max_allumettes,
+                                   parametres_joueur[4][0] if epsilon is None else epsilon, nom)
+
+    @classmethod
+    def depuis_session(cls, session, joueur, nom=None, epsilon=None):
+        """ Le joueur (1 ou 2) d'une SessionNimm, figé dans son état actuel (les tables sont copiées) """
+
+        return cls.depuis_parametres(session.parametres[joueur], session.boules, session.etats, joueur - 1, nom,
+                                     epsilon)
+
+    @classmethod
+    def depuis_sauvegarde(cls, chemin, joueur, nom=None, epsilon=None):
+        """ Le joueur (1 ou 2) d'une sauvegarde de nimm_sauvegarde """
+
+        entete, boules, etats = lire(chemin)
+        return cls.depuis_parametres(entete['parametres'][joueur], boules, etats, joueur - 1, nom, epsilon)
+
+
+def probabilite_victoire(politique_a, politique_b, allumettes_en_jeu):
+    """ Probabilité exacte que l'IA de politique_a gagne une manche qu'elle commence contre politique_b """
+
+    gagne_a = np.zeros(allumettes_en_jeu + 1)  # gagne_a[n] : a a la main avec n allumettes et gagne
+    gagne_b = np.zeros(allumettes_en_jeu + 1)
+    for n in range(1, allumettes_en_jeu + 1):
+        coups = np.arange(1, min(n, politique_a.shape[1]) + 1)
+        gagne_a[n] = sum(politique_a[n, c - 1] * (1 if c == n else 1 - gagne_b[n - c]) for c in coups)
+        gagne_b[n] = sum(politique_b[n, c - 1] * (1 if c == n else 1 - gagne_a[n - c]) for c in coups)
+    return gagne_a[allumettes_en_jeu]
+
+
+def _jouer_paires(cumuls, paires, manches_par_paire, graine):
+    """ Joue ensemble les manches de toutes les paires (i, j) ; retourne les victoires de i pour chaque paire """
+
+    rng = np.random.default_rng(graine)
+    allumettes_en_jeu = cumuls.shape[1] - 1
+    paires = np.asarray(paires, dtype=np.int64).reshape(-1, 2)
+    n = len(paires) * manches_par_paire
+    paire = np.repeat(np.arange(len(paires)), manches_par_paire)
+    # la manche k de chaque paire est commencée par i si k est pair, par j sinon (joueur1_commence alterné)
+    a_la_main = np.tile(np.arange(manches_par_paire) % 2, len(paires))  # 0 : i, 1 : j
+    allumettes = np.full(n, allumettes_en_jeu)
+    gagnant = np.zeros(n, dtype=np.int64)
+    en_cours = np.arange(n)
+    while en_cours.size:
+        joueur = a_la_main[en_cours]
+        agent = paires[paire[en_cours], joueur]
+        restantes = allumettes[en_cours]
+        tirage = rng.random(en_cours.size)
+        coup = 1 + np.minimum((cumuls[agent, restantes] <= tirage[:, None]).sum(axis=1), cumuls.shape[2] - 1)
+        restantes = restantes - coup
+        allumettes[en_cours] = restantes
+        finies = restantes <= 0  # le joueur qui retire la dernière allumette gagne
+        gagnant[en_cours[finies]] = joueur[finies]
+        a_la_main[en_cours] = 1 - joueur
+        en_cours = en_cours[~finies]
+    return np.bincount(paire, weights=gagnant == 0, minlength=len(paires)).astype(np.int64)
+
+
+def elo(victoires, manches, prior=1.0, iterations=100):
+    """ Classement de Bradley-Terry sur l'échelle Elo, et écart-type de chaque classement. prior ajoute à chaque
+    paire prior manches virtuelles partagées à égalité, pour qu'une IA sans défaite garde un classement fini """
+
+    victoires = np.asarray(victoires, dtype=np.float64) + prior / 2 * (np.asarray(manches) > 0)
+    manches = victoires + victoires.T
+    nbre = len(manches)
+    forces = np.zeros(nbre)
+    centrage = np.eye(nbre) - 1 / nbre  # la moyenne des forces reste nulle
+    for _ in range(iterations):
+        p = 1 / (1 + np.exp(forces[None, :] - forces[:, None]))  # p[i, j] : probabilité que i batte j
+        gradient = (victoires - manches * p).sum(axis=1)
+        information = manches * p * p.T
+        information = np.diag(information.sum(axis=1)) - information
+        pas = centrage @ np.linalg.pinv(information) @ gradient
+        forces += pas
+        if np.abs(pas).max() < 1e-10:
+            break
+    covariance = centrage @ np.linalg.pinv(information) @ centrage
+    return ELO_MOYEN + _ECHELLE_ELO * forces, _ECHELLE_ELO * np.sqrt(np.maximum(np.diag(covariance), 0))
+
+
+def tournoi(agents, manches_par_paire=1000, nbre_processus=None, graine=None, paires_par_tache=16):
+    """ Toutes les paires d'agents jouent manches_par_paire manches (un nombre pair : chacun commence autant de fois)
+    ; retourne la matrice des victoires et le classement Elo """
+
+    if len({(agent.allumettes_en_jeu, agent.max_allumettes) for agent in agents}) > 1:
+        raise ValueError("Les agents du tournoi ne jouent pas tous au même jeu (allumettes en jeu, retrait max)")
+    if manches_par_paire % 2:
+        raise ValueError("manches_par_paire doit être pair pour que chaque IA commence autant de manches")
+    if graine is None:
+        graine = np.random.SeedSequence().entropy
+
+    debut = perf_counter()
+    nbre = len(agents)
+    cumuls = np.cumsum([agent.politique for agent in agents], axis=2)
+    paires = [(i, j) for i in range(nbre) for j in range(i + 1, nbre)]
+    taches = [paires[k:k + paires_par_tache] for k in range(0, len(paires), paires_par_tache)]
+    graines = [[graine, numero] for numero in range(len(taches))]
+
+    if nbre_processus == 1 or len(taches) == 1:
+        gains = [_jouer_paires(cumuls, tache, manches_par_paire, g) for tache, g in zip(taches, graines)]
+    else:
+        with ProcessPoolExecutor(nbre_processus or os.cpu_count()) as executeur:
+            gains = list(executeur.map(_jouer_paires, [cumuls] * len(taches), taches,
+                                       [manches_par_paire] * len(taches), graines))
+
+    victoires = np.zeros((nbre, nbre), dtype=np.int64)
+    for tache, gains_tache in zip(taches, gains):
+        for (i, j), gains_i in zip(tache, gains_tache):
+            victoires[i, j] = gains_i
+            victoires[j, i] = manches_par_paire - gains_i
+    manches = np.full((nbre, nbre), manches_par_paire) - manches_par_paire * np.eye(nbre, dtype=np.int64)
+    classement, ecart_type = elo(victoires, manches)
+    return {'noms': [agent.nom for agent in agents],
+            'victoires': victoires,
+            'manches': manches,
+            'elo': classement,
+            'elo_min': classement - 1.96 * ecart_type,
+            'elo_max': classement + 1.96 * ecart_type,
+            'graine': graine,
+            'duree': perf_counter() - debut}
+
+
+def rapport(resultats, matrice=True):
+    """ Classement (Elo, intervalle de confiance à 95%, pourcentage de victoires) puis matrice des victoires en % """
+
+    noms = resultats['noms']
+    ordre = np.argsort(-resultats['elo'])
+    pourcentages = 100 * resultats['victoires'].sum(axis=1) / resultats['manches'].sum(axis=1)
+    lignes = ['%4s  %-28s %7s %17s %10s' % ('rang', 'IA', 'Elo', 'IC 95%', 'victoires')]
+    for rang, i in enumerate(ordre, 1):
+        lignes.append('%4d  %-28s %7.0f   [%6.0f, %6.0f] %9.1f%%' % (
+            rang, noms[i], resultats['elo'][i], resultats['elo_min'][i], resultats['elo_max'][i], pourcentages[i]))
+    if matrice:
+        lignes.append('')
+        lignes.append('victoires (%) de la ligne contre la colonne')
+        lignes.append('%4s ' % '' + ''.join('%5d' % (rang + 1) for rang in range(len(ordre))))
+        for rang, i in enumerate(ordre, 1):
+            lignes.append('%4d ' % rang + ''.join(
+                '%5s' % ('-' if i == j else '%.0f' % (100 * resultats['victoires'][i, j] / resultats['manches'][i, j]))
+                for j in ordre))
+    return '\n'.join(lignes)
+
+
+if __name__ == '__main__':
+    # Ligue de 20 IA (3 IA fixes, 17 IA apprenantes à différents stades), comparée à une boucle manche par manche
+    import random
+
+    from nimm_session import SessionNimm
+
+    allumettes_en_jeu, max_allumettes, manches_par_paire = 12, 3, 2000
+    agents = [AgentNimm.aleatoire(allumettes_en_jeu, max_allumettes),
+              AgentNimm.optimal(allumettes_en_jeu, max_allumettes),
+              AgentNimm.aleatoire_optimal(allumettes_en_jeu, max_allumettes)]
+    debut = perf_counter()
+    for nom, joueur_2 in (('renforcement', [1, 3, 0, "IA 2", [1.0, 0.05, 0.996, 5, 0.001]]),
+                          ('fonction valeur', [1, 3, 1, "IA 2", [1.0, 0.05, 0.996, 20, 0.001]]),
+                          ('TD(0.8)', [1, 3, 1, "IA 2", [1.0, 0.05, 0.996, 20, 0.001, 0.8, 0]])):
+        session = SessionNimm([[allumettes_en_jeu, max_allumettes, 0],
+                               [1, 1, None, "IA 1", [1.0, 0.05, 0.996, 5, 0.001]], joueur_2], graine=0)
+        stades = (100, 1000, 5000, 20000, 60000) if nom == 'renforcement' else (1000, 5000, 20000, 40000, 60000, 100000)
+        for stade in stades:
+            session.entrainer(stade - session.manche)
+            agents.append(AgentNimm.depuis_session(session, 2, nom + ' ' + str(stade), epsilon=0))
+    print('%d agents entraînés en %.1f s' % (len(agents), perf_counter() - debut))
+
+    resultats = tournoi(agents, manches_par_paire, graine=0)
+    nbre_manches = int(resultats['manches'].sum()) // 2
+    print('tournoi : %d manches en %.2f s (%.0f manches/s)' % (nbre_manches, resultats['duree'],
+                                                              nbre_manches / resultats['duree']))
+    print(rapport(resultats))
+
+    # écart des pourcentages de victoires aux probabilités exactes, en écarts-types de la loi binomiale
+    ecarts = []
+    for i in range(len(agents)):
+        for j in range(i + 1, len(agents)):
+            p = (probabilite_victoire(agents[i].politique, agents[j].politique, allumettes_en_jeu) +
+                 1 - probabilite_victoire(agents[j].politique, agents[i].politique, allumettes_en_jeu)) / 2
+            ecart_type = max(np.sqrt(p * (1 - p) / manches_par_paire), 1e-12)
+            ecarts.append(abs(resultats['victoires'][i, j] / manches_par_paire - p) / ecart_type)
+    print('écart aux probabilités exactes : médiane %.2f, maximum %.2f écarts-types' % (np.median(ecarts),
+                                                                                      max(ecarts)))
+
+    # même nombre de manches joué manche par manche, en Python, sur 5 paires
+    alea = random.Random(0)
+    debut = perf_counter()
+    for i, j in [(0, 1), (3, 10), (5, 15), (8, 19), (2, 12)]:
+        cumuls = [np.cumsum(agents[k].politique, axis=1).tolist() for k in (i, j)]
+        for manche in range(manches_par_paire):
+            allumettes, joueur = allumettes_en_jeu, manche % 2
+            while True:
+                tirage, cumul = alea.random(), cumuls[joueur][allumettes]
+                coup = next((c for c, seuil in enumerate(cumul, 1) if tirage < seuil), max_allumettes)
+                allumettes -= coup
+                if allumettes <= 0:
+                    break
+                joueur = 1 - joueur
+    duree_boucle = (perf_counter() - debut) / 5 * len(agents) * (len(agents) - 1) / 2
+    print('boucle manche par manche (estimée) : %.1f s, soit %.0fx plus lent' % (duree_boucle,
+                                                                               duree_boucle / resultats['duree']))
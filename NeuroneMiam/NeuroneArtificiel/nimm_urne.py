@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# """
+# Jeu de Nimm - Tirage d'une boule dans l'urne de l'apprentissage par renforcement
+#
+# Au lieu de construire une liste contenant chaque boule puis de la mélanger, on tire directement un numéro de boule
+# entre 1 et le nombre total de boules, puis on cherche sa couleur en cumulant le nombre de boules de chaque couleur.
+# Il y a au plus 5 couleurs (max_allumettes), le coût du tirage ne dépend donc plus du nombre de boules.
+#
+# Deux variantes :
+#     - exacte : chaque boule a la même probabilité d'être tirée (probabilité d'une couleur = nbre de boules de cette
+#       couleur / nbre total de boules), comme décrit dans la règle du jeu
+#     - arrondie : reproduit les probabilités du tirage historique de Nimm_V1, où l'urne contenait
+#       ceil(boules / t) boules de chaque couleur (t = 0 + 1 + ... + max_allumettes - 1)
+# """
+
+import random
+from math import ceil
+from random import randint
+
+
+def tirage_boule(boules_allumette, arrondi=False, alea=random):
+    """ Tire une boule dans l'urne d'une allumette et retourne sa couleur (coup indicé sur 0)
+    alea fournit le tirage (randint), le module random par défaut """
+
+    if arrondi:
+        t = sum(range(len(boules_allumette)))
+        boules_allumette = [ceil(b / t) for b in boules_allumette]
+
+    numero = alea.randint(1, sum(boules_allumette))
+    for couleur, nbre in enumerate(boules_allumette):
+        numero -= nbre
+        if numero <= 0:
+            return couleur
+
+
+def tirage_boule_nimm_v1(boules_allumette):
+    """ Tirage historique de Nimm_V1 : construction de l'urne, mélange de Fisher-Yates puis tirage """
+
+    urne = []
+    t = 0
+    for i in range(len(boules_allumette)):
+        t += i
+
+    for i in range(len(boules_allumette)):
+        urne += [i] * ceil(boules_allumette[i] / t)
+    for i in range(len(urne) - 1, 1, -1):
+        j = randint(0, i)
+        urne[j], urne[i] = urne[i], urne[j]
+    return urne[randint(0, len(urne) - 1)]
+
+
+if __name__ == '__main__':
+    # Micro-benchmark : temps d'un tirage en fonction du nombre de boules dans l'urne
+    from timeit import timeit
+
+    for nbre_boules in (10, 1000, 100000):
+        boules_allumette = [nbre_boules // 2, nbre_boules // 3, nbre_boules - nbre_boules // 2 - nbre_boules // 3]
+        nbre = max(10, 200000 // nbre_boules)
+        print('%7d boules' % nbre_boules)
+        for nom, tirage in (('Nimm_V1', lambda: tirage_boule_nimm_v1(boules_allumette)),
+                            ('arrondi', lambda: tirage_boule(boules_allumette, True)),
+                            ('exact', lambda: tirage_boule(boules_allumette))):
+            print('  %-8s : %10.2f µs / tirage' % (nom, 1e6 * timeit(tirage, number=nbre) / nbre))
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+# """
+# Jeu de Nimm - Simulateur vectorisé (NumPy)
+#
+# Joue un lot de N manches indépendantes en parallèle : le nombre d'allumettes restantes, le joueur qui a la main et
+# l'historique des coups de chaque manche sont des tableaux NumPy, et chaque pas de la boucle fait jouer un coup dans
+# toutes les manches encore en cours.
+#
+# Les IA sont celles de Nimm_V1 : aléatoire, optimale, aléatoire/optimale, apprentissage par renforcement (urne de
+# boules) et apprentissage par fonction de valeur (epsilon-greedy). Les tables apprises sont mises à jour à la fin de
+# chaque lot, à partir des tables figées pendant le lot :
+#     - renforcement : tirage dans l'urne comme nimm_urne.tirage_boule ; les +1/-1 des boules sont additionnés ;
+#       une allumette dont toutes les boules ont disparu est réinitialisée comme dans test_boules_restantes
+#     - fonction de valeur : les k mises à jour d'un même état au cours du lot sont regroupées en une seule mise à
+#       jour équivalente vers la moyenne des cibles : v += (1 - (1 - learning_rate) ** k) * (moyenne_cibles - v)
+#     - epsilon-greedy : epsilon est constant pendant le lot puis réduit du nombre de périodes écoulées
+# Pour des lots petits devant le nombre de manches, les résultats suivent la même distribution que Nimm_V1.
+# """
+
+from time import perf_counter
+
+import numpy as np
+
+from nimm_tables import TableBoules, TableEtats
+from nimm_td_lambda import parametres_td_lambda
+
+
+class SimulateurNimm:
+    """ Simulateur de nbre_parties manches de Nimm jouées simultanément entre 2 IA """
+
+    def __init__(self, parametres, nbre_parties=1024, graine=None, boules=None, etats=None, urne_arrondie=False):
+        for j in range(1, 3):
+            if parametres[j][0] == 0:
+                raise ValueError("Le joueur " + str(j) + " est humain : le simulateur n'oppose que des IA")
+            if parametres_td_lambda(parametres, j)[0] is not None:
+                raise ValueError("Le joueur " + str(j) + " apprend par TD(λ) : le simulateur n'utilise que la mise à "
+                                 "jour d'origine de la fonction de valeur")
+
+        self.parametres = [list(parametres[0])] + [list(parametres[j][:4]) + [list(parametres[j][4])]
+                                                   for j in range(1, 3)]
+        self.allumettes_en_jeu = parametres[0][0]
+        self.max_allumettes = parametres[0][1]
+        self.nbre_parties = nbre_parties
+        self.rng = np.random.default_rng(graine)
+        self.urne_arrondie = urne_arrondie  # même signification que Nimm_V1.URNE_ARRONDIE
+
+        # tables des 2 joueurs (voir nimm_tables), manipulées ici par des vues NumPy sans copie :
+        # boules[joueur - 1, allumette - 1, coup - 1], etats[joueur - 1, allumette - 1]
+        if boules is None:
+            boules = TableBoules(parametres[1][2] == 0, parametres[2][2] == 0, self.allumettes_en_jeu,
+                                 self.max_allumettes)
+        if etats is None:
+            etats = TableEtats(parametres[1][2] == 1, parametres[2][2] == 1, self.allumettes_en_jeu)
+        self.table_boules = boules
+        self.table_etats = etats
+        self.boules = boules.tableau()
+        self.etats = etats.tableau()
+        self.boules_initiales = TableBoules(True, False, self.allumettes_en_jeu, self.max_allumettes).tableau()[0]
+
+        self.manche = 0
+        self.scores = [0, 0, 0, 0, 0, 0]
+        self.histo_victoires = []  # 10 dernières victoires (1) / défaites (0) du joueur 1
+        self.joueur1_commence = bool(self.rng.integers(2))
+        self.duree = 0.0
+
+    def _coups(self, joueur, allumettes):
+        """ Coups (1 à max_allumettes) joués par joueur dans des manches ayant allumettes restantes """
+
+        parametres = self.parametres[joueur]
+        max_allumettes = self.max_allumettes
+        n = allumettes.shape[0]
+        possibles = np.minimum(allumettes, max_allumettes)
+        aleatoire = 1 + (self.rng.random(n) * possibles).astype(np.int64)
+        optimal = allumettes % (max_allumettes + 1)
+
+        mode_IA = parametres[1]
+        if mode_IA == 0:  # coup aléatoire
+            return aleatoire
+        if mode_IA == 1:  # coup optimal, aléatoire si allumettes est multiple de max_allumettes + 1
+            return np.where(optimal == 0, aleatoire, optimal)
+        if mode_IA == 2:  # coup optimal/aléatoire
+            return np.where((self.rng.random(n) < 0.5) & (optimal != 0), optimal, aleatoire)
+
+        if parametres[2] == 0:  # apprentissage par renforcement : tirage d'une boule dans l'urne
+            urnes = self.boules[joueur - 1, allumettes - 1]
+            if self.urne_arrondie:
+                urnes = np.ceil(urnes / sum(range(max_allumettes)))
+            cumul = np.cumsum(urnes, axis=1)
+            tirage = self.rng.random(n) * cumul[:, -1]
+            return 1 + (cumul <= tirage[:, None]).sum(axis=1)
+
+        # apprentissage par fonction de valeur : epsilon-greedy
+        etats = self.etats[joueur - 1]
+        decalages = np.arange(1, max_allumettes + 1)
+        positions = np.maximum(allumettes[:, None] - 1 - decalages, 0)
+        glouton = 1 + np.argmin(etats[positions], axis=1)  # première plus petite valeur = plus petit coup
+        glouton = np.where(allumettes <= max_allumettes, allumettes, glouton)
+        return np.where(self.rng.random(n) < parametres[4][0], aleatoire, glouton)
+
+    def jouer_lot(self, nbre_parties=None):
+        """ Joue un lot de manches, met à jour scores et tables et retourne le tableau des joueurs gagnants """
+
+        n = self.nbre_parties if nbre_parties is None else nbre_parties
+        max_coups = self.allumettes_en_jeu
+
+        # le joueur 1 commence une manche sur deux, comme dans Nimm_V1
+        rangs = np.arange(n)
+        joueur = np.where((rangs % 2 == 0) == self.joueur1_commence, 1, 2)
+        allumettes = np.full(n, self.allumettes_en_jeu, dtype=np.int64)
+        gagnants = np.zeros(n, dtype=np.int64)
+        hist_joueur = np.zeros((n, max_coups), dtype=np.int64)  # 0 = pas de coup
+        hist_etat = np.zeros((n, max_coups), dtype=np.int64)  # allumettes - 1 avant le coup
+        hist_coup = np.zeros((n, max_coups), dtype=np.int64)  # coup - 1
+
+        en_cours = rangs
+        for pas in range(max_coups):
+            if en_cours.size == 0:
+                break
+            a = allumettes[en_cours]
+            j = joueur[en_cours]
+            coups = np.empty_like(a)
+            for k in (1, 2):
+                masque = j == k
+                if masque.any():
+                    coups[masque] = self._coups(k, a[masque])
+
+            hist_joueur[en_cours, pas] = j
+            hist_etat[en_cours, pas] = a - 1
+            hist_coup[en_cours, pas] = coups - 1
+
+            a = a - coups
+            allumettes[en_cours] = a
+            finies = a == 0
+            gagnants[en_cours[finies]] = j[finies]
+            joueur[en_cours] = 3 - j
+            en_cours = en_cours[~finies]
+
+        self._update_scores(gagnants)
+        for k in (1, 2):
+            if self.parametres[k][2] == 0:
+                self._update_renforcement(k, gagnants, hist_joueur, hist_etat, hist_coup)
+            elif self.parametres[k][2] == 1:
+                self._update_fvaleur(k, gagnants, hist_joueur, hist_etat)
+                self._update_epsilon_greedy(k, n)
+
+        self.manche += n
+        if n % 2:
+            self.joueur1_commence = not self.joueur1_commence
+        return gagnants
+
+    def _update_renforcement(self, joueur, gagnants, hist_joueur, hist_etat, hist_coup):
+        """ +1 boule pour chaque coup d'une manche gagnée, -1 pour chaque coup d'une manche perdue """
+
+        lignes, colonnes = np.nonzero(hist_joueur == joueur)
+        signes = np.where(gagnants[lignes] == joueur, 1, -1)
+        boules = self.boules[joueur - 1]
+        indices = hist_etat[lignes, colonnes] * self.max_allumettes + hist_coup[lignes, colonnes]
+        boules += np.bincount(indices, weights=signes, minlength=boules.size).astype(np.int64).reshape(boules.shape)
+        np.maximum(boules, 0, out=boules)
+        vides = boules.sum(axis=1) == 0  # plus de boules : on réinitialise l'allumette
+        boules[vides] = self.boules_initiales[vides]
+
+    def _update_fvaleur(self, joueur, gagnants, hist_joueur, hist_etat):
+        """ Mise à jour des états de la fin vers le début de chaque manche, toutes manches du lot à la fois """
+
+        etats = self.etats[joueur - 1]
+        learning_rate = self.parametres[joueur][4][4]
+        masque = hist_joueur == joueur
+        rang = np.cumsum(masque[:, ::-1], axis=1)[:, ::-1] * masque  # 1 = dernier coup du joueur dans la manche
+        recompenses = np.where(gagnants == joueur, 1.0, -1.0)
+        suivant = np.full(gagnants.shape[0], -1)  # -1 : l'état suivant est la récompense
+
+        for profondeur in range(1, int(rang.max(initial=0)) + 1):
+            lignes, colonnes = np.nonzero(rang == profondeur)
+            s = hist_etat[lignes, colonnes]
+            s_suivant = suivant[lignes]
+            cibles = np.where(s_suivant < 0, recompenses[lignes], etats[s_suivant])
+            nbre = np.bincount(s, minlength=etats.size)
+            somme = np.bincount(s, weights=cibles, minlength=etats.size)
+            vus = nbre > 0
+            pas = 1 - (1 - learning_rate) ** nbre[vus]
+            etats[vus] += pas * (somme[vus] / nbre[vus] - etats[vus])
+            suivant[lignes] = s
+
+    def _update_epsilon_greedy(self, joueur, n):
+        """ Réduit epsilon du nombre de périodes écoulées entre les manches self.manche + 1 et self.manche + n """
+
+        e_greedy = self.parametres[joueur][4]
+        periode = e_greedy[3]
+        reductions = (self.manche + n) // periode - self.manche // periode
+        e_greedy[0] = max(e_greedy[0] * e_greedy[2] ** reductions, e_greedy[1])
+
+    def _update_scores(self, gagnants):
+        """ Met à jour les scores comme update_scores de Nimm_V1, manche après manche du lot """
+
+        scores = self.scores
+        victoires = (gagnants == 1).astype(np.int64)
+        scores[0] += int(victoires.sum())
+        scores[1] += int(victoires.size - victoires.sum())
+
+        # moyenne mobile des 10 dernières manches après chaque manche du lot (non définie avant 10 manches)
+        suite = np.concatenate([np.array(self.histo_victoires, dtype=np.int64), victoires])
+        cumul = np.concatenate([[0], np.cumsum(suite)])
+        fins = np.arange(len(self.histo_victoires), len(suite)) + 1
+        definie = self.manche + np.arange(1, victoires.size + 1) >= 10
+        mmob1 = 10 * (cumul[fins] - cumul[np.maximum(fins - 10, 0)])
+        self.histo_victoires = suite[-10:].tolist()
+
+        manches = self.manche + np.arange(1, victoires.size + 1)
+        for j, mmob in ((0, mmob1), (1, 100 - mmob1)):
+            valeurs = np.where(definie, mmob, 0)  # avant 10 manches, la moyenne mobile reste à 0
+            if definie[-1]:
+                scores[j + 2] = float(valeurs[-1])
+            sous_50 = np.nonzero(valeurs < 50)[0]
+            if valeurs[-1] < 50:
+                scores[j + 4] = 0
+            elif sous_50.size:  # manche à partir de laquelle les 50% sont acquis sans interruption
+                scores[j + 4] = int(manches[sous_50[-1] + 1])
+            elif scores[j + 4] == 0:
+                scores[j + 4] = int(manches[0])
+
+    def entrainer(self, nbre_manches):
+        """ Joue nbre_manches manches par lots de nbre_parties et retourne les résultats """
+
+        debut = perf_counter()
+        restantes = nbre_manches
+        while restantes > 0:
+            n = min(self.nbre_parties, restantes)
+            self.jouer_lot(n)
+            restantes -= n
+        self.duree += perf_counter() - debut
+        return self.resultats()
+
+    def resultats(self):
+        """ Résultats au format de SessionNimm.resultats """
+
+        return {'parametres': self.parametres,
+                'boules': self.table_boules,
+                'etats': self.table_etats,
+                'scores': self.scores,
+                'manches': self.manche,
+                'duree': self.duree,
+                'manches_par_seconde': self.manche / self.duree if self.duree else 0.0}
+
+
+def entrainer(parametres, nbre_manches, nbre_parties=1024, graine=None):
+    """ Entraîne un simulateur vectorisé sur nbre_manches manches et retourne ses résultats """
+
+    return SimulateurNimm(parametres, nbre_parties, graine).entrainer(nbre_manches)
+
+
+if __name__ == '__main__':
+    # Débit comparé à la boucle "while allumettes > 0" de Nimm_V1 (via SessionNimm)
+    from nimm_session import SessionNimm
+
+    configurations = {
+        'aléatoire / optimal': [[12, 3, 0], [1, 0, None, "IA 1", [1.0, 0.05, 0.996, 5, 0.001]],
+                                [1, 1, None, "IA 2", [1.0, 0.05, 0.996, 5, 0.001]]],
+        'optimal / renforcement': [[12, 3, 0], [1, 1, None, "IA 1", [1.0, 0.05, 0.996, 5, 0.001]],
+                                   [1, 3, 0, "IA 2", [1.0, 0.05, 0.996, 5, 0.001]]],
+        'optimal / fonction valeur': [[12, 3, 0], [1, 1, None, "IA 1", [1.0, 0.05, 0.996, 20, 0.001]],
+                                      [1, 3, 1, "IA 2", [1.0, 0.05, 0.996, 20, 0.001]]],
+    }
+    nbre_manches = 20000
+
+    for nom, parametres in configurations.items():
+        scalaire = SessionNimm(parametres).entrainer(nbre_manches)
+        vectorise = entrainer(parametres, nbre_manches, graine=0)
+        print(nom)
+        print('  boucle Nimm_V1 : %10.0f manches/s  scores %s' % (scalaire['manches_par_seconde'],
+                                                                   scalaire['scores'][:2]))
+        print('  vectorisé      : %10.0f manches/s  scores %s  (x %.1f)' % (
+            vectorise['manches_par_seconde'], vectorise['scores'][:2],
+            vectorise['manches_par_seconde'] / scalaire['manches_par_seconde']))